@@ -51,3 +51,12 @@ nj = cogent3.get_app("piqtree_nj")
 app = jc + nj
 tree = app(aln)
 tree.get_figure().show()
+
+# %% [markdown]
+# ## Building the tree directly from the alignment
+# The `piqtree_aln_nj` app does the same in one step, without copying the distance matrix into Python, which is faster for large alignments.
+
+# %%
+aln_nj = cogent3.get_app("piqtree_aln_nj")
+tree = aln_nj(aln)
+tree.get_figure().show()
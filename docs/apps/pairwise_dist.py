@@ -22,3 +22,12 @@ cogent3.app_help("piqtree_jc_dists")
 jc_dists = cogent3.get_app("piqtree_jc_dists")
 dists = jc_dists(aln)
 dists
+
+# %% [markdown]
+# ## Other distance models
+# The `piqtree_dists` app estimates p, K2P, TN93 or LogDet distances (and Poisson distances for proteins), excluding gaps and ambiguities pairwise.
+
+# %%
+tn93_dists = cogent3.get_app("piqtree_dists", model="tn93")
+dists = tn93_dists(aln)
+dists
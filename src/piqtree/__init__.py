@@ -4,15 +4,28 @@ from _piqtree import __iqtree_version__
 
 from piqtree._data import dataset_names, download_dataset
 from piqtree.iqtree import (
+    AlignmentHandle,
+    Executor,
     ModelFinderResult,
+    ResultCache,
     TreeGenMode,
     build_tree,
+    build_trees,
+    configure_cpu_budget,
+    configure_scratch,
+    configure_thread_cache,
+    distances,
     fit_tree,
+    iter_distances,
+    iter_random_trees,
     jc_distances,
     model_finder,
     nj_tree,
+    nj_tree_from_alignment,
     random_trees,
     robinson_foulds,
+    write_distances,
+    write_random_trees,
 )
 from piqtree.model import (
     Model,
@@ -25,21 +38,34 @@ from piqtree.model import (
 __version__ = "0.4.0"
 
 __all__ = [
+    "AlignmentHandle",
+    "Executor",
     "Model",
     "ModelFinderResult",
+    "ResultCache",
     "TreeGenMode",
     "__iqtree_version__",
     "available_freq_type",
     "available_models",
     "available_rate_type",
     "build_tree",
+    "build_trees",
+    "configure_cpu_budget",
+    "configure_scratch",
+    "configure_thread_cache",
     "dataset_names",
+    "distances",
     "download_dataset",
     "fit_tree",
+    "iter_distances",
+    "iter_random_trees",
     "jc_distances",
     "make_model",
     "model_finder",
     "nj_tree",
+    "nj_tree_from_alignment",
     "random_trees",
     "robinson_foulds",
+    "write_distances",
+    "write_random_trees",
 ]
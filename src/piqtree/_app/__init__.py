@@ -8,10 +8,12 @@ from cogent3.util.misc import extend_docstring_from
 from piqtree import (
     TreeGenMode,
     build_tree,
+    distances,
     fit_tree,
     jc_distances,
     model_finder,
     nj_tree,
+    nj_tree_from_alignment,
     random_trees,
 )
 from piqtree.iqtree import ModelFinderResult
@@ -99,8 +101,9 @@ def piqtree_random_trees(
     num_trees: int,
     tree_mode: TreeGenMode,
     rand_seed: int | None = None,
+    num_threads: int | None = None,
 ) -> tuple[cogent3.PhyloNode]:
-    return random_trees(num_trees, num_taxa, tree_mode, rand_seed)
+    return random_trees(num_trees, num_taxa, tree_mode, rand_seed, num_threads)
 
 
 @composable.define_app
@@ -122,12 +125,56 @@ class piqtree_jc_dists:
         )
 
 
+@composable.define_app
+class piqtree_dists:
+    @extend_docstring_from(distances)
+    def __init__(
+        self,
+        model: str = "jc",
+        num_threads: int | None = None,
+    ) -> None:
+        self._model = model
+        self._num_threads = num_threads
+
+    def main(
+        self,
+        aln: c3_types.AlignedSeqsType,
+    ) -> c3_types.PairwiseDistanceType | c3_types.SerialisableType:
+        return distances(
+            aln,
+            self._model,
+            num_threads=self._num_threads,
+        )
+
+
 @composable.define_app
 @extend_docstring_from(nj_tree)
 def piqtree_nj(dists: c3_types.PairwiseDistanceType) -> cogent3.PhyloNode:
     return nj_tree(dists)
 
 
+@composable.define_app
+class piqtree_aln_nj:
+    @extend_docstring_from(nj_tree_from_alignment)
+    def __init__(
+        self,
+        distance: str = "jc",
+        num_threads: int | None = None,
+    ) -> None:
+        self._distance = distance
+        self._num_threads = num_threads
+
+    def main(
+        self,
+        aln: c3_types.AlignedSeqsType,
+    ) -> cogent3.PhyloNode | cogent3.app.typing.SerialisableType:
+        return nj_tree_from_alignment(
+            aln,
+            self._distance,
+            num_threads=self._num_threads,
+        )
+
+
 @composable.define_app
 @extend_docstring_from(model_finder)
 def piqtree_mfinder(
@@ -141,6 +188,8 @@ _ALL_APP_NAMES = [
     "piqtree_fit",
     "piqtree_random_trees",
     "piqtree_jc_dists",
+    "piqtree_dists",
     "piqtree_nj",
+    "piqtree_aln_nj",
     "piqtree_mfinder",
 ]
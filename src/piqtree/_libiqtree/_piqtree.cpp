@@ -1,7 +1,19 @@
+#include <pybind11/numpy.h>
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
+#include <algorithm>
+#include <array>
+#include <cctype>
+#include <cmath>
+#include <cstdint>
+#include <cstring>
+#include <exception>
 #include <iostream>
+#include <mutex>
+#include <omp.h>
+#include <stdexcept>
 #include <string>
+#include <unordered_map>
 #include <vector>
 
 using namespace std;
@@ -89,28 +101,1513 @@ int mine() {
   return 42;
 }
 
+/*
+ * Conversion of IQ-TREE's YAML results into Python objects.
+ *
+ * IQ-TREE writes its results as nested block mappings of plain scalars, which
+ * are converted here without a round trip through Python's YAML parser.
+ * Scalars are typed following the YAML 1.1 rules used by yaml.safe_load.
+ * Anything beyond that subset is handed to yaml.safe_load.
+ */
+struct UnsupportedYaml {};
+
+bool is_yaml_null(const string& value) {
+  return value.empty() || value == "~" || value == "null" || value == "Null" ||
+         value == "NULL";
+}
+
+bool is_yaml_true(const string& value) {
+  static const vector<string> true_values = {"yes", "Yes", "YES", "true", "True",
+                                             "TRUE", "on",  "On",  "ON"};
+  return find(true_values.begin(), true_values.end(), value) !=
+         true_values.end();
+}
+
+bool is_yaml_false(const string& value) {
+  static const vector<string> false_values = {
+      "no", "No", "NO", "false", "False", "FALSE", "off", "Off", "OFF"};
+  return find(false_values.begin(), false_values.end(), value) !=
+         false_values.end();
+}
+
+size_t skip_digits(const string& value, size_t pos) {
+  while (pos < value.size() && isdigit(static_cast<unsigned char>(value[pos]))) {
+    ++pos;
+  }
+  return pos;
+}
+
+size_t skip_sign(const string& value, size_t pos) {
+  return pos < value.size() && (value[pos] == '+' || value[pos] == '-') ? pos + 1
+                                                                        : pos;
+}
+
+// [-+]?(0|[1-9][0-9]*)
+bool is_yaml_decimal_int(const string& value) {
+  size_t start = skip_sign(value, 0);
+  size_t end = skip_digits(value, start);
+  if (end == start || end != value.size()) {
+    return false;
+  }
+  return value[start] != '0' || end == start + 1;
+}
+
+// [-+]?[0-9]+\.[0-9]*([eE][-+][0-9]+)? or \.[0-9]+([eE][-+][0-9]+)?
+bool is_yaml_simple_float(const string& value) {
+  size_t start = skip_sign(value, 0);
+  size_t pos = skip_digits(value, start);
+  bool leading_digits = pos > start;
+  if (!leading_digits && start != 0) {
+    return false;
+  }
+  if (pos == value.size() || value[pos] != '.') {
+    return false;
+  }
+  size_t fraction_end = skip_digits(value, pos + 1);
+  if (!leading_digits && fraction_end == pos + 1) {
+    return false;
+  }
+  pos = fraction_end;
+  if (pos < value.size() && (value[pos] == 'e' || value[pos] == 'E')) {
+    if (pos + 1 == value.size() ||
+        (value[pos + 1] != '+' && value[pos + 1] != '-')) {
+      return false;
+    }
+    size_t exponent_end = skip_digits(value, pos + 2);
+    if (exponent_end == pos + 2) {
+      return false;
+    }
+    pos = exponent_end;
+  }
+  return pos == value.size();
+}
+
+// Whether a plain scalar which is not null, bool, a decimal int or a simple
+// float could still be resolved to something other than a string (e.g. hex
+// and octal ints, sexagesimal numbers, timestamps and .inf/.nan).
+bool may_be_special_yaml_scalar(const string& value) {
+  if (strchr("-+0123456789.<=", value[0]) == nullptr) {
+    return false;
+  }
+  bool timestamp_like =
+      value.size() > 4 && skip_digits(value, 0) == 4 && value[4] == '-';
+  return timestamp_like || value.find_first_of(" ,") == string::npos;
+}
+
+py::object yaml_scalar(const string& value) {
+  if (is_yaml_null(value)) {
+    return py::none();
+  }
+  if (is_yaml_true(value)) {
+    return py::bool_(true);
+  }
+  if (is_yaml_false(value)) {
+    return py::bool_(false);
+  }
+  if (is_yaml_decimal_int(value)) {
+    return py::reinterpret_steal<py::object>(
+        PyLong_FromString(value.c_str(), nullptr, 10));
+  }
+  if (is_yaml_simple_float(value)) {
+    return py::float_(py::str(value));
+  }
+  if (may_be_special_yaml_scalar(value)) {
+    return py::module_::import("yaml").attr("safe_load")(value);
+  }
+  return py::str(value);
+}
+
+// Indicators which may not start a plain scalar in block context
+bool starts_with_indicator(const string& value) {
+  if (strchr(",[]{}#&*!|>'\"%@`", value[0]) != nullptr) {
+    return true;
+  }
+  // "-", "?" and ":" only start a plain scalar when followed by a non-space
+  return strchr("-?:", value[0]) != nullptr &&
+         (value.size() == 1 || value[1] == ' ');
+}
+
+py::object parse_yaml_mapping(const string& text) {
+  py::dict root;
+  // the indentation of the keys in each open mapping
+  vector<pair<size_t, py::dict>> open_maps = {{0, root}};
+  // a key whose value is a nested mapping, or null if nothing is nested
+  bool pending = false;
+  py::object pending_key;
+  size_t pending_indent = 0;
+  bool empty = true;
+
+  size_t line_start = 0;
+  while (line_start < text.size()) {
+    size_t line_end = text.find('\n', line_start);
+    if (line_end == string::npos) {
+      line_end = text.size();
+    }
+    string line = text.substr(line_start, line_end - line_start);
+    line_start = line_end + 1;
+
+    size_t last = line.find_last_not_of(" \r");
+    if (last == string::npos) {
+      continue;
+    }
+    line.erase(last + 1);
+    size_t indent = line.find_first_not_of(' ');
+    if (line[indent] == '\t' || line[indent] == '#' ||
+        line.compare(indent, 3, "---") == 0 ||
+        line.compare(indent, 3, "...") == 0) {
+      throw UnsupportedYaml();
+    }
+
+    if (empty) {
+      open_maps.front().first = indent;
+      empty = false;
+    }
+
+    if (pending) {
+      if (indent > pending_indent) {
+        py::dict nested;
+        open_maps.back().second[pending_key] = nested;
+        open_maps.emplace_back(indent, nested);
+      } else {
+        open_maps.back().second[pending_key] = py::none();
+      }
+      pending = false;
+    }
+
+    while (open_maps.size() > 1 && open_maps.back().first > indent) {
+      open_maps.pop_back();
+    }
+    if (open_maps.back().first != indent) {
+      throw UnsupportedYaml();
+    }
+
+    size_t separator = line.find(": ", indent);
+    string key;
+    string value;
+    if (separator != string::npos) {
+      key = line.substr(indent, separator - indent);
+      size_t value_start = line.find_first_not_of(' ', separator + 1);
+      value = line.substr(value_start);
+    } else if (line.back() == ':') {
+      key = line.substr(indent, line.size() - indent - 1);
+    } else {
+      throw UnsupportedYaml();
+    }
+
+    if (key.empty() || key.back() == ' ' || starts_with_indicator(key) ||
+        key.find(" #") != string::npos) {
+      throw UnsupportedYaml();
+    }
+    if (!value.empty() &&
+        (starts_with_indicator(value) || value.back() == ':' ||
+         value.find(": ") != string::npos ||
+         value.find(" #") != string::npos)) {
+      throw UnsupportedYaml();
+    }
+
+    if (value.empty()) {
+      pending = true;
+      pending_key = yaml_scalar(key);
+      pending_indent = indent;
+    } else {
+      open_maps.back().second[yaml_scalar(key)] = yaml_scalar(value);
+    }
+  }
+
+  if (empty) {
+    return py::none();
+  }
+  if (pending) {
+    open_maps.back().second[pending_key] = py::none();
+  }
+  return root;
+}
+
+py::object load_yaml(const string& text) {
+  try {
+    return parse_yaml_mapping(text);
+  } catch (const UnsupportedYaml&) {
+    return py::module_::import("yaml").attr("safe_load")(text);
+  }
+}
+
+/*
+ * Guards IQ-TREE's global state (parameters, log file and random number
+ * generator). Only robinson_fould is free of global state.
+ */
+mutex iqtree_state_mutex;
+
+string random_tree_locked(int num_taxa,
+                          string tree_gen_mode,
+                          int num_trees,
+                          int rand_seed) {
+  lock_guard<mutex> lock(iqtree_state_mutex);
+  return random_tree(num_taxa, tree_gen_mode, num_trees, rand_seed);
+}
+
+string build_tree_locked(vector<string>& names,
+                         vector<string>& seqs,
+                         string model,
+                         int rand_seed,
+                         int bootstrap_rep,
+                         int num_thres) {
+  lock_guard<mutex> lock(iqtree_state_mutex);
+  return build_tree(names, seqs, model, rand_seed, bootstrap_rep, num_thres);
+}
+
+string fit_tree_locked(vector<string>& names,
+                       vector<string>& seqs,
+                       string model,
+                       string intree,
+                       int rand_seed,
+                       int num_thres) {
+  lock_guard<mutex> lock(iqtree_state_mutex);
+  return fit_tree(names, seqs, model, intree, rand_seed, num_thres);
+}
+
+string modelfinder_locked(vector<string>& names,
+                          vector<string>& seqs,
+                          int rand_seed,
+                          string model_set,
+                          string freq_set,
+                          string rate_set,
+                          int num_thres) {
+  lock_guard<mutex> lock(iqtree_state_mutex);
+  return modelfinder(names, seqs, rand_seed, model_set, freq_set, rate_set,
+                     num_thres);
+}
+
+/*
+ * Decodes sequences stored as indices into an alphabet of characters (as a
+ * cogent3 ArrayAlignment stores them), reading the numpy buffer in place
+ */
+vector<string> decode_seqs(const py::array_t<uint8_t>& encoded,
+                           const string& alphabet) {
+  if (encoded.ndim() != 2) {
+    throw runtime_error("Encoded sequences must be a two dimensional array");
+  }
+  auto view = encoded.unchecked<2>();
+  size_t num_seqs = view.shape(0);
+  size_t seq_length = view.shape(1);
+  vector<string> seqs(num_seqs);
+
+  py::gil_scoped_release release;
+  for (size_t i = 0; i < num_seqs; ++i) {
+    string& seq = seqs[i];
+    seq.resize(seq_length);
+    for (size_t j = 0; j < seq_length; ++j) {
+      uint8_t index = view(i, j);
+      if (index >= alphabet.size()) {
+        throw runtime_error("Sequence index " + to_string(index) +
+                            " is outside of the alphabet");
+      }
+      seq[j] = alphabet[index];
+    }
+  }
+  return seqs;
+}
+
+/*
+ * The results of the analyses as Python objects. The GIL is released while
+ * IQ-TREE runs, so that other threads (such as one following the IQ-TREE log
+ * file) can run meanwhile.
+ */
+py::object build_tree_result(vector<string>& names,
+                             vector<string>& seqs,
+                             string model,
+                             int rand_seed,
+                             int bootstrap_rep,
+                             int num_thres) {
+  string result;
+  {
+    py::gil_scoped_release release;
+    result = build_tree_locked(names, seqs, model, rand_seed, bootstrap_rep,
+                               num_thres);
+  }
+  return load_yaml(result);
+}
+
+py::object fit_tree_result(vector<string>& names,
+                           vector<string>& seqs,
+                           string model,
+                           string intree,
+                           int rand_seed,
+                           int num_thres) {
+  string result;
+  {
+    py::gil_scoped_release release;
+    result = fit_tree_locked(names, seqs, model, intree, rand_seed, num_thres);
+  }
+  return load_yaml(result);
+}
+
+py::object modelfinder_result(vector<string>& names,
+                              vector<string>& seqs,
+                              int rand_seed,
+                              string model_set,
+                              string freq_set,
+                              string rate_set,
+                              int num_thres) {
+  string result;
+  {
+    py::gil_scoped_release release;
+    result = modelfinder_locked(names, seqs, rand_seed, model_set, freq_set,
+                                rate_set, num_thres);
+  }
+  return load_yaml(result);
+}
+
+vector<double> build_distmatrix_locked(vector<string>& names,
+                                       vector<string>& seqs,
+                                       int num_thres) {
+  lock_guard<mutex> lock(iqtree_state_mutex);
+  return build_distmatrix(names, seqs, num_thres);
+}
+
+string build_njtree_locked(vector<string>& names, vector<double>& distances) {
+  lock_guard<mutex> lock(iqtree_state_mutex);
+  return build_njtree(names, distances);
+}
+
+/*
+ * A square matrix as a numpy array which takes ownership of the values,
+ * rather than copying them into a Python list
+ */
+py::array_t<double> owned_array(vector<double>&& values,
+                                vector<size_t> shape) {
+  auto* owned = new vector<double>(move(values));
+  py::capsule free_values(
+      owned, [](void* p) { delete static_cast<vector<double>*>(p); });
+  return py::array_t<double>(shape, owned->data(), free_values);
+}
+
+py::array_t<double> square_array(vector<double>&& values, size_t n) {
+  if (values.size() != n * n) {
+    throw runtime_error("Distance matrix does not match the number of sequences");
+  }
+  return owned_array(move(values), {n, n});
+}
+
+py::array_t<double> build_distmatrix_array(vector<string>& names,
+                                           vector<string>& seqs,
+                                           int num_thres) {
+  vector<double> distances;
+  {
+    py::gil_scoped_release release;
+    distances = build_distmatrix_locked(names, seqs, num_thres);
+  }
+  return square_array(move(distances), names.size());
+}
+
+/*
+ * A neighbour-joining tree from a distance matrix in a numpy array (such as a
+ * memory-mapped .npy file) of float32 or float64, either square or condensed
+ * to its upper triangle as in scipy.spatial.distance. IQ-TREE's neighbour
+ * joining updates the distances as it joins nodes, so it takes its own square
+ * matrix of doubles; the array is read once to fill it, without an
+ * intermediate copy in Python.
+ */
+template <typename T, ssize_t Dims>
+vector<double> square_distances(const py::detail::unchecked_reference<T, Dims>& view,
+                                size_t n) {
+  vector<double> distances(n * n, 0.0);
+  if constexpr (Dims == 2) {
+    for (size_t i = 0; i < n; ++i) {
+      for (size_t j = 0; j < n; ++j) {
+        distances[i * n + j] = view(i, j);
+      }
+    }
+  } else {
+    size_t k = 0;
+    for (size_t i = 0; i < n; ++i) {
+      for (size_t j = i + 1; j < n; ++j, ++k) {
+        distances[i * n + j] = distances[j * n + i] = view(k);
+      }
+    }
+  }
+  return distances;
+}
+
+template <typename T>
+string build_njtree_typed(vector<string>& names, const py::array& matrix) {
+  // the views are taken while holding the GIL
+  size_t n = names.size();
+  if (matrix.ndim() == 2) {
+    auto view = matrix.unchecked<T, 2>();
+    py::gil_scoped_release release;
+    vector<double> distances = square_distances(view, n);
+    return build_njtree_locked(names, distances);
+  }
+  auto view = matrix.unchecked<T, 1>();
+  py::gil_scoped_release release;
+  vector<double> distances = square_distances(view, n);
+  return build_njtree_locked(names, distances);
+}
+
+string build_njtree_array(vector<string>& names, const py::array& matrix) {
+  size_t n = names.size();
+  if (matrix.ndim() == 2) {
+    if (static_cast<size_t>(matrix.shape(0)) != n ||
+        static_cast<size_t>(matrix.shape(1)) != n) {
+      throw runtime_error(
+          "Distance matrix does not match the number of sequences");
+    }
+  } else if (matrix.ndim() == 1) {
+    if (static_cast<size_t>(matrix.shape(0)) != n * (n - 1) / 2) {
+      throw runtime_error(
+          "Condensed distance matrix does not match the number of sequences");
+    }
+  } else {
+    throw runtime_error("Distance matrix must be square or condensed");
+  }
+
+  if (matrix.dtype().is(py::dtype::of<double>())) {
+    return build_njtree_typed<double>(names, matrix);
+  }
+  if (matrix.dtype().is(py::dtype::of<float>())) {
+    return build_njtree_typed<float>(names, matrix);
+  }
+  throw runtime_error("Distance matrix must be of float32 or float64");
+}
+
+/*
+ * A neighbour-joining tree from the JC distances of an alignment, without
+ * the distance matrix leaving native memory
+ */
+string build_jc_njtree_locked(vector<string>& names,
+                              vector<string>& seqs,
+                              int num_thres) {
+  lock_guard<mutex> lock(iqtree_state_mutex);
+  vector<double> distances = build_distmatrix(names, seqs, num_thres);
+  return build_njtree(names, distances);
+}
+
+string build_jc_njtree(vector<string>& names,
+                       vector<string>& seqs,
+                       int num_thres) {
+  py::gil_scoped_release release;
+  return build_jc_njtree_locked(names, seqs, num_thres);
+}
+
+/*
+ * An alignment held in native memory, so that several analyses of it need
+ * not convert the sequences from Python objects each time
+ */
+struct NativeAlignment {
+  vector<string> names;
+  vector<string> seqs;
+
+  NativeAlignment(vector<string> names, vector<string> seqs)
+      : names(move(names)), seqs(move(seqs)) {
+    if (this->names.size() != this->seqs.size()) {
+      throw runtime_error("The number of names and sequences must match");
+    }
+  }
+};
+
+/*
+ * Overloads taking the sequences as a native alignment
+ */
+py::object build_tree_native(NativeAlignment& aln,
+                             string model,
+                             int rand_seed,
+                             int bootstrap_rep,
+                             int num_thres) {
+  return build_tree_result(aln.names, aln.seqs, model, rand_seed,
+                           bootstrap_rep, num_thres);
+}
+
+py::object fit_tree_native(NativeAlignment& aln,
+                           string model,
+                           string intree,
+                           int rand_seed,
+                           int num_thres) {
+  return fit_tree_result(aln.names, aln.seqs, model, intree, rand_seed,
+                         num_thres);
+}
+
+py::object modelfinder_native(NativeAlignment& aln,
+                              int rand_seed,
+                              string model_set,
+                              string freq_set,
+                              string rate_set,
+                              int num_thres) {
+  return modelfinder_result(aln.names, aln.seqs, rand_seed, model_set,
+                            freq_set, rate_set, num_thres);
+}
+
+py::array_t<double> build_distmatrix_native(NativeAlignment& aln,
+                                            int num_thres) {
+  return build_distmatrix_array(aln.names, aln.seqs, num_thres);
+}
+
+string build_jc_njtree_native(NativeAlignment& aln, int num_thres) {
+  return build_jc_njtree(aln.names, aln.seqs, num_thres);
+}
+
+/*
+ * Overloads taking the sequences as a numpy array of indices into an alphabet
+ */
+py::object build_tree_encoded(vector<string>& names,
+                              const py::array_t<uint8_t>& encoded,
+                              const string& alphabet,
+                              string model,
+                              int rand_seed,
+                              int bootstrap_rep,
+                              int num_thres) {
+  vector<string> seqs = decode_seqs(encoded, alphabet);
+  return build_tree_result(names, seqs, model, rand_seed, bootstrap_rep,
+                           num_thres);
+}
+
+py::object fit_tree_encoded(vector<string>& names,
+                            const py::array_t<uint8_t>& encoded,
+                            const string& alphabet,
+                            string model,
+                            string intree,
+                            int rand_seed,
+                            int num_thres) {
+  vector<string> seqs = decode_seqs(encoded, alphabet);
+  return fit_tree_result(names, seqs, model, intree, rand_seed, num_thres);
+}
+
+py::object modelfinder_encoded(vector<string>& names,
+                               const py::array_t<uint8_t>& encoded,
+                               const string& alphabet,
+                               int rand_seed,
+                               string model_set,
+                               string freq_set,
+                               string rate_set,
+                               int num_thres) {
+  vector<string> seqs = decode_seqs(encoded, alphabet);
+  return modelfinder_result(names, seqs, rand_seed, model_set, freq_set,
+                            rate_set, num_thres);
+}
+
+py::array_t<double> build_distmatrix_encoded(vector<string>& names,
+                                             const py::array_t<uint8_t>& encoded,
+                                             const string& alphabet,
+                                             int num_thres) {
+  vector<string> seqs = decode_seqs(encoded, alphabet);
+  return build_distmatrix_array(names, seqs, num_thres);
+}
+
+string build_jc_njtree_encoded(vector<string>& names,
+                               const py::array_t<uint8_t>& encoded,
+                               const string& alphabet,
+                               int num_thres) {
+  vector<string> seqs = decode_seqs(encoded, alphabet);
+  return build_jc_njtree(names, seqs, num_thres);
+}
+
+/*
+ * Robinson-Foulds distances computed from the bipartitions (splits) of each
+ * tree. Every tree is parsed once, and each split is stored as a bitset over
+ * the tips, normalised to exclude the first tip so that a split and its
+ * complement are identical.
+ */
+int resolve_num_threads(int num_thres) {
+  return num_thres > 0 ? num_thres : omp_get_num_procs();
+}
+
+/*
+ * Runs body(i) for i in [0, count) across num_thres threads, rethrowing the
+ * first exception raised
+ */
+template <typename Body>
+void parallel_for(size_t count, int num_thres, const Body& body) {
+  exception_ptr error = nullptr;
+#pragma omp parallel for schedule(dynamic) num_threads(num_thres)
+  for (long long i = 0; i < static_cast<long long>(count); ++i) {
+    try {
+      body(static_cast<size_t>(i));
+    } catch (...) {
+#pragma omp critical
+      if (!error) {
+        error = current_exception();
+      }
+    }
+  }
+  if (error) {
+    rethrow_exception(error);
+  }
+}
+
+/*
+ * Walks a newick string, calling open() at the start of each clade, leaf()
+ * with the label of each tip and close() at the end of each clade. Returns
+ * the number of children of the root.
+ */
+template <typename Visitor>
+size_t walk_newick(const string& newick, Visitor& visitor) {
+  const size_t size = newick.size();
+  size_t pos = 0;
+
+  auto skip_comment = [&]() {
+    size_t end = newick.find(']', pos);
+    if (end == string::npos) {
+      throw runtime_error("Unterminated comment in newick string");
+    }
+    pos = end + 1;
+  };
+  auto is_delimiter = [](char c) {
+    return c == '(' || c == ')' || c == ',' || c == ':' || c == ';' ||
+           c == '[';
+  };
+  auto read_label = [&]() {
+    string label;
+    if (pos < size && newick[pos] == '\'') {
+      for (++pos; pos < size; ++pos) {
+        if (newick[pos] == '\'') {
+          if (pos + 1 < size && newick[pos + 1] == '\'') {
+            label += '\'';
+            ++pos;
+            continue;
+          }
+          ++pos;
+          return label;
+        }
+        label += newick[pos];
+      }
+      throw runtime_error("Unterminated quoted label in newick string");
+    }
+    size_t start = pos;
+    while (pos < size && !is_delimiter(newick[pos])) {
+      ++pos;
+    }
+    size_t end = pos;
+    while (start < end && isspace(static_cast<unsigned char>(newick[start]))) {
+      ++start;
+    }
+    while (end > start && isspace(static_cast<unsigned char>(newick[end - 1]))) {
+      --end;
+    }
+    return newick.substr(start, end - start);
+  };
+
+  size_t depth = 0;
+  size_t root_children = 0;
+  while (pos < size) {
+    char c = newick[pos];
+    if (isspace(static_cast<unsigned char>(c)) || c == ',') {
+      ++pos;
+    } else if (c == '[') {
+      skip_comment();
+    } else if (c == '(') {
+      root_children += depth == 1;
+      ++depth;
+      visitor.open();
+      ++pos;
+    } else if (c == ')') {
+      if (depth == 0) {
+        throw runtime_error("Unbalanced parentheses in newick string");
+      }
+      --depth;
+      visitor.close();
+      ++pos;
+      read_label();  // internal node labels are not part of the topology
+    } else if (c == ':') {
+      // skip the branch length
+      for (++pos; pos < size && !is_delimiter(newick[pos]); ++pos) {
+      }
+    } else if (c == ';') {
+      break;
+    } else {
+      root_children += depth == 1;
+      visitor.leaf(read_label());
+    }
+  }
+  if (depth != 0) {
+    throw runtime_error("Unbalanced parentheses in newick string");
+  }
+  return root_children;
+}
+
+/*
+ * As in IQ-TREE, a tree with two children at the root is rooted, and its
+ * root is treated as an extra tip so that the position of the root matters
+ */
+bool is_rooted(size_t root_children) {
+  return root_children == 2;
+}
+
+struct TipCollector {
+  unordered_map<string, size_t> tips;
+
+  void open() {}
+  void close() {}
+  void leaf(const string& label) {
+    if (!tips.emplace(label, tips.size()).second) {
+      throw runtime_error("Duplicate tip name in tree: " + label);
+    }
+  }
+};
+
+/*
+ * The sorted, distinct non-trivial splits of a tree
+ */
+struct TreeSplits {
+  size_t num_splits = 0;
+  vector<uint64_t> words;  // num_splits consecutive bitsets
+};
+
+class SplitCollector {
+ public:
+  SplitCollector(const unordered_map<string, size_t>& tips, bool rooted)
+      : tips(tips),
+        rooted(rooted),
+        num_tips(tips.size() + rooted),
+        num_words((num_tips + 63) / 64),
+        seen(num_words, 0) {}
+
+  void open() {
+    if (depth == clades.size()) {
+      clades.emplace_back(num_words, 0);
+    } else {
+      fill(clades[depth].begin(), clades[depth].end(), 0);
+    }
+    ++depth;
+  }
+
+  void leaf(const string& label) {
+    auto found = tips.find(label);
+    if (found == tips.end()) {
+      throw runtime_error("Trees must have the same tips, unexpected tip: " +
+                          label);
+    }
+    size_t word = found->second / 64;
+    uint64_t bit = uint64_t(1) << (found->second % 64);
+    if (seen[word] & bit) {
+      throw runtime_error("Duplicate tip name in tree: " + label);
+    }
+    seen[word] |= bit;
+    ++num_seen;
+    if (depth > 0) {
+      clades[depth - 1][word] |= bit;
+    }
+  }
+
+  void close() {
+    --depth;
+    vector<uint64_t>& clade = clades[depth];
+    if (depth > 0) {
+      vector<uint64_t>& parent = clades[depth - 1];
+      for (size_t w = 0; w < num_words; ++w) {
+        parent[w] |= clade[w];
+      }
+    }
+
+    size_t count = 0;
+    for (uint64_t word : clade) {
+      count += popcount(word);
+    }
+    if (clade[0] & 1) {
+      for (size_t w = 0; w < num_words; ++w) {
+        clade[w] = ~clade[w];
+      }
+      if (num_tips % 64 != 0) {
+        clade[num_words - 1] &= (uint64_t(1) << (num_tips % 64)) - 1;
+      }
+      count = num_tips - count;
+    }
+    if (count >= 2 && count + 2 <= num_tips) {
+      splits.push_back(clade);
+    }
+  }
+
+  TreeSplits finish(size_t root_children) {
+    if (num_seen != tips.size()) {
+      throw runtime_error("Trees must have the same tips");
+    }
+    if (is_rooted(root_children) != rooted) {
+      throw runtime_error("Cannot compare rooted and unrooted trees");
+    }
+    sort(splits.begin(), splits.end());
+    splits.erase(unique(splits.begin(), splits.end()), splits.end());
+
+    TreeSplits result;
+    result.num_splits = splits.size();
+    result.words.reserve(splits.size() * num_words);
+    for (const auto& split : splits) {
+      result.words.insert(result.words.end(), split.begin(), split.end());
+    }
+    return result;
+  }
+
+ private:
+  static size_t popcount(uint64_t word) {
+    size_t count = 0;
+    for (; word; word &= word - 1) {
+      ++count;
+    }
+    return count;
+  }
+
+  const unordered_map<string, size_t>& tips;
+  bool rooted;
+  size_t num_tips;
+  size_t num_words;
+  vector<uint64_t> seen;
+  size_t num_seen = 0;
+  vector<vector<uint64_t>> clades;
+  size_t depth = 0;
+  vector<vector<uint64_t>> splits;
+};
+
+/*
+ * The tips of a tree, which every tree compared with it must share
+ */
+struct TreeTips {
+  unordered_map<string, size_t> tips;
+  bool rooted;
+
+  explicit TreeTips(const string& newick) {
+    TipCollector collector;
+    rooted = is_rooted(walk_newick(newick, collector));
+    tips = move(collector.tips);
+  }
+
+  size_t num_words() const { return (tips.size() + rooted + 63) / 64; }
+};
+
+vector<TreeSplits> tree_splits(const vector<string>& newicks,
+                               const TreeTips& tips,
+                               int num_thres) {
+  vector<TreeSplits> splits(newicks.size());
+  parallel_for(newicks.size(), num_thres, [&](size_t i) {
+    SplitCollector collector(tips.tips, tips.rooted);
+    splits[i] = collector.finish(walk_newick(newicks[i], collector));
+  });
+  return splits;
+}
+
+double split_distance(const TreeSplits& a,
+                      const TreeSplits& b,
+                      size_t num_words) {
+  // both split sets are sorted, so the shared splits are found by merging
+  size_t i = 0;
+  size_t j = 0;
+  size_t shared = 0;
+  while (i < a.num_splits && j < b.num_splits) {
+    const uint64_t* x = &a.words[i * num_words];
+    const uint64_t* y = &b.words[j * num_words];
+    size_t w = 0;
+    while (w < num_words && x[w] == y[w]) {
+      ++w;
+    }
+    if (w == num_words) {
+      ++shared;
+      ++i;
+      ++j;
+    } else if (x[w] < y[w]) {
+      ++i;
+    } else {
+      ++j;
+    }
+  }
+  return static_cast<double>(a.num_splits + b.num_splits - 2 * shared);
+}
+
+/*
+ * Robinson-Foulds distances between all pairs of trees, either as a square
+ * matrix or condensed to the upper triangle (in the order used by scipy)
+ */
+py::array_t<double> rf_all_pairs(const vector<string>& newicks,
+                                 bool condensed,
+                                 int num_thres) {
+  const size_t n = newicks.size();
+  vector<double> distances(condensed ? n * (n > 0 ? n - 1 : 0) / 2 : n * n,
+                           0.0);
+  if (n > 0) {
+    py::gil_scoped_release release;
+    num_thres = resolve_num_threads(num_thres);
+    TreeTips tips(newicks[0]);
+    size_t num_words = tips.num_words();
+    auto splits = tree_splits(newicks, tips, num_thres);
+
+    parallel_for(n, num_thres, [&](size_t i) {
+      // the position of (i, i + 1) in the condensed upper triangle
+      size_t k = n * i - i * (i + 1) / 2;
+      for (size_t j = i + 1; j < n; ++j, ++k) {
+        double rf = split_distance(splits[i], splits[j], num_words);
+        if (condensed) {
+          distances[k] = rf;
+        } else {
+          distances[i * n + j] = rf;
+          distances[j * n + i] = rf;
+        }
+      }
+    });
+  }
+  if (condensed) {
+    size_t num_pairs = distances.size();
+    return owned_array(move(distances), {num_pairs});
+  }
+  return owned_array(move(distances), {n, n});
+}
+
+/*
+ * Robinson-Foulds distances from one tree to each of a collection of trees
+ */
+py::array_t<double> rf_one_to_many(const string& reference,
+                                   const vector<string>& newicks,
+                                   int num_thres) {
+  const size_t n = newicks.size();
+  vector<double> distances(n, 0.0);
+  {
+    py::gil_scoped_release release;
+    num_thres = resolve_num_threads(num_thres);
+    TreeTips tips(reference);
+    size_t num_words = tips.num_words();
+    auto splits = tree_splits(newicks, tips, num_thres);
+    auto reference_splits = tree_splits({reference}, tips, 1)[0];
+
+    parallel_for(n, num_thres, [&](size_t i) {
+      distances[i] = split_distance(reference_splits, splits[i], num_words);
+    });
+  }
+  return owned_array(move(distances), {n});
+}
+
+/*
+ * Pairwise distances estimated natively from the counts of the pairs of states
+ * at the sites where both sequences have one of the given states, so gaps and
+ * ambiguities are deleted pairwise. Each state is coded by its position in the
+ * given states, and other characters by the number of states.
+ */
+enum class DistanceMethod { P, JC, K2P, TN93, LOGDET, POISSON };
+
+DistanceMethod distance_method(const string& method) {
+  if (method == "p") {
+    return DistanceMethod::P;
+  }
+  if (method == "jc69") {
+    return DistanceMethod::JC;
+  }
+  if (method == "k2p") {
+    return DistanceMethod::K2P;
+  }
+  if (method == "tn93") {
+    return DistanceMethod::TN93;
+  }
+  if (method == "logdet") {
+    return DistanceMethod::LOGDET;
+  }
+  if (method == "poisson") {
+    return DistanceMethod::POISSON;
+  }
+  throw runtime_error("Unknown distance method " + method);
+}
+
+array<uint8_t, 256> state_codes(const string& states) {
+  if (states.empty() || states.size() > 254) {
+    throw runtime_error("There must be between 1 and 254 states");
+  }
+  array<uint8_t, 256> codes;
+  codes.fill(static_cast<uint8_t>(states.size()));
+  for (size_t i = 0; i < states.size(); ++i) {
+    unsigned char state = states[i];
+    codes[toupper(state)] = static_cast<uint8_t>(i);
+    codes[tolower(state)] = static_cast<uint8_t>(i);
+  }
+  return codes;
+}
+
+/*
+ * The coded sequences, one after another
+ */
+struct CodedSeqs {
+  size_t num_seqs;
+  size_t seq_length;
+  size_t num_states;
+  vector<uint8_t> codes;
+
+  const uint8_t* seq(size_t i) const { return codes.data() + i * seq_length; }
+};
+
+CodedSeqs code_seqs(const vector<string>& seqs, const string& states) {
+  auto codes = state_codes(states);
+  size_t seq_length = seqs.empty() ? 0 : seqs[0].size();
+  CodedSeqs coded{seqs.size(), seq_length, states.size(),
+                  vector<uint8_t>(seqs.size() * seq_length)};
+  for (size_t i = 0; i < seqs.size(); ++i) {
+    if (seqs[i].size() != seq_length) {
+      throw runtime_error("The sequences must all have the same length");
+    }
+    uint8_t* out = coded.codes.data() + i * seq_length;
+    for (size_t j = 0; j < seq_length; ++j) {
+      out[j] = codes[static_cast<unsigned char>(seqs[i][j])];
+    }
+  }
+  return coded;
+}
+
+CodedSeqs code_encoded_seqs(const py::array_t<uint8_t>& encoded,
+                            const string& alphabet,
+                            const string& states) {
+  if (encoded.ndim() != 2) {
+    throw runtime_error("Encoded sequences must be a two dimensional array");
+  }
+  auto codes = state_codes(states);
+  // the code of each index into the alphabet
+  array<uint8_t, 256> index_codes;
+  index_codes.fill(static_cast<uint8_t>(states.size()));
+  for (size_t i = 0; i < alphabet.size() && i < index_codes.size(); ++i) {
+    index_codes[i] = codes[static_cast<unsigned char>(alphabet[i])];
+  }
+
+  auto view = encoded.unchecked<2>();
+  size_t num_seqs = view.shape(0);
+  size_t seq_length = view.shape(1);
+  CodedSeqs coded{num_seqs, seq_length, states.size(),
+                  vector<uint8_t>(num_seqs * seq_length)};
+
+  py::gil_scoped_release release;
+  for (size_t i = 0; i < num_seqs; ++i) {
+    uint8_t* out = coded.codes.data() + i * seq_length;
+    for (size_t j = 0; j < seq_length; ++j) {
+      uint8_t index = view(i, j);
+      if (index >= alphabet.size()) {
+        throw runtime_error("Sequence index " + to_string(index) +
+                            " is outside of the alphabet");
+      }
+      out[j] = index_codes[index];
+    }
+  }
+  return coded;
+}
+
+/*
+ * The proportion of differences, from the numbers of sites compared and
+ * differing
+ */
+double p_distance(const CodedSeqs& coded, size_t i, size_t j) {
+  const uint8_t* a = coded.seq(i);
+  const uint8_t* b = coded.seq(j);
+  const uint8_t missing = static_cast<uint8_t>(coded.num_states);
+  size_t compared = 0;
+  size_t differing = 0;
+  for (size_t k = 0; k < coded.seq_length; ++k) {
+    size_t both = (a[k] < missing) & (b[k] < missing);
+    compared += both;
+    differing += both & (a[k] != b[k]);
+  }
+  return compared == 0 ? NAN
+                       : static_cast<double>(differing) / compared;
+}
+
+/*
+ * The proportions of each pair of nucleotides (in the order A, C, G, T) over
+ * the sites compared, setting compared to whether any sites are
+ */
+array<double, 16> nucleotide_pairs(const CodedSeqs& coded,
+                                   size_t i,
+                                   size_t j,
+                                   bool& compared) {
+  const uint8_t* a = coded.seq(i);
+  const uint8_t* b = coded.seq(j);
+  // the missing code (4) has its own row and column, ignored afterwards
+  array<size_t, 25> counts{};
+  for (size_t k = 0; k < coded.seq_length; ++k) {
+    ++counts[a[k] * 5 + b[k]];
+  }
+
+  size_t total = 0;
+  for (size_t x = 0; x < 4; ++x) {
+    for (size_t y = 0; y < 4; ++y) {
+      total += counts[x * 5 + y];
+    }
+  }
+  array<double, 16> pairs{};
+  compared = total > 0;
+  if (compared) {
+    for (size_t x = 0; x < 4; ++x) {
+      for (size_t y = 0; y < 4; ++y) {
+        pairs[x * 4 + y] = static_cast<double>(counts[x * 5 + y]) / total;
+      }
+    }
+  }
+  return pairs;
+}
+
+double transversions(const array<double, 16>& pairs) {
+  // with the order A, C, G, T, purines have even and pyrimidines odd codes
+  double total = 0.0;
+  for (size_t x = 0; x < 4; ++x) {
+    for (size_t y = 0; y < 4; ++y) {
+      if (x % 2 != y % 2) {
+        total += pairs[x * 4 + y];
+      }
+    }
+  }
+  return total;
+}
+
+double k2p_distance(const array<double, 16>& pairs) {
+  // transitions are A <-> G and C <-> T
+  double p = pairs[0 * 4 + 2] + pairs[2 * 4 + 0] + pairs[1 * 4 + 3] +
+             pairs[3 * 4 + 1];
+  double q = transversions(pairs);
+  double a = 1.0 - 2.0 * p - q;
+  double b = 1.0 - 2.0 * q;
+  if (a <= 0.0 || b <= 0.0) {
+    return NAN;
+  }
+  return -0.5 * log(a) - 0.25 * log(b);
+}
+
+double tn93_distance(const array<double, 16>& pairs) {
+  // the frequencies of each nucleotide in the pair of sequences
+  array<double, 4> freqs{};
+  for (size_t x = 0; x < 4; ++x) {
+    for (size_t y = 0; y < 4; ++y) {
+      freqs[x] += pairs[x * 4 + y] / 2.0;
+      freqs[y] += pairs[x * 4 + y] / 2.0;
+    }
+  }
+  double a = freqs[0], c = freqs[1], g = freqs[2], t = freqs[3];
+  double purines = a + g;
+  double pyrimidines = c + t;
+  double ag = pairs[0 * 4 + 2] + pairs[2 * 4 + 0];
+  double ct = pairs[1 * 4 + 3] + pairs[3 * 4 + 1];
+  double q = transversions(pairs);
+  if (a * g <= 0.0 || c * t <= 0.0) {
+    return NAN;
+  }
+
+  double w1 = 1.0 - purines / (2.0 * a * g) * ag - q / (2.0 * purines);
+  double w2 = 1.0 - pyrimidines / (2.0 * c * t) * ct -
+              q / (2.0 * pyrimidines);
+  double w3 = 1.0 - q / (2.0 * purines * pyrimidines);
+  if (w1 <= 0.0 || w2 <= 0.0 || w3 <= 0.0) {
+    return NAN;
+  }
+  return -2.0 * a * g / purines * log(w1) -
+         2.0 * c * t / pyrimidines * log(w2) -
+         2.0 *
+             (purines * pyrimidines - a * g * pyrimidines / purines -
+              c * t * purines / pyrimidines) *
+             log(w3);
+}
+
+double determinant4(array<double, 16> m) {
+  // Gaussian elimination with partial pivoting
+  double det = 1.0;
+  for (size_t col = 0; col < 4; ++col) {
+    size_t pivot = col;
+    for (size_t row = col + 1; row < 4; ++row) {
+      if (fabs(m[row * 4 + col]) > fabs(m[pivot * 4 + col])) {
+        pivot = row;
+      }
+    }
+    if (m[pivot * 4 + col] == 0.0) {
+      return 0.0;
+    }
+    if (pivot != col) {
+      for (size_t k = 0; k < 4; ++k) {
+        swap(m[pivot * 4 + k], m[col * 4 + k]);
+      }
+      det = -det;
+    }
+    det *= m[col * 4 + col];
+    for (size_t row = col + 1; row < 4; ++row) {
+      double factor = m[row * 4 + col] / m[col * 4 + col];
+      for (size_t k = col; k < 4; ++k) {
+        m[row * 4 + k] -= factor * m[col * 4 + k];
+      }
+    }
+  }
+  return det;
+}
+
+double logdet_distance(const array<double, 16>& pairs) {
+  // the symmetric form of Lockhart et al. (1994), also known as paralinear
+  double det = determinant4(pairs);
+  double log_freqs = 0.0;
+  for (size_t x = 0; x < 4; ++x) {
+    double row = 0.0;
+    double col = 0.0;
+    for (size_t y = 0; y < 4; ++y) {
+      row += pairs[x * 4 + y];
+      col += pairs[y * 4 + x];
+    }
+    if (row <= 0.0 || col <= 0.0) {
+      return NAN;
+    }
+    log_freqs += log(row) + log(col);
+  }
+  if (det <= 0.0) {
+    return NAN;
+  }
+  return -0.25 * (log(det) - 0.5 * log_freqs);
+}
+
+double pair_distance(const CodedSeqs& coded,
+                     DistanceMethod method,
+                     size_t i,
+                     size_t j) {
+  if (method == DistanceMethod::P || method == DistanceMethod::JC ||
+      method == DistanceMethod::POISSON) {
+    double p = p_distance(coded, i, j);
+    if (method == DistanceMethod::P) {
+      return p;
+    }
+    if (method == DistanceMethod::POISSON) {
+      return p < 1.0 ? -log(1.0 - p) : NAN;
+    }
+    // Jukes-Cantor for any number of states, in the form used by IQ-TREE
+    double z = static_cast<double>(coded.num_states) / (coded.num_states - 1);
+    double x = 1.0 - z * p;
+    return x > 0.0 ? -log(x) / z : NAN;
+  }
+
+  bool compared;
+  auto pairs = nucleotide_pairs(coded, i, j, compared);
+  if (!compared) {
+    return NAN;
+  }
+  switch (method) {
+    case DistanceMethod::K2P:
+      return k2p_distance(pairs);
+    case DistanceMethod::TN93:
+      return tn93_distance(pairs);
+    default:
+      return logdet_distance(pairs);
+  }
+}
+
+DistanceMethod coded_method(const CodedSeqs& coded, const string& method_name) {
+  DistanceMethod method = distance_method(method_name);
+  if (method != DistanceMethod::P && method != DistanceMethod::JC &&
+      method != DistanceMethod::POISSON && coded.num_states != 4) {
+    throw runtime_error("The " + method_name +
+                        " distance requires four nucleotide states");
+  }
+  return method;
+}
+
+py::array_t<double> coded_distances(const CodedSeqs& coded,
+                                    const string& method_name,
+                                    int num_thres) {
+  DistanceMethod method = coded_method(coded, method_name);
+
+  const size_t n = coded.num_seqs;
+  vector<double> distances(n * n, 0.0);
+  {
+    py::gil_scoped_release release;
+    parallel_for(n, resolve_num_threads(num_thres), [&](size_t i) {
+      for (size_t j = i + 1; j < n; ++j) {
+        double d = pair_distance(coded, method, i, j);
+        distances[i * n + j] = d;
+        distances[j * n + i] = d;
+      }
+    });
+  }
+  return owned_array(move(distances), {n, n});
+}
+
+py::array_t<double> pairwise_distances(vector<string>& names,
+                                       vector<string>& seqs,
+                                       const string& states,
+                                       const string& method,
+                                       int num_thres) {
+  if (names.size() != seqs.size()) {
+    throw runtime_error("The number of names and sequences must match");
+  }
+  CodedSeqs coded;
+  {
+    py::gil_scoped_release release;
+    coded = code_seqs(seqs, states);
+  }
+  return coded_distances(coded, method, num_thres);
+}
+
+py::array_t<double> pairwise_distances_encoded(
+    vector<string>& names,
+    const py::array_t<uint8_t>& encoded,
+    const string& alphabet,
+    const string& states,
+    const string& method,
+    int num_thres) {
+  CodedSeqs coded = code_encoded_seqs(encoded, alphabet, states);
+  if (names.size() != coded.num_seqs) {
+    throw runtime_error("The number of names and sequences must match");
+  }
+  return coded_distances(coded, method, num_thres);
+}
+
+py::array_t<double> pairwise_distances_native(NativeAlignment& aln,
+                                              const string& states,
+                                              const string& method,
+                                              int num_thres) {
+  return pairwise_distances(aln.names, aln.seqs, states, method, num_thres);
+}
+
+/*
+ * Rows of the distance matrix from the start row, written in place into a
+ * float32 array (such as a slice of a memory-mapped file) so that the whole
+ * matrix need never be held in memory. Each pair in the rows is estimated, so
+ * blocks are independent, unless upper is set, when only the columns from the
+ * diagonal on are written, leaving the rest to be mirrored by the caller.
+ */
+void distance_rows(const CodedSeqs& coded,
+                   const string& method_name,
+                   size_t start,
+                   py::array_t<float, py::array::c_style>& out,
+                   bool upper,
+                   int num_thres) {
+  DistanceMethod method = coded_method(coded, method_name);
+  const size_t n = coded.num_seqs;
+  if (out.ndim() != 2 || static_cast<size_t>(out.shape(1)) != n) {
+    throw runtime_error("The rows must have a column for each sequence");
+  }
+  const size_t num_rows = out.shape(0);
+  if (start + num_rows > n) {
+    throw runtime_error("The rows extend beyond the number of sequences");
+  }
+  auto rows = out.mutable_unchecked<2>();
+
+  py::gil_scoped_release release;
+  parallel_for(num_rows, resolve_num_threads(num_thres), [&](size_t r) {
+    size_t i = start + r;
+    for (size_t j = upper ? i : 0; j < n; ++j) {
+      rows(r, j) = i == j ? 0.0f
+                          : static_cast<float>(pair_distance(coded, method, i, j));
+    }
+  });
+}
+
 PYBIND11_MODULE(_piqtree, m) {
   m.doc() = "piqtree - Unlock the Power of IQ-TREE 2 with Python!";
 
   m.attr("__iqtree_version__") = version();
 
+  // The lightweight functions release the GIL so other Python threads may run
+  // while they do. Those touching IQ-TREE's global state are serialised.
   m.def("iq_robinson_fould", &robinson_fould,
-        "Calculates the robinson fould distance between two trees");
-  m.def("iq_random_tree", &random_tree,
+        "Calculates the robinson fould distance between two trees",
+        py::call_guard<py::gil_scoped_release>());
+  m.def("iq_rf_all_pairs", &rf_all_pairs,
+        "Robinson-Foulds distances between all pairs of trees, as a square "
+        "matrix or condensed to the upper triangle.");
+  m.def("iq_rf_one_to_many", &rf_one_to_many,
+        "Robinson-Foulds distances from a reference tree to each of a "
+        "collection of trees.");
+  m.def("iq_random_tree", &random_tree_locked,
         "Generates a set of random phylogenetic trees. tree_gen_mode "
         "allows:\"YULE_HARDING\", \"UNIFORM\", \"CATERPILLAR\", \"BALANCED\", "
-        "\"BIRTH_DEATH\", \"STAR_TREE\".");
-  m.def("iq_build_tree", &build_tree,
+        "\"BIRTH_DEATH\", \"STAR_TREE\".",
+        py::call_guard<py::gil_scoped_release>());
+  py::class_<NativeAlignment>(m, "NativeAlignment",
+                              "An alignment held in native memory.")
+      .def(py::init<vector<string>, vector<string>>())
+      .def(py::init([](vector<string> names,
+                       const py::array_t<uint8_t>& encoded,
+                       const string& alphabet) {
+        return NativeAlignment(move(names), decode_seqs(encoded, alphabet));
+      }))
+      .def_readonly("names", &NativeAlignment::names)
+      .def_readonly("seqs", &NativeAlignment::seqs)
+      .def_property_readonly(
+          "seq_len",
+          [](const NativeAlignment& aln) {
+            return aln.seqs.empty() ? 0 : aln.seqs[0].size();
+          })
+      .def(py::pickle(
+          [](const NativeAlignment& aln) {
+            return py::make_tuple(aln.names, aln.seqs);
+          },
+          [](const py::tuple& state) {
+            return NativeAlignment(state[0].cast<vector<string>>(),
+                                   state[1].cast<vector<string>>());
+          }));
+
+  // Functions taking an alignment accept the sequences either as strings, as
+  // a numpy array of indices into an alphabet followed by the alphabet, or as
+  // a NativeAlignment.
+  m.def("iq_build_tree", &build_tree_result,
         "Perform phylogenetic analysis on the input alignment (in string "
         "format). With estimation of the best topology.");
-  m.def("iq_fit_tree", &fit_tree,
+  m.def("iq_build_tree", &build_tree_encoded,
+        "Perform phylogenetic analysis on the input alignment (as an encoded "
+        "array). With estimation of the best topology.");
+  m.def("iq_build_tree", &build_tree_native,
+        "Perform phylogenetic analysis on the input alignment (as a native "
+        "alignment). With estimation of the best topology.");
+  m.def("iq_fit_tree", &fit_tree_result,
         "Perform phylogenetic analysis on the input alignment (in string "
         "format). With restriction to the input toplogy.");
-  m.def("iq_model_finder", &modelfinder,
+  m.def("iq_fit_tree", &fit_tree_encoded,
+        "Perform phylogenetic analysis on the input alignment (as an encoded "
+        "array). With restriction to the input toplogy.");
+  m.def("iq_fit_tree", &fit_tree_native,
+        "Perform phylogenetic analysis on the input alignment (as a native "
+        "alignment). With restriction to the input toplogy.");
+  m.def("iq_model_finder", &modelfinder_result,
         "Find optimal model for an alignment.");
-  m.def("iq_jc_distances", &build_distmatrix,
+  m.def("iq_model_finder", &modelfinder_encoded,
+        "Find optimal model for an alignment (as an encoded array).");
+  m.def("iq_model_finder", &modelfinder_native,
+        "Find optimal model for an alignment (as a native alignment).");
+  m.def("iq_jc_distances", &build_distmatrix_array,
         "Construct pairwise distance matrix for alignment.");
-  m.def("iq_nj_tree", &build_njtree,
-        "Build neighbour-joining tree from distance matrix.");
+  m.def("iq_jc_distances", &build_distmatrix_encoded,
+        "Construct pairwise distance matrix for alignment (as an encoded "
+        "array).");
+  m.def("iq_jc_distances", &build_distmatrix_native,
+        "Construct pairwise distance matrix for alignment (as a native "
+        "alignment).");
+  m.def("iq_nj_tree", &build_njtree_array,
+        "Build neighbour-joining tree from distance matrix (as a square or "
+        "condensed numpy array).");
+  m.def("iq_nj_tree", &build_njtree_locked,
+        "Build neighbour-joining tree from distance matrix.",
+        py::call_guard<py::gil_scoped_release>());
+  m.def("iq_jc_nj_tree", &build_jc_njtree,
+        "Build neighbour-joining tree from the pairwise JC distances of an "
+        "alignment.");
+  m.def("iq_jc_nj_tree", &build_jc_njtree_encoded,
+        "Build neighbour-joining tree from the pairwise JC distances of an "
+        "alignment (as an encoded array).");
+  m.def("iq_jc_nj_tree", &build_jc_njtree_native,
+        "Build neighbour-joining tree from the pairwise JC distances of an "
+        "alignment (as a native alignment).");
+  m.def("iq_distances", &pairwise_distances,
+        "Estimate pairwise distances for alignment.");
+  m.def("iq_distances", &pairwise_distances_encoded,
+        "Estimate pairwise distances for alignment (as an encoded array).");
+  m.def("iq_distances", &pairwise_distances_native,
+        "Estimate pairwise distances for alignment (as a native alignment).");
+  py::class_<CodedSeqs>(m, "CodedAlignment",
+                        "An alignment coded by state for estimating distances.")
+      .def(py::init([](vector<string>& names, vector<string>& seqs,
+                       const string& states) {
+        if (names.size() != seqs.size()) {
+          throw runtime_error("The number of names and sequences must match");
+        }
+        py::gil_scoped_release release;
+        return code_seqs(seqs, states);
+      }))
+      .def(py::init([](vector<string>& names,
+                       const py::array_t<uint8_t>& encoded,
+                       const string& alphabet, const string& states) {
+        CodedSeqs coded = code_encoded_seqs(encoded, alphabet, states);
+        if (names.size() != coded.num_seqs) {
+          throw runtime_error("The number of names and sequences must match");
+        }
+        return coded;
+      }))
+      .def(py::init([](NativeAlignment& aln, const string& states) {
+        py::gil_scoped_release release;
+        return code_seqs(aln.seqs, states);
+      }))
+      .def_readonly("num_seqs", &CodedSeqs::num_seqs);
+  m.def("iq_distance_rows", &distance_rows,
+        "Estimate rows of the pairwise distance matrix in place.", py::arg("coded"),
+        py::arg("method"), py::arg("start"), py::arg("out").noconvert(),
+        py::arg("upper"), py::arg("num_thres"));
+  m.def("_load_yaml", &load_yaml,
+        "Load IQ-TREE's YAML results as yaml.safe_load would (private, for "
+        "testing).");
   m.def("mine", &mine, "The meaning of life, the universe (and everything)!");
 }
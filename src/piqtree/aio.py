@@ -0,0 +1,201 @@
+"""Coroutines for running IQ-TREE from asyncio.
+
+Each coroutine runs its analysis in a worker process of an Executor,
+so the event loop is not blocked while IQ-TREE runs. By default, a
+shared Executor with a worker process per CPU is used, so at most that
+many analyses run at once and the rest wait their turn. Pass an
+Executor to use a different bound.
+
+Cancelling the task awaiting an analysis stops it, replacing the worker
+process if the analysis has started. Analyses can therefore be given a
+time limit with asyncio.wait_for.
+"""
+
+import asyncio
+import atexit
+import functools
+from collections.abc import Iterable
+from typing import TYPE_CHECKING, TypeVar
+
+import cogent3
+import cogent3.app.typing as c3_types
+
+from piqtree.iqtree import AlignmentHandle, Executor, ModelFinderResult, ResultCache
+from piqtree.model import Model
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+__all__ = [
+    "build_tree_async",
+    "fit_tree_async",
+    "jc_distances_async",
+    "model_finder_async",
+]
+
+ResultType = TypeVar("ResultType")
+
+
+@functools.cache
+def _default_executor() -> Executor:
+    executor = Executor()
+    atexit.register(executor.shutdown, wait=False, cancel_futures=True)
+    return executor
+
+
+async def _result(future: "Future[ResultType]") -> ResultType:
+    # cancelling the wrapping asyncio future cancels the analysis
+    return await asyncio.wrap_future(future)
+
+
+async def build_tree_async(
+    aln: c3_types.AlignedSeqsType | AlignmentHandle,
+    model: Model,
+    rand_seed: int | None = None,
+    bootstrap_replicates: int | None = None,
+    num_threads: int | None = None,
+    fixed_params: cogent3.PhyloNode | None = None,
+    *,
+    cache: ResultCache | None = None,
+    executor: Executor | None = None,
+) -> cogent3.PhyloNode:
+    """Reconstruct a phylogenetic tree without blocking the event loop.
+
+    Parameters are as for build_tree, except num_threads defaults to
+    the threads_per_worker of the Executor.
+
+    Parameters
+    ----------
+    executor : Executor | None, optional
+        The Executor to run the analysis in, by default None (a shared
+        Executor with a worker process per CPU).
+
+    Returns
+    -------
+    cogent3.PhyloNode
+        The IQ-TREE maximum likelihood tree from the given alignment.
+
+    """
+    executor = executor or _default_executor()
+    return await _result(
+        executor.submit_build_tree(
+            aln,
+            model,
+            rand_seed,
+            bootstrap_replicates,
+            num_threads,
+            fixed_params,
+            cache=cache,
+        ),
+    )
+
+
+async def fit_tree_async(
+    aln: c3_types.AlignedSeqsType | AlignmentHandle,
+    tree: cogent3.PhyloNode,
+    model: Model,
+    rand_seed: int | None = None,
+    num_threads: int | None = None,
+    fixed_params: cogent3.PhyloNode | None = None,
+    *,
+    cache: ResultCache | None = None,
+    executor: Executor | None = None,
+) -> cogent3.PhyloNode:
+    """Fit branch lengths to a tree without blocking the event loop.
+
+    Parameters are as for fit_tree, except num_threads defaults to
+    the threads_per_worker of the Executor.
+
+    Parameters
+    ----------
+    executor : Executor | None, optional
+        The Executor to run the analysis in, by default None (a shared
+        Executor with a worker process per CPU).
+
+    Returns
+    -------
+    cogent3.PhyloNode
+        A phylogenetic tree with same given topology fitted with branch lengths.
+
+    """
+    executor = executor or _default_executor()
+    return await _result(
+        executor.submit_fit_tree(
+            aln,
+            tree,
+            model,
+            rand_seed,
+            num_threads,
+            fixed_params,
+            cache=cache,
+        ),
+    )
+
+
+async def model_finder_async(
+    aln: c3_types.AlignedSeqsType | AlignmentHandle,
+    model_set: Iterable[str] | None = None,
+    freq_set: Iterable[str] | None = None,
+    rate_set: Iterable[str] | None = None,
+    rand_seed: int | None = None,
+    num_threads: int | None = None,
+    *,
+    cache: ResultCache | None = None,
+    executor: Executor | None = None,
+) -> ModelFinderResult:
+    """Find the model of best fit without blocking the event loop.
+
+    Parameters are as for model_finder, except num_threads defaults to
+    the threads_per_worker of the Executor.
+
+    Parameters
+    ----------
+    executor : Executor | None, optional
+        The Executor to run the analysis in, by default None (a shared
+        Executor with a worker process per CPU).
+
+    Returns
+    -------
+    ModelFinderResult
+        Collection of data returned from IQ-TREE's ModelFinder.
+
+    """
+    executor = executor or _default_executor()
+    return await _result(
+        executor.submit_model_finder(
+            aln,
+            model_set,
+            freq_set,
+            rate_set,
+            rand_seed,
+            num_threads,
+            cache=cache,
+        ),
+    )
+
+
+async def jc_distances_async(
+    aln: c3_types.AlignedSeqsType | AlignmentHandle,
+    num_threads: int | None = None,
+    *,
+    executor: Executor | None = None,
+) -> c3_types.PairwiseDistanceType:
+    """Compute pairwise JC distances without blocking the event loop.
+
+    Parameters are as for jc_distances, except num_threads defaults to
+    the threads_per_worker of the Executor.
+
+    Parameters
+    ----------
+    executor : Executor | None, optional
+        The Executor to run the analysis in, by default None (a shared
+        Executor with a worker process per CPU).
+
+    Returns
+    -------
+    c3_types.PairwiseDistanceType
+        Pairwise JC distance matrix.
+
+    """
+    executor = executor or _default_executor()
+    return await _result(executor.submit_jc_distances(aln, num_threads))
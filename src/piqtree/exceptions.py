@@ -1,9 +1,39 @@
 """Contains piqtree exceptions."""
 
+import signal
+
 
 class IqTreeError(Exception):
     """An error thrown by IQ-TREE."""
 
 
+class IqTreeWorkerError(IqTreeError):
+    """A worker process running IQ-TREE exited unexpectedly.
+
+    Attributes
+    ----------
+    exitcode : int
+        The exit code of the process, negative if it was killed by a signal.
+    signal : signal.Signals | None
+        The signal which killed the process, such as SIGSEGV, if any.
+    """
+
+    def __init__(self, exitcode: int) -> None:
+        self.exitcode = exitcode
+        self.signal = signal.Signals(-exitcode) if exitcode < 0 else None
+        if self.signal is None:
+            msg = f"IQ-TREE worker process exited with code {exitcode}."
+        else:
+            msg = f"IQ-TREE worker process was killed by {self.signal.name}."
+        super().__init__(msg)
+
+    def __reduce__(self) -> tuple[type["IqTreeWorkerError"], tuple[int]]:
+        return self.__class__, (self.exitcode,)
+
+
+class IqTreeTimeoutError(IqTreeError, TimeoutError):
+    """IQ-TREE did not finish within the time allowed."""
+
+
 class ParseIqTreeError(Exception):
     """There was an error when parsing a result from IQ-TREE."""
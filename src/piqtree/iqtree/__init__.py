@@ -1,20 +1,45 @@
 """Functions for calling IQ-TREE as a library."""
 
+from ._alignment import AlignmentHandle
+from ._cache import ResultCache
+from ._cpu_budget import configure_cpu_budget
+from ._distance import distances, iter_distances, write_distances
+from ._executor import Executor, build_trees
 from ._jc_distance import jc_distances
 from ._model_finder import ModelFinderResult, ModelResultValue, model_finder
-from ._random_tree import TreeGenMode, random_trees
+from ._random_tree import (
+    TreeGenMode,
+    iter_random_trees,
+    random_trees,
+    write_random_trees,
+)
 from ._robinson_foulds import robinson_foulds
-from ._tree import build_tree, fit_tree, nj_tree
+from ._scratch import configure_scratch
+from ._thread_cache import configure_thread_cache
+from ._tree import build_tree, fit_tree, nj_tree, nj_tree_from_alignment
 
 __all__ = [
+    "AlignmentHandle",
+    "Executor",
     "ModelFinderResult",
     "ModelResultValue",
+    "ResultCache",
     "TreeGenMode",
     "build_tree",
+    "build_trees",
+    "configure_cpu_budget",
+    "configure_scratch",
+    "configure_thread_cache",
+    "distances",
     "fit_tree",
+    "iter_distances",
+    "iter_random_trees",
     "jc_distances",
     "model_finder",
     "nj_tree",
+    "nj_tree_from_alignment",
     "random_trees",
     "robinson_foulds",
+    "write_distances",
+    "write_random_trees",
 ]
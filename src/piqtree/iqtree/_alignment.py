@@ -0,0 +1,199 @@
+"""Passing cogent3 alignments to the IQ-TREE library."""
+
+import functools
+import hashlib
+from collections.abc import Sequence
+from typing import Any
+
+import cogent3.app.typing as c3_types
+import numpy as np
+from _piqtree import NativeAlignment
+
+from piqtree.iqtree._decorator import iqtree_func
+
+make_native_alignment = iqtree_func(NativeAlignment, hide_output=False)
+
+
+def _encoded_alphabet(aln: c3_types.AlignedSeqsType) -> bytes | None:
+    alphabet = getattr(aln, "alphabet", None)
+    if alphabet is None:
+        return None
+
+    try:
+        chars = "".join(alphabet).encode("latin-1")
+    except (TypeError, UnicodeEncodeError):
+        return None
+
+    # every state must be a single character to be decoded by index
+    return chars if len(chars) == len(alphabet) else None
+
+
+class AlignmentHandle:
+    """An alignment held in native memory for repeated IQ-TREE analyses.
+
+    Every function taking an alignment converts its sequences for the
+    IQ-TREE library. An AlignmentHandle performs the conversion once,
+    so a pipeline such as model_finder, then build_tree, then fit_tree
+    on the same alignment skips it in every call.
+
+    Parameters
+    ----------
+    aln : c3_types.AlignedSeqsType
+        The alignment to hold.
+
+    Attributes
+    ----------
+    names : tuple[str, ...]
+        The names of the sequences.
+    info : cogent3.util.misc.Info
+        The info of the alignment, including its source.
+    moltype : cogent3.MolType
+        The molecular type of the alignment.
+    """
+
+    def __init__(self, aln: c3_types.AlignedSeqsType) -> None:
+        self.names = tuple(aln.names)
+        self.info = aln.info
+        self.moltype = aln.moltype
+        self._native = make_native_alignment(*iqtree_seqs(aln))
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(num_seqs={len(self.names)}, "
+            f"seq_len={self.seq_len}, moltype={self.moltype.label!r})"
+        )
+
+    @property
+    def num_seqs(self) -> int:
+        """The number of sequences in the alignment."""
+        return len(self.names)
+
+    @property
+    def seq_len(self) -> int:
+        """The number of positions in the alignment."""
+        return self._native.seq_len
+
+    @functools.cached_property
+    def digest(self) -> str:
+        """A digest of the names and sequences of the alignment."""
+        return _seqs_digest(self._native.names, self._native.seqs)
+
+    @functools.cached_property
+    def num_patterns(self) -> int:
+        """The number of distinct site patterns in the alignment."""
+        return _count_patterns(self._native.seqs)
+
+
+def iqtree_seqs(aln: c3_types.AlignedSeqsType | AlignmentHandle) -> tuple[Any, ...]:
+    """The sequence arguments for an IQ-TREE library function.
+
+    When the alignment stores its sequences as an array of indices into
+    an alphabet (as cogent3's ArrayAlignment does), the array is passed
+    to the IQ-TREE library as is, along with the alphabet, to avoid
+    creating a string for each sequence. Otherwise the sequences are
+    passed as strings.
+
+    Parameters
+    ----------
+    aln : c3_types.AlignedSeqsType | AlignmentHandle
+        The alignment to pass to IQ-TREE.
+
+    Returns
+    -------
+    tuple[Any, ...]
+        The native alignment of an AlignmentHandle, the names, encoded
+        sequences and alphabet, or the names and sequence strings.
+
+    """
+    if isinstance(aln, AlignmentHandle):
+        return (aln._native,)  # noqa: SLF001
+
+    names = list(aln.names)
+
+    encoded = getattr(aln, "array_seqs", None)
+    if (
+        isinstance(encoded, np.ndarray)
+        and encoded.dtype == np.uint8
+        and encoded.ndim == 2
+        and encoded.shape[0] == len(names)
+    ):
+        alphabet = _encoded_alphabet(aln)
+        if alphabet is not None:
+            return names, encoded, alphabet
+
+    return names, [str(seq) for seq in aln.iter_seqs(names)]
+
+
+def num_patterns(aln: c3_types.AlignedSeqsType | AlignmentHandle) -> int:
+    """The number of distinct site patterns in an alignment.
+
+    Parameters
+    ----------
+    aln : c3_types.AlignedSeqsType | AlignmentHandle
+        The alignment.
+
+    Returns
+    -------
+    int
+        The number of distinct columns of the alignment, computed once
+        for an AlignmentHandle.
+
+    """
+    if isinstance(aln, AlignmentHandle):
+        return aln.num_patterns
+
+    # the sequences follow the names
+    return _count_patterns(iqtree_seqs(aln)[1])
+
+
+def _count_patterns(seqs: np.ndarray | Sequence[str]) -> int:
+    if isinstance(seqs, np.ndarray):
+        encoded = seqs
+    else:
+        encoded = np.array(
+            [np.frombuffer(seq.encode("utf-8"), dtype=np.uint8) for seq in seqs],
+            dtype=np.uint8,
+        )
+
+    if encoded.size == 0:
+        return 0
+    return np.unique(encoded, axis=1).shape[1]
+
+
+def _seqs_digest(
+    names: Sequence[str],
+    seqs: Sequence[str] | np.ndarray,
+    alphabet: bytes | None = None,
+) -> str:
+    # the same digest for the sequences whether as strings or encoded
+    if alphabet is not None:
+        chars = np.frombuffer(alphabet, dtype=np.uint8)[seqs]
+        rows = (row.tobytes() for row in chars)
+    else:
+        rows = (seq.encode("utf-8") for seq in seqs)
+
+    digest = hashlib.sha256()
+    for name, row in zip(names, rows, strict=True):
+        for part in (name.encode("utf-8"), row):
+            digest.update(len(part).to_bytes(8, "little"))
+            digest.update(part)
+    return digest.hexdigest()
+
+
+def alignment_digest(aln: c3_types.AlignedSeqsType | AlignmentHandle) -> str:
+    """A digest of the names and sequences of an alignment.
+
+    Parameters
+    ----------
+    aln : c3_types.AlignedSeqsType | AlignmentHandle
+        The alignment.
+
+    Returns
+    -------
+    str
+        The hex digest, the same for any representation of the alignment.
+
+    """
+    if isinstance(aln, AlignmentHandle):
+        return aln.digest
+    return _seqs_digest(*iqtree_seqs(aln))
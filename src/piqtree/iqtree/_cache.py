@@ -0,0 +1,250 @@
+"""On-disk cache of the results of IQ-TREE analyses."""
+
+import contextlib
+import hashlib
+import json
+import os
+import pathlib
+import sqlite3
+import time
+import zlib
+from collections.abc import Callable, Iterator
+from typing import Any
+
+import cogent3.app.typing as c3_types
+from _piqtree import __iqtree_version__
+
+from piqtree.iqtree._alignment import AlignmentHandle, alignment_digest
+
+# changed whenever the form of the stored results changes
+_CACHE_FORMAT = 1
+
+
+class ResultCache:
+    """An on-disk cache of the results of IQ-TREE analyses.
+
+    Results are stored in an SQLite database in the cache directory,
+    keyed on a digest of the alignment, the analysis options (other than
+    the number of threads) and the version of IQ-TREE. Only analyses
+    given a random seed are deterministic, so only they are cached.
+
+    When the stored results exceed the size limit, the least recently
+    used results are evicted. A cache may be shared by processes, such
+    as the workers of an Executor.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str | os.PathLike,
+        max_size: int | None = 2**30,
+    ) -> None:
+        """Construct a ResultCache.
+
+        Parameters
+        ----------
+        cache_dir : str | os.PathLike
+            The directory to store results in, created if it does not exist.
+        max_size : int | None, optional
+            The maximum total size of the stored results in bytes,
+            by default 1 GiB. If None, the size is unlimited.
+
+        """
+        if max_size is not None and max_size < 0:
+            msg = f"max_size must not be negative, got {max_size}."
+            raise ValueError(msg)
+
+        self.cache_dir = pathlib.Path(cache_dir)
+        self.max_size = max_size
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, "
+                "value BLOB NOT NULL, "
+                "size INTEGER NOT NULL, "
+                "last_used REAL NOT NULL)",
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)",
+            )
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(cache_dir={str(self.cache_dir)!r}, "
+            f"max_size={self.max_size})"
+        )
+
+    def __len__(self) -> int:
+        with self._connect() as db:
+            return db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def __contains__(self, key: str) -> bool:
+        with self._connect() as db:
+            row = db.execute("SELECT 1 FROM results WHERE key = ?", (key,))
+            return row.fetchone() is not None
+
+    @property
+    def path(self) -> pathlib.Path:
+        """The path of the SQLite database."""
+        return self.cache_dir / "results.sqlite"
+
+    @property
+    def size(self) -> int:
+        """The total size of the stored results in bytes."""
+        with self._connect() as db:
+            return db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[
+                0
+            ]
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # a connection is opened for each operation so that the cache
+        # can be pickled and used from several threads and processes
+        with contextlib.closing(sqlite3.connect(self.path, timeout=60)) as db, db:
+            yield db
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        """Get a stored result, marking it as recently used.
+
+        Parameters
+        ----------
+        key : str
+            The key of the result.
+
+        Returns
+        -------
+        dict[str, Any] | None
+            The stored result, or None if it is not in the cache.
+
+        """
+        with self._connect() as db:
+            row = db.execute("SELECT value FROM results WHERE key = ?", (key,))
+            found = row.fetchone()
+            if found is None:
+                return None
+            db.execute(
+                "UPDATE results SET last_used = ? WHERE key = ?",
+                (time.time(), key),
+            )
+        return json.loads(zlib.decompress(found[0]))
+
+    def put(self, key: str, result: dict[str, Any]) -> None:
+        """Store a result, evicting the least recently used if over the size limit.
+
+        Parameters
+        ----------
+        key : str
+            The key of the result.
+        result : dict[str, Any]
+            The result, which must be serialisable as JSON.
+
+        """
+        value = zlib.compress(json.dumps(result).encode("utf-8"))
+        if self.max_size is not None and len(value) > self.max_size:
+            return
+
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                (key, value, len(value), time.time()),
+            )
+            if self.max_size is not None:
+                self._evict(db, self.max_size)
+
+    @staticmethod
+    def _evict(db: sqlite3.Connection, max_size: int) -> None:
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= max_size:
+            return
+
+        evicted = []
+        rows = db.execute("SELECT key, size FROM results ORDER BY last_used, rowid")
+        for key, size in rows:
+            if total <= max_size:
+                break
+            evicted.append((key,))
+            total -= size
+        db.executemany("DELETE FROM results WHERE key = ?", evicted)
+
+    def clear(self) -> None:
+        """Remove all stored results."""
+        with self._connect() as db:
+            db.execute("DELETE FROM results")
+
+
+def result_key(
+    kind: str,
+    aln: c3_types.AlignedSeqsType | AlignmentHandle,
+    options: dict[str, Any],
+) -> str:
+    """The cache key for an analysis of an alignment.
+
+    Parameters
+    ----------
+    kind : str
+        The kind of analysis.
+    aln : c3_types.AlignedSeqsType | AlignmentHandle
+        The alignment analysed.
+    options : dict[str, Any]
+        The options determining the result of the analysis.
+
+    Returns
+    -------
+    str
+        A hex digest identifying the result.
+
+    """
+    identity = {
+        "format": _CACHE_FORMAT,
+        "iqtree_version": __iqtree_version__,
+        "kind": kind,
+        "alignment": alignment_digest(aln),
+        "options": options,
+    }
+    return hashlib.sha256(json.dumps(identity, sort_keys=True).encode()).hexdigest()
+
+
+def cached_result(
+    cache: ResultCache | None,
+    kind: str,
+    aln: c3_types.AlignedSeqsType | AlignmentHandle,
+    options: dict[str, Any],
+    compute: Callable[[], dict[str, Any]],
+) -> dict[str, Any]:
+    """The result of an analysis, from the cache if it was computed before.
+
+    Parameters
+    ----------
+    cache : ResultCache | None
+        The cache to use, if any.
+    kind : str
+        The kind of analysis.
+    aln : c3_types.AlignedSeqsType | AlignmentHandle
+        The alignment analysed.
+    options : dict[str, Any]
+        The options determining the result of the analysis, including
+        the random seed. Results without a random seed are not cached.
+    compute : Callable[[], dict[str, Any]]
+        Computes the result if it is not in the cache.
+
+    Returns
+    -------
+    dict[str, Any]
+        The result of the analysis. The metrics of a result from the
+        cache are those of the analysis which computed it, marked as
+        cached.
+
+    """
+    if cache is None or not options.get("rand_seed"):
+        return compute()
+
+    key = result_key(kind, aln, options)
+    result = cache.get(key)
+    if result is None:
+        result = compute()
+        cache.put(key, result)
+    elif "metrics" in result:
+        # the metrics are of the analysis which computed the result
+        result["metrics"]["cached"] = True
+    return result
@@ -0,0 +1,212 @@
+"""A budget of CPUs shared by concurrent IQ-TREE calls."""
+
+import atexit
+import contextlib
+import fcntl
+import os
+import pathlib
+import shutil
+import tempfile
+import threading
+import time
+from collections.abc import Iterator
+
+# how often a call waiting for CPUs checks whether they are free
+_POLL_INTERVAL = 0.05
+
+
+def _available_cpus() -> list[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _pin(cpus: set[int]) -> None:
+    # OpenMP threads keep the affinity they were created with, so every
+    # thread of the process is pinned
+    for task in pathlib.Path("/proc/self/task").iterdir():
+        with contextlib.suppress(OSError):
+            os.sched_setaffinity(int(task.name), cpus)
+
+
+class _CpuBudget:
+    """CPUs handed out to IQ-TREE calls, one lock file per CPU.
+
+    Locks on the files are held by open file descriptions, so they
+    exclude both threads and processes, and are released by the
+    operating system if a process dies.
+    """
+
+    def __init__(self) -> None:
+        self.cpus: list[int] = []
+        self.lock_dir: pathlib.Path | None = None
+        self.pin_threads = False
+        self._original_cpus: set[int] = set()
+        self._owned_dir: pathlib.Path | None = None
+        self._pin_lock = threading.Lock()
+
+    def configure(
+        self,
+        cpus: list[int],
+        lock_dir: pathlib.Path | None,
+        *,
+        pin_threads: bool,
+    ) -> None:
+        if self._owned_dir is not None:
+            shutil.rmtree(self._owned_dir, ignore_errors=True)
+            self._owned_dir = None
+
+        if cpus and lock_dir is None:
+            lock_dir = self._owned_dir = pathlib.Path(
+                tempfile.mkdtemp(prefix="piqtree_cpus_"),
+            )
+        self.cpus = cpus
+        self.lock_dir = lock_dir
+        self.pin_threads = pin_threads
+        self._original_cpus = set(_available_cpus())
+
+    def _try_lock(self, cpu: int) -> int | None:
+        fd = os.open(self.lock_dir / f"cpu{cpu}.lock", os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        return fd
+
+    def _acquire(self, wanted: int) -> dict[int, int]:
+        while True:
+            held: dict[int, int] = {}
+            for cpu in self.cpus:
+                if len(held) == wanted:
+                    break
+                if (fd := self._try_lock(cpu)) is not None:
+                    held[cpu] = fd
+            if len(held) == wanted:
+                return held
+
+            # holding some CPUs while waiting for others could deadlock
+            for fd in held.values():
+                os.close(fd)
+            time.sleep(_POLL_INTERVAL)
+
+    @contextlib.contextmanager
+    def allocate(self, num_threads: int) -> Iterator[int]:
+        if not self.cpus:
+            yield num_threads
+            return
+
+        wanted = (
+            len(self.cpus) if num_threads == 0 else min(num_threads, len(self.cpus))
+        )
+        with contextlib.ExitStack() as stack:
+            if self.pin_threads:
+                # every thread of the process is pinned, so calls take turns
+                stack.enter_context(self._pin_lock)
+
+            held = self._acquire(wanted)
+            for fd in held.values():
+                stack.callback(os.close, fd)
+
+            if self.pin_threads:
+                _pin(set(held))
+                stack.callback(_pin, self._original_cpus)
+
+            yield wanted
+
+
+_cpu_budget = _CpuBudget()
+atexit.register(_cpu_budget.configure, [], None, pin_threads=False)
+
+
+def cpu_allocation(num_threads: int) -> contextlib.AbstractContextManager[int]:
+    """Hold CPUs from the budget for the duration of an IQ-TREE call.
+
+    Parameters
+    ----------
+    num_threads : int
+        The number of threads requested, or 0 for all CPUs of the budget.
+
+    Returns
+    -------
+    contextlib.AbstractContextManager[int]
+        The number of threads to give IQ-TREE, at most the size of the
+        budget, once enough CPUs are free.
+
+    """
+    return _cpu_budget.allocate(num_threads)
+
+
+def cpu_budget_settings() -> tuple[list[int], pathlib.Path | None, bool]:
+    """The CPUs of the budget, its lock directory and whether threads are pinned."""
+    return _cpu_budget.cpus, _cpu_budget.lock_dir, _cpu_budget.pin_threads
+
+
+def share_cpu_budget(settings: tuple[list[int], pathlib.Path | None, bool]) -> None:
+    """Use the budget of another process, as given by cpu_budget_settings."""
+    cpus, lock_dir, pin_threads = settings
+    _cpu_budget.configure(cpus, lock_dir, pin_threads=pin_threads)
+
+
+def configure_cpu_budget(
+    num_cpus: int | None = None,
+    *,
+    lock_dir: str | os.PathLike | None = None,
+    pin_threads: bool = False,
+) -> None:
+    """Configure a budget of CPUs shared by concurrent IQ-TREE calls.
+
+    When several analyses run at once, each with its own threads, the
+    CPUs can be oversubscribed and throughput collapses. With a budget,
+    each call holds as many CPUs as its number of threads while it runs,
+    and waits until they are free. A call asking for more threads than
+    the budget has, or for 0 (all threads, or for IQ-TREE to choose the
+    number of threads), is given every CPU of the budget.
+
+    The budget is shared with Executor workers started afterwards. To
+    share it with other processes on the machine, such as other
+    pipelines, give each the same lock directory.
+
+    Parameters
+    ----------
+    num_cpus : int | None, optional
+        The number of CPUs in the budget, by default None (all CPUs
+        available to the process if a lock directory is given,
+        otherwise no budget).
+    lock_dir : str | os.PathLike | None, optional
+        A directory for a lock file per CPU, shared by every process
+        using the budget, by default None (a new directory shared with
+        Executor workers only).
+    pin_threads : bool, optional
+        Whether to pin the threads of each call to the CPUs it holds,
+        by default False. Every thread of the process is pinned, so
+        calls in one process take turns. Only supported on Linux.
+
+    Raises
+    ------
+    ValueError
+        If num_cpus is not positive, or more than the available CPUs.
+    NotADirectoryError
+        If the lock directory does not exist.
+    NotImplementedError
+        If threads are pinned on a platform other than Linux.
+
+    """
+    available = _available_cpus()
+    if num_cpus is None:
+        num_cpus = 0 if lock_dir is None else len(available)
+    elif not 0 < num_cpus <= len(available):
+        msg = f"num_cpus must be between 1 and {len(available)}, got {num_cpus}."
+        raise ValueError(msg)
+
+    if lock_dir is not None:
+        lock_dir = pathlib.Path(lock_dir)
+        if not lock_dir.is_dir():
+            msg = f"Lock directory {lock_dir} does not exist."
+            raise NotADirectoryError(msg)
+
+    if pin_threads and not pathlib.Path("/proc/self/task").is_dir():
+        msg = "Pinning threads is only supported on Linux."
+        raise NotImplementedError(msg)
+
+    _cpu_budget.configure(available[:num_cpus], lock_dir, pin_threads=pin_threads)
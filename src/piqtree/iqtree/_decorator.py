@@ -1,29 +1,173 @@
 """Decorators for IQ-TREE functions."""
 
+import contextlib
+import logging
 import os
 import pathlib
+import re
 import sys
-import tempfile
+import threading
+import time
 from collections.abc import Callable
 from functools import wraps
+from types import TracebackType
 from typing import TypeVar
 
 from typing_extensions import ParamSpec
 
 from piqtree.exceptions import IqTreeError
+from piqtree.iqtree._cpu_budget import cpu_allocation
+from piqtree.iqtree._metrics import call_metrics
+from piqtree.iqtree._scratch import in_scratch_dir, scratch_dir
 
 Param = ParamSpec("Param")
 RetType = TypeVar("RetType")
 
+logger = logging.getLogger("piqtree.iqtree")
+
+# how often the IQ-TREE log file is checked for new lines
+_FOLLOW_INTERVAL = 0.1
+
+_ITERATION = re.compile(
+    r"Iteration (\d+) / LogL: (\S+) / Time: (\d+)h:(\d+)m:(\d+)s",
+)
+_BEST_SCORE = re.compile(r"(?:Current best (?:tree )?score|BEST SCORE FOUND) ?: (\S+)")
+
+
+class _SharedOutputRedirect:
+    """Redirects stdout or stderr to /dev/null while any IQ-TREE call needs it.
+
+    File descriptors are shared by every thread in the process, so they are
+    redirected by the first of a group of concurrent calls to enter, and
+    restored by the last to exit.
+    """
+
+    def __init__(self, stream_name: str) -> None:
+        self._stream_name = stream_name
+        self._lock = threading.Lock()
+        self._users = 0
+        self._original_fd = -1
+
+    def __enter__(self) -> None:
+        with self._lock:
+            if self._users == 0:
+                stream = getattr(sys, self._stream_name)
+                stream.flush()
+
+                # Save the original file descriptor
+                self._original_fd = os.dup(stream.fileno())
+
+                # Replace the stream with /dev/null (or NUL on Windows)
+                devnull_fd = os.open(os.devnull, os.O_WRONLY)
+                os.dup2(devnull_fd, stream.fileno())
+                os.close(devnull_fd)
+            self._users += 1
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        with self._lock:
+            self._users -= 1
+            if self._users == 0:
+                stream = getattr(sys, self._stream_name)
+                stream.flush()
+
+                # Restore the stream
+                os.dup2(self._original_fd, stream.fileno())
+                os.close(self._original_fd)
+
+
+_hidden_stdout = _SharedOutputRedirect("stdout")
+_hidden_stderr = _SharedOutputRedirect("stderr")
+
+
+def _progress(line: str) -> dict[str, int | float | None]:
+    # the progress of a tree search reported in a line of the log
+    progress: dict[str, int | float | None] = {
+        "iteration": None,
+        "log_likelihood": None,
+        "elapsed": None,
+    }
+    if match := _ITERATION.match(line):
+        iteration, log_likelihood, hours, minutes, seconds = match.groups()
+        progress["iteration"] = int(iteration)
+        progress["log_likelihood"] = float(log_likelihood)
+        progress["elapsed"] = int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+    elif match := _BEST_SCORE.match(line):
+        progress["log_likelihood"] = float(match.group(1))
+    return progress
+
+
+class _LogFollower:
+    """Logs the lines IQ-TREE writes to its log file while it runs.
+
+    IQ-TREE writes its progress to a log file in the working directory
+    rather than to stdout, so the file is followed by a thread.
+    """
+
+    def __init__(self, directory: pathlib.Path) -> None:
+        self._directory = directory
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._follow, daemon=True)
+
+    def __enter__(self) -> None:
+        self._thread.start()
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _follow(self) -> None:
+        with contextlib.ExitStack() as stack:
+            log_file = None
+            partial = ""
+            while True:
+                # read once more after the call has finished
+                stopping = self._stop.wait(_FOLLOW_INTERVAL)
+                if log_file is None:
+                    path = next(self._directory.glob("*.log"), None)
+                    if path is not None:
+                        log_file = stack.enter_context(path.open(errors="replace"))
+
+                if log_file is not None:
+                    *lines, partial = (partial + log_file.read()).split("\n")
+                    if stopping:
+                        lines.append(partial)
+                    for line in lines:
+                        if line.strip():
+                            logger.info(line.rstrip(), extra=_progress(line))
+
+                if stopping:
+                    break
+
 
 def iqtree_func(
     func: Callable[Param, RetType],
     *,
     hide_files: bool | None = False,
+    hide_output: bool | None = True,
+    record_metrics: bool = False,
+    allocate_threads: bool = False,
 ) -> Callable[Param, RetType]:
     """IQ-TREE function wrapper.
 
-    Hides stdout and stderr, as well as any output files.
+    Hides stdout and stderr, as well as any output files. The wrapped
+    function may be called from multiple threads at once.
+
+    When hiding output files and the "piqtree.iqtree" logger is enabled
+    for INFO, each line IQ-TREE writes to its log file is logged while
+    the function runs, and stderr is not hidden. Lines reporting the
+    progress of a tree search have the iteration, log_likelihood and
+    elapsed (seconds) attributes set on their log records, and these
+    are None for other lines.
 
     Parameters
     ----------
@@ -31,6 +175,17 @@ def iqtree_func(
         The IQ-TREE library function.
     hide_files : bool | None, optional
         Whether hiding output files is necessary, by default False.
+    hide_output : bool | None, optional
+        Whether hiding stdout and stderr is necessary, by default True.
+    record_metrics : bool, optional
+        Whether to add a "metrics" entry to the result (which must be a
+        dict) with the time and memory used by the call, and the time of
+        each phase of the analysis read from the IQ-TREE log file when
+        hiding output files, by default False.
+    allocate_threads : bool, optional
+        Whether the last argument is the number of threads, which are
+        held from the CPU budget (see configure_cpu_budget) while the
+        function runs, by default False.
 
     Returns
     -------
@@ -46,45 +201,49 @@ def iqtree_func(
 
     @wraps(func)
     def wrapper_iqtree_func(*args: Param.args, **kwargs: Param.kwargs) -> RetType:
-        # Flush stdout and stderr
-        sys.stdout.flush()
-        sys.stderr.flush()
-
-        # Save original stdout and stderr file descriptors
-        original_stdout_fd = os.dup(sys.stdout.fileno())
-        original_stderr_fd = os.dup(sys.stderr.fileno())
-
-        # Open /dev/null (or NUL on Windows) as destination for stdout and stderr
-        devnull_fd = os.open(os.devnull, os.O_WRONLY)
-
-        if hide_files:
-            original_dir = pathlib.Path.cwd()
-            tempdir = tempfile.TemporaryDirectory(prefix=f"piqtree_{func.__name__}")
-            os.chdir(tempdir.name)
-
-        try:
-            # Replace stdout and stderr with /dev/null
-            os.dup2(devnull_fd, sys.stdout.fileno())
-            os.dup2(devnull_fd, sys.stderr.fileno())
-
-            # Call the wrapped function
-            return func(*args, **kwargs)
-        except RuntimeError as e:
-            raise IqTreeError(e) from None
-        finally:
-            # Flush stdout and stderr
-            sys.stdout.flush()
-            sys.stderr.flush()
-
-            # Restore stdout and stderr
-            os.dup2(original_stdout_fd, sys.stdout.fileno())
-            os.dup2(original_stderr_fd, sys.stderr.fileno())
-
-            # Close the devnull file descriptor
-            os.close(devnull_fd)
-
+        follow_log = hide_files and logger.isEnabledFor(logging.INFO)
+        with contextlib.ExitStack() as stack:
+            if hide_output:
+                stack.enter_context(_hidden_stdout)
+                # stderr is left for log handlers while the log file is followed
+                if not follow_log:
+                    stack.enter_context(_hidden_stderr)
             if hide_files:
-                tempdir.cleanup()
-                os.chdir(original_dir)
+                directory = stack.enter_context(
+                    scratch_dir(f"piqtree_{func.__name__}"),
+                )
+                if follow_log:
+                    stack.enter_context(_LogFollower(directory))
+
+            with contextlib.ExitStack() as call_stack:
+                if hide_files:
+                    # only the call itself takes turns over the working directory
+                    call_stack.enter_context(in_scratch_dir(directory))
+                if allocate_threads:
+                    # held after changing into the scratch directory, so that
+                    # CPUs are not held while waiting for it
+                    *args, num_threads = args
+                    args = (
+                        *args,
+                        call_stack.enter_context(cpu_allocation(num_threads)),
+                    )
+
+                start_wall, start_cpu = time.perf_counter(), time.process_time()
+                try:
+                    # Call the wrapped function
+                    result = func(*args, **kwargs)
+                except RuntimeError as e:
+                    raise IqTreeError(e) from None
+                wall_time = time.perf_counter() - start_wall
+                cpu_time = time.process_time() - start_cpu
+
+            if record_metrics:
+                log_path = next(directory.glob("*.log"), None) if hide_files else None
+                result["metrics"] = call_metrics(
+                    log_path.read_text(errors="replace") if log_path else None,
+                    wall_time,
+                    cpu_time,
+                )
+            return result
 
     return wrapper_iqtree_func
@@ -0,0 +1,290 @@
+"""Pairwise distances estimated natively from alignments."""
+
+import os
+from collections.abc import Iterator
+
+import cogent3.app.typing as c3_types
+import numpy as np
+from _piqtree import CodedAlignment, iq_distance_rows, iq_distances
+
+from piqtree.iqtree._alignment import AlignmentHandle, iqtree_seqs
+from piqtree.iqtree._decorator import iqtree_func
+from piqtree.iqtree._jc_distance import _dists_to_distmatrix, jc_distances
+
+iq_distances = iqtree_func(iq_distances, hide_output=False, allocate_threads=True)
+iq_distance_rows = iqtree_func(
+    iq_distance_rows,
+    hide_output=False,
+    allocate_threads=True,
+)
+make_coded_alignment = iqtree_func(CodedAlignment, hide_output=False)
+
+_NUCLEOTIDE_MODELS = ("k2p", "tn93", "logdet")
+_PROTEIN_MODELS = ("poisson",)
+DISTANCE_MODELS = ("jc", "p", "jc69", *_NUCLEOTIDE_MODELS, *_PROTEIN_MODELS)
+
+_AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+
+
+def distance_states(
+    aln: c3_types.AlignedSeqsType | AlignmentHandle,
+    model: str,
+) -> str:
+    """The states compared by a distance model, checking it suits the alignment.
+
+    Parameters
+    ----------
+    aln : c3_types.AlignedSeqsType | AlignmentHandle
+        The alignment to estimate distances for.
+    model : str
+        The distance model, in lower case.
+
+    Returns
+    -------
+    str
+        The characters of the states compared, any other character (such
+        as a gap or an ambiguity) being excluded pairwise.
+
+    Raises
+    ------
+    ValueError
+        If the model is unknown, or does not suit the molecular type of
+        the alignment.
+
+    """
+    if model not in DISTANCE_MODELS:
+        msg = (
+            f"Unsupported distance model {model!r}, supported models are "
+            f"{', '.join(map(repr, DISTANCE_MODELS))}."
+        )
+        raise ValueError(msg)
+
+    label = aln.moltype.label
+    if label.startswith("protein"):
+        if model in _NUCLEOTIDE_MODELS:
+            msg = f"The {model!r} distance is only defined for nucleotide sequences."
+            raise ValueError(msg)
+        return _AMINO_ACIDS
+
+    if label not in ("dna", "rna"):
+        msg = f"Distances are not defined for {label} sequences."
+        raise ValueError(msg)
+    if model in _PROTEIN_MODELS:
+        msg = f"The {model!r} distance is only defined for protein sequences."
+        raise ValueError(msg)
+    return "ACGU" if label == "rna" else "ACGT"
+
+
+def distances(
+    aln: c3_types.AlignedSeqsType | AlignmentHandle,
+    model: str = "jc",
+    num_threads: int | None = None,
+) -> c3_types.PairwiseDistanceType:
+    """Compute pairwise distances for a given alignment.
+
+    Sites with a gap or an ambiguity in either sequence of a pair are
+    excluded from its distance. Distances which cannot be estimated,
+    such as when sequences are saturated, are NaN.
+
+    Parameters
+    ----------
+    aln : c3_types.AlignedSeqsType | AlignmentHandle
+        alignment to compute pairwise distances for.
+    model : str, optional
+        The distance model (case insensitive), by default "jc".
+
+        - "jc": Jukes-Cantor, computed by IQ-TREE 2 (see jc_distances).
+        - "p": the proportion of differing sites.
+        - "jc69": Jukes-Cantor, the closed form correction of the p
+          distance for the number of states, so unlike "jc" saturated
+          pairs are NaN.
+        - "k2p": Kimura 2-parameter, for nucleotides.
+        - "tn93": Tamura-Nei, with the nucleotide frequencies of each pair,
+          for nucleotides.
+        - "logdet": the LogDet (paralinear) distance, for nucleotides.
+        - "poisson": the Poisson correction of the p distance, for proteins.
+    num_threads: int | None, optional
+        Number of threads to use, by default None (all available threads).
+
+    Returns
+    -------
+    c3_types.PairwiseDistanceType
+        Pairwise distance matrix.
+
+    Raises
+    ------
+    ValueError
+        If the model is unknown, or does not suit the molecular type of
+        the alignment.
+
+    """
+    model = model.lower()
+    states = distance_states(aln, model)
+
+    if model == "jc":
+        return jc_distances(aln, num_threads)
+
+    if num_threads is None:
+        num_threads = 0
+
+    dists = iq_distances(*iqtree_seqs(aln), states, model, num_threads)
+    return _dists_to_distmatrix(dists, aln.names)
+
+
+def _coded_alignment(
+    aln: c3_types.AlignedSeqsType | AlignmentHandle,
+    model: str,
+    block_size: int,
+) -> CodedAlignment:
+    if model == "jc":
+        msg = (
+            "Jukes-Cantor distances are computed by IQ-TREE as a whole matrix, "
+            "so cannot be computed in blocks (the 'jc69' model can be)."
+        )
+        raise ValueError(msg)
+    if block_size < 1:
+        msg = f"block_size must be positive, got {block_size}."
+        raise ValueError(msg)
+
+    states = distance_states(aln, model)
+    return make_coded_alignment(*iqtree_seqs(aln), states)
+
+
+def iter_distances(
+    aln: c3_types.AlignedSeqsType | AlignmentHandle,
+    model: str = "p",
+    block_size: int = 1024,
+    num_threads: int | None = None,
+) -> Iterator[tuple[int, np.ndarray]]:
+    """Compute pairwise distances for a given alignment in blocks of rows.
+
+    Only one block of the distance matrix is held at a time, so the
+    distances of alignments with too many sequences for the whole matrix
+    to fit in memory can be consumed as they are computed.
+
+    Parameters
+    ----------
+    aln : c3_types.AlignedSeqsType | AlignmentHandle
+        alignment to compute pairwise distances for.
+    model : str, optional
+        The distance model (case insensitive), by default "p". Any model
+        of distances except "jc" is supported.
+    block_size : int, optional
+        The number of rows in each block, by default 1024.
+    num_threads: int | None, optional
+        Number of threads to use, by default None (all available threads).
+
+    Returns
+    -------
+    Iterator[tuple[int, np.ndarray]]
+        The index of the first row of each block, and the block of rows as
+        a float32 array with a column for each sequence (in the order of
+        the names of the alignment).
+
+    Raises
+    ------
+    ValueError
+        If the model is unknown, is "jc", or does not suit the molecular
+        type of the alignment, or the block size is not positive.
+
+    See Also
+    --------
+    distances : the whole distance matrix in memory.
+    write_distances : the distance matrix written to a memory-mapped file.
+
+    """
+    model = model.lower()
+    # checked before the first block is requested
+    coded = _coded_alignment(aln, model, block_size)
+    if num_threads is None:
+        num_threads = 0
+
+    return _distance_blocks(coded, model, block_size, num_threads)
+
+
+def _distance_blocks(
+    coded: CodedAlignment,
+    model: str,
+    block_size: int,
+    num_threads: int,
+) -> Iterator[tuple[int, np.ndarray]]:
+    num_seqs = coded.num_seqs
+    for start in range(0, num_seqs, block_size):
+        block = np.empty((min(block_size, num_seqs - start), num_seqs), np.float32)
+        iq_distance_rows(coded, model, start, block, False, num_threads)  # noqa: FBT003
+        yield start, block
+
+
+def write_distances(
+    aln: c3_types.AlignedSeqsType | AlignmentHandle,
+    path: str | os.PathLike,
+    model: str = "p",
+    block_size: int = 1024,
+    num_threads: int | None = None,
+) -> np.memmap:
+    """Write the pairwise distances of an alignment to a memory-mapped file.
+
+    The distances are computed in blocks of rows, each written in place
+    into a float32 .npy file, so the whole matrix is never held in
+    memory. Each pair is estimated once, for the upper triangle, and
+    mirrored into the lower triangle. The file can be given to nj_tree
+    with the names of the alignment.
+
+    Parameters
+    ----------
+    aln : c3_types.AlignedSeqsType | AlignmentHandle
+        alignment to compute pairwise distances for.
+    path : str | os.PathLike
+        The .npy file to write, replacing any existing file.
+    model : str, optional
+        The distance model (case insensitive), by default "p". Any model
+        of distances except "jc" is supported.
+    block_size : int, optional
+        The number of rows computed at a time, by default 1024.
+    num_threads: int | None, optional
+        Number of threads to use, by default None (all available threads).
+
+    Returns
+    -------
+    np.memmap
+        The square distance matrix, memory-mapped read only, with rows
+        and columns in the order of the names of the alignment.
+
+    Raises
+    ------
+    ValueError
+        If the model is unknown, is "jc", or does not suit the molecular
+        type of the alignment, or the block size is not positive.
+
+    See Also
+    --------
+    iter_distances : the distance matrix computed in blocks of rows.
+
+    """
+    model = model.lower()
+    coded = _coded_alignment(aln, model, block_size)
+    if num_threads is None:
+        num_threads = 0
+
+    num_seqs = coded.num_seqs
+    matrix = np.lib.format.open_memmap(
+        path,
+        mode="w+",
+        dtype=np.float32,
+        shape=(num_seqs, num_seqs),
+    )
+    for start in range(0, num_seqs, block_size):
+        end = min(start + block_size, num_seqs)
+        # the rows are a view of the file, written in place from the diagonal
+        rows = matrix[start:end]
+        iq_distance_rows(coded, model, start, rows, True, num_threads)  # noqa: FBT003
+        # the columns of the rows before are written, and mirrored here
+        rows[:, :start] = matrix[:start, start:end].T
+        square = rows[:, start:end]
+        lower = np.tril_indices(end - start, k=-1)
+        square[lower] = square.T[lower]
+        # limit the memory held by pages not yet written to the file
+        matrix.flush()
+    del matrix
+
+    return np.load(path, mmap_mode="r")
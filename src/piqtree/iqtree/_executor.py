@@ -0,0 +1,526 @@
+"""Process pool for running IQ-TREE functions concurrently."""
+
+import functools
+import math
+import multiprocessing
+import os
+import queue
+import threading
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from types import TracebackType
+from typing import Any
+
+import cogent3
+import cogent3.app.typing as c3_types
+
+from piqtree.iqtree._alignment import AlignmentHandle, num_patterns
+from piqtree.iqtree._cache import ResultCache
+from piqtree.iqtree._jc_distance import jc_distances
+from piqtree.iqtree._model_finder import ModelFinderResult, model_finder
+from piqtree.iqtree._tree import build_tree, fit_tree
+from piqtree.iqtree._worker import Worker
+from piqtree.model import Model
+
+# the number of site patterns worth giving an extra thread to in build_trees
+_PATTERNS_PER_THREAD = 5000
+
+
+class Executor:
+    """A pool of worker processes for running IQ-TREE concurrently.
+
+    IQ-TREE modifies process-wide state (the working directory and the
+    standard output streams) while it runs, so only one analysis can
+    safely run in a process at a time. The Executor keeps a pool of
+    worker processes, each with an isolated scratch directory, so
+    many analyses can be run side by side.
+
+    Each worker process is supervised. If one is killed during an
+    analysis, for example by a segmentation fault in IQ-TREE, the
+    analysis raises an IqTreeWorkerError with the signal, other
+    analyses are unaffected, and a new process takes its place.
+
+    IQ-TREE cannot be interrupted, so an analysis which runs past its
+    timeout, or is cancelled while running, is stopped by replacing
+    its worker process.
+    """
+
+    def __init__(
+        self,
+        max_workers: int | None = None,
+        threads_per_worker: int = 1,
+        *,
+        max_calls_per_worker: int | None = None,
+        max_worker_memory: int | None = None,
+    ) -> None:
+        """Construct an Executor.
+
+        Parameters
+        ----------
+        max_workers : int | None, optional
+            The maximum number of worker processes, by default None
+            (the number of CPUs divided by threads_per_worker).
+        threads_per_worker : int, optional
+            The number of threads for IQ-TREE 2 to use in each worker
+            when num_threads is not given to a submitted call, by default 1.
+        max_calls_per_worker : int | None, optional
+            The number of analyses after which a worker process is
+            replaced, by default None (never).
+        max_worker_memory : int | None, optional
+            The resident memory in bytes above which a worker process is
+            replaced after an analysis, by default None (no limit).
+
+        Raises
+        ------
+        ValueError
+            If max_workers, threads_per_worker or max_calls_per_worker is
+            not positive.
+
+        """
+        if max_workers is not None and max_workers < 1:
+            msg = f"max_workers must be positive, got {max_workers}."
+            raise ValueError(msg)
+
+        if threads_per_worker < 1:
+            msg = f"threads_per_worker must be positive, got {threads_per_worker}."
+            raise ValueError(msg)
+
+        if max_calls_per_worker is not None and max_calls_per_worker < 1:
+            msg = f"max_calls_per_worker must be positive, got {max_calls_per_worker}."
+            raise ValueError(msg)
+
+        if max_workers is None:
+            max_workers = max(1, (os.cpu_count() or 1) // threads_per_worker)
+
+        self.max_workers = max_workers
+        self.threads_per_worker = threads_per_worker
+
+        # forking a process which has already started OpenMP threads is unsafe
+        context = multiprocessing.get_context("spawn")
+        self._calls: queue.SimpleQueue = queue.SimpleQueue()
+        self._shutdown = False
+        self._shutdown_lock = threading.Lock()
+        self._threads = [
+            threading.Thread(
+                target=self._supervise,
+                args=(Worker(context, max_calls_per_worker, max_worker_memory),),
+                daemon=True,
+            )
+            for _ in range(max_workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _supervise(self, worker: Worker) -> None:
+        # runs the submitted calls in a worker process, one at a time
+        try:
+            while (call := self._calls.get()) is not None:
+                future, func, args, kwargs, timeout = call
+                # the future is left pending while the call runs, so it can
+                # still be cancelled, which stops the worker process
+                cancelled = threading.Event()
+                future.add_done_callback(lambda _, event=cancelled: event.set())
+                if future.cancelled():
+                    future.set_running_or_notify_cancel()
+                    continue
+                try:
+                    result = worker.call(func, args, kwargs, timeout, cancelled)
+                except BaseException as e:  # noqa: BLE001
+                    if future.set_running_or_notify_cancel():
+                        future.set_exception(e)
+                else:
+                    if future.set_running_or_notify_cancel():
+                        future.set_result(result)
+                del call, future
+        finally:
+            worker.stop()
+
+    def submit(
+        self,
+        func: Callable[..., Any],
+        /,
+        *args: Any,  # noqa: ANN401
+        timeout: float | None = None,
+        **kwargs: Any,  # noqa: ANN401
+    ) -> Future:
+        """Schedule a function to run in a worker process.
+
+        The function, its arguments and its result must be picklable, so
+        the function must be defined at the top level of a module. Only
+        one call runs in a worker process at a time, so the function may
+        call the IQ-TREE library.
+
+        Parameters
+        ----------
+        func : Callable[..., Any]
+            The function to call.
+        *args : Any
+            The positional arguments.
+        timeout : float | None, optional
+            The number of seconds after which the call is stopped and
+            raises IqTreeTimeoutError, by default None (no limit).
+        **kwargs : Any
+            The keyword arguments.
+
+        Returns
+        -------
+        Future
+            The future result of the call. It is pending until the call
+            finishes, so it can be cancelled while the call runs, which
+            stops the worker process.
+
+        Raises
+        ------
+        RuntimeError
+            If the Executor has been shut down.
+
+        """
+        with self._shutdown_lock:
+            if self._shutdown:
+                msg = "Cannot submit analyses after shutdown."
+                raise RuntimeError(msg)
+
+            future: Future = Future()
+            self._calls.put((future, func, args, kwargs, timeout))
+        return future
+
+    def __enter__(self) -> "Executor":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self.shutdown()
+
+    def _num_threads(self, num_threads: int | None) -> int:
+        return self.threads_per_worker if num_threads is None else num_threads
+
+    def submit_build_tree(
+        self,
+        aln: c3_types.AlignedSeqsType | AlignmentHandle,
+        model: Model,
+        rand_seed: int | None = None,
+        bootstrap_replicates: int | None = None,
+        num_threads: int | None = None,
+        fixed_params: cogent3.PhyloNode | None = None,
+        *,
+        cache: ResultCache | None = None,
+        timeout: float | None = None,
+    ) -> "Future[cogent3.PhyloNode]":
+        """Schedule build_tree to run in a worker process.
+
+        Parameters are as for build_tree, except num_threads
+        defaults to threads_per_worker. If the analysis does not
+        finish within timeout seconds (by default None, no limit),
+        it is stopped and raises IqTreeTimeoutError.
+
+        Returns
+        -------
+        Future[cogent3.PhyloNode]
+            The future maximum likelihood tree.
+
+        """
+        return self.submit(
+            build_tree,
+            aln,
+            model,
+            rand_seed,
+            bootstrap_replicates,
+            self._num_threads(num_threads),
+            fixed_params,
+            cache=cache,
+            timeout=timeout,
+        )
+
+    def submit_fit_tree(
+        self,
+        aln: c3_types.AlignedSeqsType | AlignmentHandle,
+        tree: cogent3.PhyloNode,
+        model: Model,
+        rand_seed: int | None = None,
+        num_threads: int | None = None,
+        fixed_params: cogent3.PhyloNode | None = None,
+        *,
+        cache: ResultCache | None = None,
+        timeout: float | None = None,
+    ) -> "Future[cogent3.PhyloNode]":
+        """Schedule fit_tree to run in a worker process.
+
+        Parameters are as for fit_tree, except num_threads
+        defaults to threads_per_worker. If the analysis does not
+        finish within timeout seconds (by default None, no limit),
+        it is stopped and raises IqTreeTimeoutError.
+
+        Returns
+        -------
+        Future[cogent3.PhyloNode]
+            The future tree fitted with branch lengths.
+
+        """
+        return self.submit(
+            fit_tree,
+            aln,
+            tree,
+            model,
+            rand_seed,
+            self._num_threads(num_threads),
+            fixed_params,
+            cache=cache,
+            timeout=timeout,
+        )
+
+    def submit_model_finder(
+        self,
+        aln: c3_types.AlignedSeqsType | AlignmentHandle,
+        model_set: Iterable[str] | None = None,
+        freq_set: Iterable[str] | None = None,
+        rate_set: Iterable[str] | None = None,
+        rand_seed: int | None = None,
+        num_threads: int | None = None,
+        *,
+        cache: ResultCache | None = None,
+        timeout: float | None = None,
+    ) -> "Future[ModelFinderResult]":
+        """Schedule model_finder to run in a worker process.
+
+        Parameters are as for model_finder, except num_threads
+        defaults to threads_per_worker. If the analysis does not
+        finish within timeout seconds (by default None, no limit),
+        it is stopped and raises IqTreeTimeoutError.
+
+        Returns
+        -------
+        Future[ModelFinderResult]
+            The future collection of data returned from IQ-TREE's ModelFinder.
+
+        """
+        return self.submit(
+            model_finder,
+            aln,
+            model_set,
+            freq_set,
+            rate_set,
+            rand_seed,
+            self._num_threads(num_threads),
+            cache=cache,
+            timeout=timeout,
+        )
+
+    def submit_jc_distances(
+        self,
+        aln: c3_types.AlignedSeqsType | AlignmentHandle,
+        num_threads: int | None = None,
+        *,
+        timeout: float | None = None,
+    ) -> "Future[c3_types.PairwiseDistanceType]":
+        """Schedule jc_distances to run in a worker process.
+
+        Parameters are as for jc_distances, except num_threads
+        defaults to threads_per_worker. If the analysis does not
+        finish within timeout seconds (by default None, no limit),
+        it is stopped and raises IqTreeTimeoutError.
+
+        Returns
+        -------
+        Future[c3_types.PairwiseDistanceType]
+            The future pairwise JC distance matrix.
+
+        """
+        return self.submit(
+            jc_distances,
+            aln,
+            self._num_threads(num_threads),
+            timeout=timeout,
+        )
+
+    def shutdown(self, *, wait: bool = True, cancel_futures: bool = False) -> None:
+        """Shut down the worker processes.
+
+        Parameters
+        ----------
+        wait : bool, optional
+            Whether to wait for running analyses to finish, by default True.
+        cancel_futures : bool, optional
+            Whether to cancel analyses which have not started, by default False.
+
+        """
+        with self._shutdown_lock:
+            self._shutdown = True
+            if cancel_futures:
+                while True:
+                    try:
+                        call = self._calls.get_nowait()
+                    except queue.Empty:
+                        break
+                    if call is not None and call[0].cancel():
+                        # notify anything waiting for the future
+                        call[0].set_running_or_notify_cancel()
+
+            for _ in self._threads:
+                self._calls.put(None)
+
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+
+def _job_threads(patterns: int, num_threads: int) -> int:
+    return min(num_threads, max(1, math.ceil(patterns / _PATTERNS_PER_THREAD)))
+
+
+class _JobQueue:
+    """Jobs waiting for threads, the most costly first."""
+
+    def __init__(self, threads: list[int], costs: list[int]) -> None:
+        self._threads = threads
+        self._costs = costs
+        # a queue for each number of threads, so a job fitting the free
+        # threads is found without scanning every waiting job
+        self._queues: dict[int, deque[int]] = {}
+        for job in sorted(range(len(costs)), key=costs.__getitem__, reverse=True):
+            self._queues.setdefault(threads[job], deque()).append(job)
+
+    def pop(self, free_threads: int) -> int | None:
+        """Remove the most costly job needing at most the free threads."""
+        fitting = [
+            queue[0]
+            for job_threads, queue in self._queues.items()
+            if queue and job_threads <= free_threads
+        ]
+        if not fitting:
+            return None
+        job = max(fitting, key=self._costs.__getitem__)
+        self._queues[self._threads[job]].popleft()
+        return job
+
+
+def build_trees(
+    alignments: Iterable[c3_types.AlignedSeqsType | AlignmentHandle],
+    model: Model,
+    rand_seed: int | None = None,
+    bootstrap_replicates: int | None = None,
+    num_threads: int | None = None,
+    *,
+    cache: ResultCache | None = None,
+    return_exceptions: bool = False,
+) -> Iterator[tuple[int, cogent3.PhyloNode | Exception]]:
+    """Reconstruct a phylogenetic tree for each of many alignments.
+
+    The alignments are run in worker processes, largest first, with
+    smaller alignments started whenever threads are free. Each is given
+    a number of threads according to its number of site patterns. Trees
+    are yielded as they are completed, not in the order of the alignments.
+
+    Parameters
+    ----------
+    alignments : Iterable[c3_types.AlignedSeqsType | AlignmentHandle]
+        The sequence alignments.
+    model : Model
+        The substitution model with base frequencies and rate heterogeneity.
+    rand_seed : int | None, optional
+        The random seed for every alignment - 0 or None means no seed,
+        by default None.
+    bootstrap_replicates : int, optional
+        The number of bootstrap replicates to perform, by default None.
+        If 0 is provided, then no bootstrapping is performed.
+        At least 1000 is required to perform bootstrapping.
+    num_threads : int | None, optional
+        The total number of threads to use across all alignments,
+        by default None (the number of CPUs).
+    cache : ResultCache | None, optional
+        A cache to look the results up in and store them in, by default None.
+        Only used when a random seed is given.
+    return_exceptions : bool, optional
+        Whether an error for an alignment is yielded in place of its tree,
+        so the other alignments are still run, by default False (the error
+        is raised when the tree would be yielded, and no more alignments
+        are run).
+
+    Returns
+    -------
+    Iterator[tuple[int, cogent3.PhyloNode | Exception]]
+        The index of each alignment and its maximum likelihood tree, or the
+        error for it if return_exceptions is True. Closing the iterator
+        early stops the analyses still running.
+
+    Raises
+    ------
+    ValueError
+        If num_threads is not positive.
+
+    """
+    if num_threads is None:
+        num_threads = os.cpu_count() or 1
+    if num_threads < 1:
+        msg = f"num_threads must be positive, got {num_threads}."
+        raise ValueError(msg)
+
+    alignments = list(alignments)
+    if not alignments:
+        return iter(())
+
+    threads = []
+    costs = []
+    for aln in alignments:
+        patterns = num_patterns(aln)
+        threads.append(_job_threads(patterns, num_threads))
+        # the running time grows with the number of patterns and sequences
+        costs.append(patterns * len(aln.names))
+
+    return _stream_trees(
+        alignments,
+        threads,
+        costs,
+        num_threads,
+        functools.partial(
+            Executor.submit_build_tree,
+            model=model,
+            rand_seed=rand_seed,
+            bootstrap_replicates=bootstrap_replicates,
+            cache=cache,
+        ),
+        return_exceptions=return_exceptions,
+    )
+
+
+def _stream_trees(
+    alignments: list[c3_types.AlignedSeqsType | AlignmentHandle],
+    threads: list[int],
+    costs: list[int],
+    num_threads: int,
+    submit: Callable[..., "Future[cogent3.PhyloNode]"],
+    *,
+    return_exceptions: bool,
+) -> Iterator[tuple[int, cogent3.PhyloNode | Exception]]:
+    queue = _JobQueue(threads, costs)
+    free_threads = num_threads
+    running: dict[Future[cogent3.PhyloNode], int] = {}
+    executor = Executor(max_workers=min(num_threads, len(alignments)))
+    try:
+        while True:
+            while (i := queue.pop(free_threads)) is not None:
+                future = submit(executor, alignments[i], num_threads=threads[i])
+                running[future] = i
+                free_threads -= threads[i]
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = running.pop(future)
+                free_threads += threads[i]
+                error = future.exception()
+                if return_exceptions and isinstance(error, Exception):
+                    yield i, error
+                else:
+                    yield i, future.result()
+    finally:
+        # shutting down only waits for running analyses, so stop them
+        for future in running:
+            future.cancel()
+        executor.shutdown(cancel_futures=True)
@@ -4,10 +4,12 @@ import cogent3.app.typing as c3_types
 import numpy as np
 from _piqtree import iq_jc_distances
 from cogent3.evolve.fast_distance import DistanceMatrix
+from cogent3.util.dict_array import DictArrayTemplate
 
+from piqtree.iqtree._alignment import AlignmentHandle, iqtree_seqs
 from piqtree.iqtree._decorator import iqtree_func
 
-iq_jc_distances = iqtree_func(iq_jc_distances, hide_files=True)
+iq_jc_distances = iqtree_func(iq_jc_distances, hide_files=True, allocate_threads=True)
 
 
 def _dists_to_distmatrix(
@@ -29,22 +31,19 @@ def _dists_to_distmatrix(
         Pairwise distance matrix.
 
     """
-    dist_dict = {}
-    for i in range(1, len(distances)):
-        for j in range(i):
-            dist_dict[(names[i], names[j])] = distances[i, j]
-    return DistanceMatrix(dist_dict)
+    template = DictArrayTemplate(names, names)
+    return DistanceMatrix(template.wrap(distances))
 
 
 def jc_distances(
-    aln: c3_types.AlignedSeqsType,
+    aln: c3_types.AlignedSeqsType | AlignmentHandle,
     num_threads: int | None = None,
 ) -> c3_types.PairwiseDistanceType:
     """Compute pairwise JC distances for a given alignment.
 
     Parameters
     ----------
-    aln : c3_types.AlignedSeqsType
+    aln : c3_types.AlignedSeqsType | AlignmentHandle
         alignment to compute pairwise JC distances for.
     num_threads: int | None, optional
         Number of threads for IQ-TREE 2 to use, by default None (all available threads).
@@ -59,9 +58,6 @@ def jc_distances(
         num_threads = 0
 
     names = aln.names
-    seqs = [str(seq) for seq in aln.iter_seqs(names)]
 
-    distances = np.array(iq_jc_distances(names, seqs, num_threads)).reshape(
-        (len(names), len(names)),
-    )
+    distances = iq_jc_distances(*iqtree_seqs(aln), num_threads)
     return _dists_to_distmatrix(distances, names)
@@ -0,0 +1,114 @@
+"""Timing and resource metrics of IQ-TREE calls."""
+
+import re
+import resource
+import sys
+
+# the times IQ-TREE logs for each phase of an analysis
+_PHASE_TIMES = {
+    "model_finder": (
+        re.compile(r"Wall-clock time for ModelFinder: (?P<wall_time>\S+) sec"),
+        re.compile(r"CPU time for ModelFinder: (?P<cpu_time>\S+) sec"),
+    ),
+    "fast_tree_search": (
+        re.compile(r"Time for fast ML tree search: (?P<wall_time>\S+) sec"),
+    ),
+    "parameter_optimisation": (
+        re.compile(r"Parameters optimization took \d+ rounds \((?P<wall_time>\S+) sec"),
+    ),
+    "ml_distances": (
+        re.compile(
+            r"Computing ML distances took (?P<wall_time>\S+) sec "
+            r"\(of wall-clock time\) (?P<cpu_time>\S+) sec",
+        ),
+    ),
+    "nj_tree": (
+        re.compile(
+            r"Computing (?:RapidNJ|BIONJ) tree took (?P<wall_time>\S+) sec "
+            r"\(of wall-clock time\) (?P<cpu_time>\S+) sec",
+        ),
+    ),
+    "tree_search": (
+        re.compile(r"Wall-clock time used for tree search: (?P<wall_time>\S+) sec"),
+        re.compile(r"CPU time used for tree search: (?P<cpu_time>\S+) sec"),
+    ),
+}
+
+_KERNEL = re.compile(
+    r"Kernel:\s+(?P<kernel>.+?) - (?P<num_threads>\d+|auto-detect) threads",
+)
+# the number of threads chosen when IQ-TREE is asked to detect it
+_BEST_THREADS = re.compile(r"BEST NUMBER OF THREADS: (?P<num_threads>\d+)")
+
+
+def peak_memory() -> int:
+    """The peak resident memory of the process in bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # reported in bytes on macOS and kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def phase_times(log: str) -> dict[str, dict[str, float]]:
+    """The wall and CPU time of each phase of an analysis.
+
+    Parameters
+    ----------
+    log : str
+        The contents of the IQ-TREE log file.
+
+    Returns
+    -------
+    dict[str, dict[str, float]]
+        The wall_time and cpu_time (where logged) in seconds of each
+        phase in the log, summed over repeats such as each round of
+        parameter optimisation.
+
+    """
+    phases: dict[str, dict[str, float]] = {}
+    for phase, patterns in _PHASE_TIMES.items():
+        for pattern in patterns:
+            for match in pattern.finditer(log):
+                times = phases.setdefault(phase, {})
+                for kind, value in match.groupdict().items():
+                    times[kind] = times.get(kind, 0.0) + float(value)
+    return phases
+
+
+def call_metrics(log: str | None, wall_time: float, cpu_time: float) -> dict:
+    """Metrics of an IQ-TREE call.
+
+    Parameters
+    ----------
+    log : str | None
+        The contents of the IQ-TREE log file, if one was written.
+    wall_time : float
+        The wall time of the call in seconds.
+    cpu_time : float
+        The CPU time of the process during the call in seconds.
+
+    Returns
+    -------
+    dict
+        The wall_time, cpu_time, peak_memory (of the process, in bytes),
+        kernel and num_threads (as logged by IQ-TREE, or None) and the
+        times of each phase. When IQ-TREE detected the number of threads,
+        num_threads is the number it chose. cached is False, and is set
+        when the result is later taken from a ResultCache.
+
+    """
+    log = log or ""
+    kernel = _KERNEL.search(log)
+    num_threads = _BEST_THREADS.search(log) or kernel
+    return {
+        "wall_time": wall_time,
+        "cpu_time": cpu_time,
+        "peak_memory": peak_memory(),
+        "kernel": kernel["kernel"] if kernel else None,
+        "num_threads": (
+            int(num_threads["num_threads"])
+            if num_threads and num_threads["num_threads"].isdigit()
+            else None
+        ),
+        "phases": phase_times(log),
+        "cached": False,
+    }
@@ -4,15 +4,32 @@ import dataclasses
 from collections.abc import Iterable
 from typing import Any
 
-import yaml
+import cogent3
 from _piqtree import iq_model_finder
 from cogent3.app import typing as c3_types
 from cogent3.util.misc import get_object_provenance
 
+from piqtree.iqtree._alignment import AlignmentHandle, iqtree_seqs
+from piqtree.iqtree._cache import ResultCache, cached_result
 from piqtree.iqtree._decorator import iqtree_func
+from piqtree.iqtree._thread_cache import with_auto_threads
+from piqtree.iqtree._tree import _rename_iq_tree
 from piqtree.model import Model, make_model
 
-iq_model_finder = iqtree_func(iq_model_finder, hide_files=True)
+iq_model_finder = iqtree_func(
+    iq_model_finder,
+    hide_files=True,
+    record_metrics=True,
+    allocate_threads=True,
+)
+
+# the trees in the raw data, with the attribute each is stored as
+TREE_KEYS = {
+    "initTree": "initial_tree",
+    "best_tree_AIC": "best_aic_tree",
+    "best_tree_AICc": "best_aicc_tree",
+    "best_tree_BIC": "best_bic_tree",
+}
 
 
 @dataclasses.dataclass(slots=True, frozen=True)
@@ -60,8 +77,20 @@ class ModelFinderResult:
         The best AICc model.
     best_bic: Model
         The best BIC model.
+    initial_tree: cogent3.PhyloNode | None
+        The initial tree used by ModelFinder.
+    best_aic_tree: cogent3.PhyloNode | None
+        The tree fitted with the best AIC model. Its topology can be given
+        to fit_tree to avoid a full tree search.
+    best_aicc_tree: cogent3.PhyloNode | None
+        The tree fitted with the best AICc model.
+    best_bic_tree: cogent3.PhyloNode | None
+        The tree fitted with the best BIC model.
     model_stats:
         Semi-processed representation of raw_data.
+    metrics: dict[str, Any] | None
+        The time and memory used by ModelFinder, and the time of each
+        phase of the analysis.
     """
 
     source: str
@@ -69,11 +98,36 @@ class ModelFinderResult:
     best_aic: Model = dataclasses.field(init=False)
     best_aicc: Model = dataclasses.field(init=False)
     best_bic: Model = dataclasses.field(init=False)
+    initial_tree: cogent3.PhyloNode | None = dataclasses.field(
+        init=False,
+        repr=False,
+        default=None,
+    )
+    best_aic_tree: cogent3.PhyloNode | None = dataclasses.field(
+        init=False,
+        repr=False,
+        default=None,
+    )
+    best_aicc_tree: cogent3.PhyloNode | None = dataclasses.field(
+        init=False,
+        repr=False,
+        default=None,
+    )
+    best_bic_tree: cogent3.PhyloNode | None = dataclasses.field(
+        init=False,
+        repr=False,
+        default=None,
+    )
     model_stats: dict[Model | str, ModelResultValue] = dataclasses.field(
         init=False,
         repr=False,
         default_factory=dict,
     )
+    metrics: dict[str, Any] | None = dataclasses.field(
+        init=False,
+        repr=False,
+        default=None,
+    )
 
     def __post_init__(self, raw_data: dict[str, Any]) -> None:
         self.model_stats = {
@@ -85,6 +139,11 @@ class ModelFinderResult:
         self.best_aicc = make_model(raw_data["best_model_AICc"])
         self.best_bic = make_model(raw_data["best_model_BIC"])
 
+        for key, attr in TREE_KEYS.items():
+            if newick := raw_data.get(key):
+                setattr(self, attr, cogent3.make_tree(newick))
+        self.metrics = raw_data.get("metrics")
+
         self.model_stats[self.best_aic] = ModelResultValue.from_string(
             raw_data[str(self.best_aic)],
         )
@@ -106,6 +165,11 @@ class ModelFinderResult:
         }
         for attr in ("best_model_AIC", "best_model_AICc", "best_model_BIC"):
             raw_data[attr] = str(getattr(self, attr.replace("_model", "").lower()))
+        for key, attr in TREE_KEYS.items():
+            if (tree := getattr(self, attr)) is not None:
+                raw_data[key] = str(tree)
+        if self.metrics is not None:
+            raw_data["metrics"] = self.metrics
         result["init_kwargs"] = {"raw_data": raw_data, "source": self.source}
         return result
 
@@ -115,18 +179,20 @@ class ModelFinderResult:
 
 
 def model_finder(
-    aln: c3_types.AlignedSeqsType,
+    aln: c3_types.AlignedSeqsType | AlignmentHandle,
     model_set: Iterable[str] | None = None,
     freq_set: Iterable[str] | None = None,
     rate_set: Iterable[str] | None = None,
     rand_seed: int | None = None,
     num_threads: int | None = None,
+    *,
+    cache: ResultCache | None = None,
 ) -> ModelFinderResult | c3_types.SerialisableType:
     """Find the models of best fit for an alignment using ModelFinder.
 
     Parameters
     ----------
-    aln : c3_types.AlignedSeqsType
+    aln : c3_types.AlignedSeqsType | AlignmentHandle
         The alignment to find the model of best fit for.
     model_set : Iterable[str] | None, optional
         Search space for models.
@@ -141,7 +207,11 @@ def model_finder(
         The random seed - 0 or None means no seed, by default None.
     num_threads: int | None, optional
         Number of threads for IQ-TREE 2 to use, by default None (single-threaded).
-        If 0 is specified, IQ-TREE attempts to find the optimal number of threads.
+        If 0 is specified, IQ-TREE attempts to find the optimal number of threads,
+        which is remembered for similar analyses (see configure_thread_cache).
+    cache : ResultCache | None, optional
+        A cache to look the result up in and store it in, by default None.
+        Only used when a random seed is given.
 
     Returns
     -------
@@ -162,18 +232,47 @@ def model_finder(
     if rate_set is None:
         rate_set = set()
 
-    names = aln.names
-    seqs = [str(seq) for seq in aln.iter_seqs(names)]
-
-    raw = yaml.safe_load(
-        iq_model_finder(
-            names,
-            seqs,
-            rand_seed,
-            ",".join(model_set),
-            ",".join(freq_set),
-            ",".join(rate_set),
+    search_space = {
+        "model_set": sorted(model_set),
+        "freq_set": sorted(freq_set),
+        "rate_set": sorted(rate_set),
+    }
+
+    # the search space in the form of IQ-TREE's options, in place of the
+    # model of the thread profile
+    profile_model = "MF" + "".join(
+        f" -{option} {','.join(search_space[key])}"
+        for option, key in (
+            ("mset", "model_set"),
+            ("mfreq", "freq_set"),
+            ("mrate", "rate_set"),
+        )
+        if search_space[key]
+    )
+
+    raw = cached_result(
+        cache,
+        "model_finder",
+        aln,
+        {**search_space, "rand_seed": rand_seed},
+        lambda: with_auto_threads(
+            aln,
+            profile_model,
             num_threads,
+            lambda threads: iq_model_finder(
+                *iqtree_seqs(aln),
+                rand_seed,
+                ",".join(search_space["model_set"]),
+                ",".join(search_space["freq_set"]),
+                ",".join(search_space["rate_set"]),
+                threads,
+            ),
         ),
     )
-    return ModelFinderResult(raw_data=raw, source=source)
+    result = ModelFinderResult(raw_data=raw, source=source)
+
+    # IQ-TREE names the tips of the trees by the index of the sequence
+    for attr in TREE_KEYS.values():
+        if (tree := getattr(result, attr)) is not None:
+            _rename_iq_tree(tree, aln.names)
+    return result
@@ -1,14 +1,31 @@
 """Python wrappers to random tree generation in the IQ-TREE library."""
 
+import os
+import pathlib
+import secrets
+import time
+from collections.abc import Iterator
 from enum import Enum, auto
 
 import cogent3
+import numpy as np
 from _piqtree import iq_random_tree
 
 from piqtree.iqtree._decorator import iqtree_func
+from piqtree.iqtree._executor import Executor
 
 iq_random_tree = iqtree_func(iq_random_tree)
 
+# IQ-TREE takes the seed as a C int, and 0 means no seed
+_MAX_SEED = 2**31 - 1
+
+# the number of trees in each independent stream of random_trees
+_STREAM_SIZE = 100
+
+# the seconds a worker process takes to start, most of which is spent
+# importing piqtree, as measured on a single CPU
+_WORKER_START_TIME = 4.0
+
 
 class TreeGenMode(Enum):
     """Setting under which to generate random trees."""
@@ -26,11 +43,22 @@ def random_trees(
     num_taxa: int,
     tree_mode: TreeGenMode,
     rand_seed: int | None = None,
+    num_threads: int | None = None,
 ) -> tuple[cogent3.PhyloNode]:
     """Generate a collection of random trees.
 
     Generates a random collection of trees through IQ-TREE.
 
+    The trees are generated in streams of 100 trees, each with its own
+    seed derived from the random seed, so the trees are the same for a
+    given seed whatever the value of num_threads, and are those of
+    iter_random_trees with a batch_size of 100. As IQ-TREE's generator
+    cannot be run by several threads of a process at once, the streams
+    are shared among worker processes. The first stream is generated in
+    this process, timing how long the rest would take here, and workers
+    are only started if they would finish sooner, allowing for the few
+    seconds each takes to start.
+
     Parameters
     ----------
     num_trees : int
@@ -41,16 +69,218 @@ def random_trees(
         How the trees are generated.
     rand_seed : int | None, optional
         The random seed - 0 or None means no seed, by default None.
+    num_threads : int | None, optional
+        Number of worker processes to generate the trees in, 0 for all
+        available CPUs, by default None (generated in this process).
 
     Returns
     -------
     tuple[cogent3.PhyloNode]
         A collection of random trees.
 
+    Raises
+    ------
+    ValueError
+        If num_threads is negative.
+
     """
-    if rand_seed is None:
-        rand_seed = 0  # The default rand_seed in IQ-TREE
-    trees = iq_random_tree(num_taxa, tree_mode.name, num_trees, rand_seed)
-    return tuple(
-        cogent3.make_tree(newick) for newick in trees.split("\n") if newick != ""
+    if num_threads is None:
+        num_threads = 1
+
+    newicks = _parallel_newicks(num_trees, num_taxa, tree_mode, rand_seed, num_threads)
+    return tuple(cogent3.make_tree(newick) for newick in newicks)
+
+
+def _batch_seed(rand_seed: int, batch: int) -> int:
+    # a distinct seed for each batch, reproducible from the seed of the stream
+    state = np.random.SeedSequence([rand_seed, batch]).generate_state(1)[0]
+    return int(state) % _MAX_SEED + 1
+
+
+def _check_batches(num_trees: int, batch_size: int) -> None:
+    if num_trees < 0:
+        msg = f"num_trees must not be negative, got {num_trees}."
+        raise ValueError(msg)
+    if batch_size < 1:
+        msg = f"batch_size must be positive, got {batch_size}."
+        raise ValueError(msg)
+
+
+def _batch_seeds(
+    num_trees: int,
+    rand_seed: int | None,
+    batch_size: int,
+) -> Iterator[tuple[int, int]]:
+    # the number of trees in each batch and its seed
+    if not rand_seed:
+        # batches without seeds could repeat, as IQ-TREE seeds from the time
+        rand_seed = secrets.randbelow(_MAX_SEED) + 1
+
+    for batch, start in enumerate(range(0, num_trees, batch_size)):
+        yield min(batch_size, num_trees - start), _batch_seed(rand_seed, batch)
+
+
+def _newick_batch(
+    num_taxa: int,
+    tree_mode_name: str,
+    num_trees: int,
+    rand_seed: int,
+) -> list[str]:
+    trees = iq_random_tree(num_taxa, tree_mode_name, num_trees, rand_seed)
+    return [newick for newick in trees.split("\n") if newick != ""]
+
+
+def _newick_batches(
+    num_trees: int,
+    num_taxa: int,
+    tree_mode: TreeGenMode,
+    rand_seed: int | None,
+    batch_size: int,
+) -> Iterator[list[str]]:
+    for size, seed in _batch_seeds(num_trees, rand_seed, batch_size):
+        yield _newick_batch(num_taxa, tree_mode.name, size, seed)
+
+
+def _parallel_newicks(
+    num_trees: int,
+    num_taxa: int,
+    tree_mode: TreeGenMode,
+    rand_seed: int | None,
+    num_threads: int,
+) -> Iterator[str]:
+    if num_threads < 0:
+        msg = f"num_threads must not be negative, got {num_threads}."
+        raise ValueError(msg)
+    _check_batches(num_trees, _STREAM_SIZE)
+
+    streams = list(_batch_seeds(num_trees, rand_seed, _STREAM_SIZE))
+    if not streams:
+        return
+
+    # the time to generate the first stream here estimates that of the rest
+    (first_size, first_seed), *rest = streams
+    start = time.perf_counter()
+    newicks = _newick_batch(num_taxa, tree_mode.name, first_size, first_seed)
+    rest_time = (
+        (time.perf_counter() - start) * sum(size for size, _ in rest) / first_size
     )
+    yield from newicks
+
+    num_workers = min(num_threads or os.cpu_count() or 1, len(rest))
+    if num_workers <= 1 or _WORKER_START_TIME + rest_time / num_workers >= rest_time:
+        for size, seed in rest:
+            yield from _newick_batch(num_taxa, tree_mode.name, size, seed)
+        return
+
+    with Executor(num_workers) as executor:
+        futures = [
+            executor.submit(_newick_batch, num_taxa, tree_mode.name, size, seed)
+            for size, seed in rest
+        ]
+        for future in futures:
+            yield from future.result()
+
+
+def iter_random_trees(
+    num_trees: int,
+    num_taxa: int,
+    tree_mode: TreeGenMode,
+    rand_seed: int | None = None,
+    *,
+    batch_size: int = 1000,
+    as_newick: bool = False,
+) -> Iterator[cogent3.PhyloNode | str]:
+    """Generate random trees one batch at a time.
+
+    Unlike random_trees, only one batch of trees is held at a time, so
+    any number of trees can be generated. Each batch is generated by
+    IQ-TREE with its own seed, derived from the random seed and the
+    index of the batch, so the trees are reproducible for a given seed
+    and batch size (and are those of random_trees with a batch_size of
+    100).
+
+    Parameters
+    ----------
+    num_trees : int
+        The number of trees to generate.
+    num_taxa : int
+        The number of taxa per tree.
+    tree_mode : TreeGenMode
+        How the trees are generated.
+    rand_seed : int | None, optional
+        The random seed - 0 or None means no seed, by default None.
+    batch_size : int, optional
+        The number of trees IQ-TREE generates at a time, by default 1000.
+    as_newick : bool, optional
+        Whether to yield each tree as a newick string rather than
+        constructing a cogent3 tree, by default False.
+
+    Returns
+    -------
+    Iterator[cogent3.PhyloNode | str]
+        The random trees.
+
+    Raises
+    ------
+    ValueError
+        If num_trees is negative or batch_size is not positive.
+
+    See Also
+    --------
+    write_random_trees : random trees written to a file.
+
+    """
+    # checked before the first tree is requested
+    _check_batches(num_trees, batch_size)
+    batches = _newick_batches(num_trees, num_taxa, tree_mode, rand_seed, batch_size)
+    if as_newick:
+        return (newick for batch in batches for newick in batch)
+    return (cogent3.make_tree(newick) for batch in batches for newick in batch)
+
+
+def write_random_trees(
+    path: str | os.PathLike,
+    num_trees: int,
+    num_taxa: int,
+    tree_mode: TreeGenMode,
+    rand_seed: int | None = None,
+    *,
+    batch_size: int = 1000,
+) -> None:
+    """Write random trees to a file, one newick string per line.
+
+    The trees are generated one batch at a time as by iter_random_trees,
+    with the same trees for the same seed and batch size, and written
+    without constructing cogent3 trees.
+
+    Parameters
+    ----------
+    path : str | os.PathLike
+        The file to write, replacing any existing file.
+    num_trees : int
+        The number of trees to generate.
+    num_taxa : int
+        The number of taxa per tree.
+    tree_mode : TreeGenMode
+        How the trees are generated.
+    rand_seed : int | None, optional
+        The random seed - 0 or None means no seed, by default None.
+    batch_size : int, optional
+        The number of trees IQ-TREE generates at a time, by default 1000.
+
+    Raises
+    ------
+    ValueError
+        If num_trees is negative or batch_size is not positive.
+
+    """
+    _check_batches(num_trees, batch_size)
+    with pathlib.Path(path).open("w") as out:
+        for batch in _newick_batches(
+            num_trees,
+            num_taxa,
+            tree_mode,
+            rand_seed,
+            batch_size,
+        ):
+            out.writelines(f"{newick}\n" for newick in batch)
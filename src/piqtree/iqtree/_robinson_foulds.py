@@ -4,34 +4,70 @@ from collections.abc import Sequence
 
 import cogent3
 import numpy as np
-from _piqtree import iq_robinson_fould
+from _piqtree import iq_rf_all_pairs, iq_rf_one_to_many
 
 from piqtree.iqtree._decorator import iqtree_func
 
-iq_robinson_fould = iqtree_func(iq_robinson_fould)
+iq_rf_all_pairs = iqtree_func(iq_rf_all_pairs, hide_output=False, allocate_threads=True)
+iq_rf_one_to_many = iqtree_func(
+    iq_rf_one_to_many,
+    hide_output=False,
+    allocate_threads=True,
+)
 
 
-def robinson_foulds(trees: Sequence[cogent3.PhyloNode]) -> np.ndarray:
+def robinson_foulds(
+    trees: Sequence[cogent3.PhyloNode],
+    reference: cogent3.PhyloNode | None = None,
+    *,
+    condensed: bool = False,
+    num_threads: int | None = None,
+) -> np.ndarray:
     """Pairwise Robinson-Foulds distance between a sequence of trees.
 
     For the given collection of trees, returns a numpy array containing
-    the pairwise distances between the trees.
+    the pairwise distances between the trees. If a reference tree is given,
+    instead returns the distance from the reference tree to each tree.
+
+    Each tree is parsed once into its bipartitions, so large collections
+    of trees can be compared in a single call.
 
     Parameters
     ----------
     trees : Sequence[cogent3.PhyloNode]
         The sequence of trees to calculate the pairwise Robinson-Foulds
         distances of.
+    reference : cogent3.PhyloNode | None, optional
+        A tree to compare each of the trees to, by default None
+        (compare every pair of trees).
+    condensed : bool, optional
+        Whether to return only the upper triangle of the pairwise
+        distance matrix, in the condensed form used by
+        scipy.spatial.distance, by default False.
+    num_threads : int | None, optional
+        Number of threads to use, by default None (all available threads).
 
     Returns
     -------
     np.ndarray
-        Pairwise Robinson-Foulds distances.
+        Pairwise Robinson-Foulds distances. A square matrix, or a vector
+        of length n(n-1)/2 if condensed. If a reference tree is given,
+        a vector of distances from the reference tree to each tree.
+
+    Raises
+    ------
+    ValueError
+        If condensed output is requested with a reference tree.
     """
-    pairwise_distances = np.zeros((len(trees), len(trees)))
-    for i in range(1, len(trees)):
-        for j in range(i):
-            rf = iq_robinson_fould(str(trees[i]), str(trees[j]))
-            pairwise_distances[i, j] = rf
-            pairwise_distances[j, i] = rf
-    return pairwise_distances
+    if num_threads is None:
+        num_threads = 0
+
+    newicks = [str(tree) for tree in trees]
+
+    if reference is not None:
+        if condensed:
+            msg = "Condensed output is only available for pairwise distances."
+            raise ValueError(msg)
+        return iq_rf_one_to_many(str(reference), newicks, num_threads)
+
+    return iq_rf_all_pairs(newicks, condensed, num_threads)
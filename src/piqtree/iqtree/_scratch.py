@@ -0,0 +1,172 @@
+"""Scratch directories for the output files of IQ-TREE calls."""
+
+import atexit
+import contextlib
+import os
+import pathlib
+import shutil
+import tempfile
+import threading
+from collections.abc import Iterator
+
+
+class _Scratch:
+    """Where IQ-TREE calls write their output files.
+
+    IQ-TREE reuses output file names between calls, so each call is given
+    its own directory, or when reusing directories, each thread reuses its
+    own. The working directory is shared by every thread in the process,
+    so calls take turns only while they are changed into their directory.
+    """
+
+    def __init__(self) -> None:
+        # guards the settings and the reusable directories
+        self.lock = threading.Lock()
+        # held while a call is changed into its directory
+        self.cwd_lock = threading.Lock()
+        self.directory: pathlib.Path | None = None
+        self.reuse = False
+        self._local = threading.local()
+        self._reusable: set[pathlib.Path] = set()
+
+    def configure(self, directory: pathlib.Path | None, *, reuse: bool) -> None:
+        with self.lock:
+            self._remove_reusable()
+            self.directory = directory
+            self.reuse = reuse
+
+    def _remove_reusable(self) -> None:
+        for path in self._reusable:
+            shutil.rmtree(path, ignore_errors=True)
+        self._reusable.clear()
+        self._local = threading.local()
+
+    def _reusable_dir(self) -> pathlib.Path:
+        with self.lock:
+            path = getattr(self._local, "path", None)
+            if path is None or not path.is_dir():
+                path = pathlib.Path(
+                    tempfile.mkdtemp(prefix="piqtree_scratch_", dir=self.directory),
+                )
+                self._local.path = path
+                self._reusable.add(path)
+            return path
+
+    @contextlib.contextmanager
+    def enter(self, prefix: str) -> Iterator[pathlib.Path]:
+        with contextlib.ExitStack() as stack:
+            if self.reuse:
+                path = self._reusable_dir()
+                stack.callback(_clear_dir, path)
+            else:
+                path = pathlib.Path(
+                    stack.enter_context(
+                        tempfile.TemporaryDirectory(prefix=prefix, dir=self.directory),
+                    ),
+                )
+            yield path
+
+    @contextlib.contextmanager
+    def change_into(self, path: pathlib.Path) -> Iterator[None]:
+        with self.cwd_lock:
+            original_dir = pathlib.Path.cwd()
+            os.chdir(path)
+            try:
+                yield
+            finally:
+                os.chdir(original_dir)
+
+
+def _clear_dir(path: pathlib.Path) -> None:
+    # remove the output files, so a later call cannot resume from a checkpoint
+    for entry in os.scandir(path):
+        if entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path, ignore_errors=True)
+        else:
+            pathlib.Path(entry.path).unlink(missing_ok=True)
+
+
+_scratch = _Scratch()
+atexit.register(_scratch.configure, None, reuse=False)
+
+
+def scratch_dir(prefix: str) -> contextlib.AbstractContextManager[pathlib.Path]:
+    """A scratch directory for the output files of an IQ-TREE call.
+
+    Parameters
+    ----------
+    prefix : str
+        The prefix of the name of a new directory.
+
+    Returns
+    -------
+    contextlib.AbstractContextManager[pathlib.Path]
+        The scratch directory, empty when entered, and removed or
+        emptied on exit.
+
+    """
+    return _scratch.enter(prefix)
+
+
+def in_scratch_dir(path: pathlib.Path) -> contextlib.AbstractContextManager[None]:
+    """Changes into a scratch directory while IQ-TREE runs.
+
+    The working directory is shared by every thread in the process, so
+    only one call is changed into its directory at a time.
+
+    Parameters
+    ----------
+    path : pathlib.Path
+        The scratch directory.
+
+    Returns
+    -------
+    contextlib.AbstractContextManager[None]
+        Changes back to the original working directory on exit.
+
+    """
+    return _scratch.change_into(path)
+
+
+def scratch_settings() -> tuple[pathlib.Path | None, bool]:
+    """The directory scratch directories are placed in, and whether to reuse one."""
+    return _scratch.directory, _scratch.reuse
+
+
+def configure_scratch(
+    directory: str | os.PathLike | None = None,
+    *,
+    reuse: bool = False,
+) -> None:
+    """Configure where IQ-TREE writes its output files.
+
+    IQ-TREE writes output files, such as its log, while it runs.
+    By default, each call is given a new temporary directory which
+    is removed afterwards. The directories can instead be placed on a
+    chosen file system, such as a RAM-backed /dev/shm, and each thread
+    can reuse a single directory for all of its calls, emptied after
+    each call. Executor workers started afterwards use the same
+    settings.
+
+    Parameters
+    ----------
+    directory : str | os.PathLike | None, optional
+        The directory to create scratch directories in, by default None
+        (the system's temporary directory).
+    reuse : bool, optional
+        Whether each thread reuses one scratch directory for all of its
+        calls, by default False.
+
+    Raises
+    ------
+    NotADirectoryError
+        If the directory does not exist.
+
+    """
+    if directory is not None:
+        directory = pathlib.Path(directory)
+        if not directory.is_dir():
+            msg = f"Scratch directory {directory} does not exist."
+            raise NotADirectoryError(msg)
+
+    _scratch.configure(directory, reuse=reuse)
@@ -0,0 +1,189 @@
+"""Remembering the number of threads IQ-TREE detects for each kind of alignment."""
+
+import contextlib
+import json
+import os
+import pathlib
+import tempfile
+import threading
+from collections.abc import Callable
+from typing import Any
+
+import cogent3.app.typing as c3_types
+
+from piqtree.iqtree._alignment import AlignmentHandle, num_patterns
+from piqtree.iqtree._cpu_budget import cpu_budget_settings
+
+
+def _bucket(count: int) -> int:
+    # the power of two at or above the count
+    return 1 << max(count - 1, 0).bit_length()
+
+
+def thread_profile(
+    aln: c3_types.AlignedSeqsType | AlignmentHandle,
+    model: str,
+) -> str:
+    """The profile of an analysis sharing its best number of threads.
+
+    Parameters
+    ----------
+    aln : c3_types.AlignedSeqsType | AlignmentHandle
+        The alignment analysed.
+    model : str
+        The IQ-TREE model string.
+
+    Returns
+    -------
+    str
+        The number of CPUs, the numbers of sequences and site patterns
+        rounded up to a power of two, the molecular type and the model.
+
+    """
+    return ",".join(
+        [
+            str(os.cpu_count()),
+            str(_bucket(len(aln.names))),
+            str(_bucket(num_patterns(aln))),
+            aln.moltype.label,
+            model,
+        ],
+    )
+
+
+class _ThreadCache:
+    """The number of threads IQ-TREE detected for each profile of analysis.
+
+    Held in memory, and in a JSON file if a path is given so the counts
+    are shared by processes and kept between sessions.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.path: pathlib.Path | None = None
+        self._counts: dict[str, int] = {}
+
+    def configure(self, path: pathlib.Path | None) -> None:
+        with self._lock:
+            self.path = path
+            self._counts = self._read()
+
+    def _read(self) -> dict[str, int]:
+        if self.path is None:
+            return {}
+        try:
+            return json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, profile: str) -> int | None:
+        with self._lock:
+            if profile not in self._counts:
+                # another process may have detected it since
+                self._counts.update(self._read())
+            return self._counts.get(profile)
+
+    def put(self, profile: str, num_threads: int) -> None:
+        with self._lock:
+            self._counts = {**self._read(), **self._counts, profile: num_threads}
+            if self.path is not None:
+                self._write()
+
+    def _write(self) -> None:
+        # replace the file at once so readers never see part of it
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as out:
+                json.dump(self._counts, out, indent=1, sort_keys=True)
+            pathlib.Path(tmp).replace(self.path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                pathlib.Path(tmp).unlink()
+            raise
+
+
+_thread_cache = _ThreadCache()
+
+
+def thread_cache_path() -> pathlib.Path | None:
+    """The file the detected numbers of threads are kept in, if any."""
+    return _thread_cache.path
+
+
+def configure_thread_cache(path: str | os.PathLike | None = None) -> None:
+    """Configure where the numbers of threads IQ-TREE detects are kept.
+
+    When num_threads is 0, IQ-TREE measures how quickly the analysis runs
+    with increasing numbers of threads before starting, which can take as
+    long as the analysis itself. The number it chooses is remembered for
+    analyses of the same profile: the number of CPUs, the numbers of
+    sequences and site patterns (rounded up to a power of two), the
+    molecular type and the model. Later analyses with num_threads of 0
+    and the same profile use it without measuring again.
+
+    The numbers are kept in memory, and in a JSON file if a path is
+    given, so they are shared with other processes (such as Executor
+    workers started afterwards) and later sessions. Configuring the
+    cache forgets numbers which are not in the file.
+
+    Parameters
+    ----------
+    path : str | os.PathLike | None, optional
+        The JSON file to keep the numbers of threads in, created when a
+        number is first stored, by default None (kept in memory only).
+
+    Raises
+    ------
+    NotADirectoryError
+        If the directory of the file does not exist.
+
+    """
+    if path is not None:
+        path = pathlib.Path(path)
+        if not path.parent.is_dir():
+            msg = f"Directory {path.parent} does not exist."
+            raise NotADirectoryError(msg)
+
+    _thread_cache.configure(path)
+
+
+def with_auto_threads(
+    aln: c3_types.AlignedSeqsType | AlignmentHandle,
+    model: str,
+    num_threads: int,
+    run: Callable[[int], dict[str, Any]],
+) -> dict[str, Any]:
+    """Run an analysis, remembering the number of threads IQ-TREE detects.
+
+    Parameters
+    ----------
+    aln : c3_types.AlignedSeqsType | AlignmentHandle
+        The alignment analysed.
+    model : str
+        The IQ-TREE model string.
+    num_threads : int
+        The number of threads, or 0 to use the number remembered for the
+        profile of the analysis, or have IQ-TREE detect it. Under a CPU
+        budget (see configure_cpu_budget), 0 is every CPU of the budget.
+    run : Callable[[int], dict[str, Any]]
+        Runs the analysis with a number of threads, returning its result
+        with metrics.
+
+    Returns
+    -------
+    dict[str, Any]
+        The result of the analysis.
+
+    """
+    if num_threads != 0 or cpu_budget_settings()[0]:
+        # under a CPU budget, 0 is every CPU of the budget
+        return run(num_threads)
+
+    profile = thread_profile(aln, model)
+    if (detected := _thread_cache.get(profile)) is not None:
+        return run(detected)
+
+    result = run(0)
+    if detected := result.get("metrics", {}).get("num_threads"):
+        _thread_cache.put(profile, detected)
+    return result
@@ -1,27 +1,82 @@
 """Python wrappers to tree searching functions in the IQ-TREE library."""
 
+import os
+import re
 from collections.abc import Sequence
 
 import cogent3
 import cogent3.app.typing as c3_types
 import numpy as np
-import yaml
-from _piqtree import iq_build_tree, iq_fit_tree, iq_nj_tree
-from cogent3 import PhyloNode, make_tree
+from _piqtree import iq_build_tree, iq_fit_tree, iq_jc_nj_tree, iq_nj_tree
+from cogent3 import make_tree
 
 from piqtree.exceptions import ParseIqTreeError
+from piqtree.iqtree._alignment import AlignmentHandle, iqtree_seqs
+from piqtree.iqtree._cache import ResultCache, cached_result
 from piqtree.iqtree._decorator import iqtree_func
-from piqtree.model import DnaModel, Model
-
-iq_build_tree = iqtree_func(iq_build_tree, hide_files=True)
-iq_fit_tree = iqtree_func(iq_fit_tree, hide_files=True)
+from piqtree.iqtree._distance import distance_states, distances
+from piqtree.iqtree._thread_cache import with_auto_threads
+from piqtree.model import DiscreteGammaModel, DnaModel, FreeRateModel, Model
+
+iq_build_tree = iqtree_func(
+    iq_build_tree,
+    hide_files=True,
+    record_metrics=True,
+    allocate_threads=True,
+)
+iq_fit_tree = iqtree_func(
+    iq_fit_tree,
+    hide_files=True,
+    record_metrics=True,
+    allocate_threads=True,
+)
 iq_nj_tree = iqtree_func(iq_nj_tree, hide_files=True)
+iq_jc_nj_tree = iqtree_func(iq_jc_nj_tree, hide_files=True, allocate_threads=True)
+
 
+# the number of distances checked at a time, bounding the memory used
+# for a memory-mapped matrix
+_CHECK_BLOCK_SIZE = 1 << 20
 
 # the order defined in IQ-TREE
 RATE_PARS = "A/C", "A/G", "A/T", "C/G", "C/T", "G/T"
 MOTIF_PARS = "A", "C", "G", "T"
 
+# the rate class of each pair of RATE_PARS in the non-Lie DNA models,
+# as defined in IQ-TREE
+RATE_CLASSES = {
+    "JC": "000000",
+    "JC69": "000000",
+    "F81": "000000",
+    "K80": "010010",
+    "K2P": "010010",
+    "HKY": "010010",
+    "HKY85": "010010",
+    "TN": "010020",
+    "TN93": "010020",
+    "TNe": "010020",
+    "K81": "012210",
+    "K3P": "012210",
+    "K81u": "012210",
+    "TPM2": "010212",
+    "TPM2u": "010212",
+    "TPM3": "012012",
+    "TPM3u": "012012",
+    "TIM": "012230",
+    "TIMe": "012230",
+    "TIM2": "010232",
+    "TIM2e": "010232",
+    "TIM3": "012032",
+    "TIM3e": "012032",
+    "TVM": "412310",
+    "TVMe": "412310",
+    "SYM": "012345",
+    "GTR": "012345",
+}
+
+# structural characters, branch lengths and node names of a newick string
+NEWICK_TOKENS = re.compile(r"[(),;]|:[^(),;]*|[^(),:;]+")
+
 
 def _rename_iq_tree(tree: cogent3.PhyloNode, names: Sequence[str]) -> None:
     for tip in tree.tips():
@@ -67,6 +122,97 @@ def _edge_pars_for_cogent3(tree: cogent3.PhyloNode, model: Model) -> None:
     )
 
 
+def _fitted_rates(params: dict) -> list[float]:
+    # the relative rates of a non-Lie DnaModel in IQ-TREE's order, from
+    # the parameters as named on each edge by _edge_pars_for_cogent3
+    if "kappa" in params:
+        kappa = params["kappa"]
+        rates = [1.0, kappa, 1.0, 1.0, kappa, 1.0]
+    elif "kappa_r" in params:
+        rates = [1.0, params["kappa_r"], 1.0, 1.0, params["kappa_y"], 1.0]
+    else:
+        rates = [params.get(name, 1.0) for name in RATE_PARS]
+    return [rate / rates[-1] for rate in rates]
+
+
+def _fixed_rate_components(model: Model, rate_pars: dict) -> list[str]:
+    # the rate heterogeneity components of an IQ-TREE model string, with
+    # values fixed to the given fitted rate parameters
+    required = []
+    if model.invariant_sites:
+        required.append("p_invar")
+    if isinstance(model.rate_model, DiscreteGammaModel):
+        required.append("gamma_shape")
+    elif isinstance(model.rate_model, FreeRateModel):
+        required.extend(["prop", "rates"])
+    if missing := [par for par in required if par not in rate_pars]:
+        msg = f"The fitted tree does not have the {', '.join(missing)} parameters of {model}."
+        raise ValueError(msg)
+
+    components = []
+    if model.invariant_sites:
+        components.append(f"I{{{rate_pars['p_invar']}}}")
+
+    if isinstance(model.rate_model, DiscreteGammaModel):
+        categories = model.rate_model.rate_categories or 4
+        components.append(f"G{categories}{{{rate_pars['gamma_shape']}}}")
+
+    elif isinstance(model.rate_model, FreeRateModel):
+        props = str(rate_pars["prop"]).split(",")
+        rates = str(rate_pars["rates"]).split(",")
+        categories = model.rate_model.rate_categories or 4
+        if len(props) != categories:
+            msg = f"The fitted tree has {len(props)} rate categories, but {model} has {categories}."
+            raise ValueError(msg)
+        # IQ-TREE takes the weight and rate of each category in turn
+        weights_and_rates = ",".join(
+            f"{prop.strip()},{rate.strip()}"
+            for prop, rate in zip(props, rates, strict=True)
+        )
+        components.append(f"R{categories}{{{weights_and_rates}}}")
+
+    return components
+
+
+def _fixed_params_model(model: Model, fitted: cogent3.PhyloNode) -> str:
+    # an IQ-TREE model string for the given model, with the substitution,
+    # base frequency and rate heterogeneity parameters fixed to the values
+    # fitted to the given tree
+    if not isinstance(model.submod_type, DnaModel) or model.submod_type.name.startswith(
+        "LIE_",
+    ):
+        msg = f"Fixing parameters is only supported for non-Lie DNA models, got {model.submod_type.name}."
+        raise ValueError(msg)
+
+    edge = next((node for node in fitted.preorder() if not node.is_root()), None)
+    if edge is None or "mprobs" not in edge.params:
+        msg = "The fitted tree does not have parameters for a non-Lie DNA model."
+        raise ValueError(msg)
+
+    # IQ-TREE takes the rate of each class in the order they first appear,
+    # except the class of G/T, whose rate the others are relative to
+    name = model.submod_type.iqtree_str()
+    classes = RATE_CLASSES[name]
+    class_rates: dict[str, str] = {}
+    for rate_class, rate in zip(classes, _fitted_rates(edge.params), strict=True):
+        if rate_class != classes[-1]:
+            class_rates.setdefault(rate_class, str(rate))
+    if class_rates:
+        name += f"{{{','.join(class_rates.values())}}}"
+
+    freqs = ",".join(str(edge.params["mprobs"][motif]) for motif in MOTIF_PARS)
+    components = [name, f"F{{{freqs}}}"]
+
+    if model.rate_type is not None:
+        rate_pars = next(
+            (val for key, val in fitted.params.items() if key.startswith("Rate")),
+            {},
+        )
+        components.extend(_fixed_rate_components(model, rate_pars))
+
+    return "+".join(components)
+
+
 def _parse_nonlie_model(tree: cogent3.PhyloNode, tree_yaml: dict) -> None:
     # parse motif and rate parameters in the tree_yaml for non-Lie DnaModel
     model_fits = tree_yaml.get("ModelDNA", {})
@@ -133,22 +279,20 @@ def _parse_lie_model(
             tree.params[lie_model_name]["model_parameters"] = model_parameters
 
 
-def _tree_equal(node1: PhyloNode, node2: PhyloNode) -> bool:
-    children_group1 = node1.children
-    children_group2 = node2.children
-
-    if len(children_group1) != len(children_group2):
-        return False
-
-    # recursively check if two PhyloNode have the same name and branch length, so for their children.
-    for child1, child2 in zip(children_group1, children_group2, strict=True):
-        if not _tree_equal(child1, child2):
-            return False
-
-    # handle empty/different internal node names
-    if children_group1 == []:
-        return node1.name == node2.name and node1.length == node2.length
-    return node1.length == node2.length
+def _newick_signature(newick: str) -> list[str | float]:
+    # the structure, tip names and branch lengths of a newick string,
+    # ignoring internal node names and how branch lengths are formatted
+    signature: list[str | float] = []
+    previous = ""
+    for token in NEWICK_TOKENS.findall(newick):
+        if token[0] == ":":
+            signature.append(float(token[1:]))
+        elif token in {"(", ")", ",", ";"}:
+            signature.append(token)
+        elif previous != ")" and (name := token.strip()):
+            signature.append(name)
+        previous = token
+    return signature
 
 
 def _process_tree_yaml(
@@ -157,20 +301,27 @@ def _process_tree_yaml(
 ) -> cogent3.PhyloNode:
     newick = tree_yaml["PhyloTree"]["newick"]
 
-    tree = cogent3.make_tree(newick)
+    # find the likelihood of the final tree amongst the candidates without
+    # constructing a tree for each of them
     candidates = tree_yaml["CandidateSet"]
+    signature = _newick_signature(newick)
     likelihood = None
     for candidate in candidates.values():
         candidate_likelihood, candidate_newick = candidate.split(" ")
-        candidate_tree = cogent3.make_tree(candidate_newick)
-        if _tree_equal(candidate_tree, tree):
+        if (
+            candidate_newick == newick
+            or _newick_signature(candidate_newick) == signature
+        ):
             likelihood = float(candidate_likelihood)
             break
     if likelihood is None:
         msg = "IQ-TREE output malformated, likelihood not found."
         raise ParseIqTreeError(msg)
 
+    tree = cogent3.make_tree(newick)
     tree.params["lnL"] = likelihood
+    if "metrics" in tree_yaml:
+        tree.params["metrics"] = tree_yaml["metrics"]
 
     # parse non-Lie DnaModel parameters
     if "ModelDNA" in tree_yaml:
@@ -195,11 +346,14 @@ def _process_tree_yaml(
 
 
 def build_tree(
-    aln: c3_types.AlignedSeqsType,
+    aln: c3_types.AlignedSeqsType | AlignmentHandle,
     model: Model,
     rand_seed: int | None = None,
     bootstrap_replicates: int | None = None,
     num_threads: int | None = None,
+    fixed_params: cogent3.PhyloNode | None = None,
+    *,
+    cache: ResultCache | None = None,
 ) -> cogent3.PhyloNode:
     """Reconstruct a phylogenetic tree.
 
@@ -207,7 +361,7 @@ def build_tree(
 
     Parameters
     ----------
-    aln : c3_types.AlignedSeqsType
+    aln : c3_types.AlignedSeqsType | AlignmentHandle
         The sequence alignment.
     model : Model
         The substitution model with base frequencies and rate heterogeneity.
@@ -219,7 +373,17 @@ def build_tree(
         At least 1000 is required to perform bootstrapping.
     num_threads: int | None, optional
         Number of threads for IQ-TREE 2 to use, by default None (single-threaded).
-        If 0 is specified, IQ-TREE attempts to find the optimal number of threads.
+        If 0 is specified, IQ-TREE attempts to find the optimal number of threads,
+        which is remembered for similar analyses (see configure_thread_cache).
+    fixed_params : cogent3.PhyloNode | None, optional
+        A tree previously fitted with the same model, such as by fit_tree.
+        Its substitution, base frequency and rate heterogeneity parameters
+        are fixed rather than optimised (IQ-TREE cannot take them as
+        starting values). Only supported for non-Lie DNA models. By
+        default None (all parameters are optimised).
+    cache : ResultCache | None, optional
+        A cache to look the result up in and store it in, by default None.
+        Only used when a random seed is given.
 
     Returns
     -------
@@ -237,16 +401,30 @@ def build_tree(
         num_threads = 1
 
     names = aln.names
-    seqs = [str(seq) for seq in aln.iter_seqs(names)]
-
-    yaml_result = yaml.safe_load(
-        iq_build_tree(
-            names,
-            seqs,
-            str(model),
-            rand_seed,
-            bootstrap_replicates,
+    model_str = (
+        str(model) if fixed_params is None else _fixed_params_model(model, fixed_params)
+    )
+
+    yaml_result = cached_result(
+        cache,
+        "build_tree",
+        aln,
+        {
+            "model": model_str,
+            "rand_seed": rand_seed,
+            "bootstrap_replicates": bootstrap_replicates,
+        },
+        lambda: with_auto_threads(
+            aln,
+            model_str,
             num_threads,
+            lambda threads: iq_build_tree(
+                *iqtree_seqs(aln),
+                model_str,
+                rand_seed,
+                bootstrap_replicates,
+                threads,
+            ),
         ),
     )
     tree = _process_tree_yaml(yaml_result, names)
@@ -259,11 +437,14 @@ def build_tree(
 
 
 def fit_tree(
-    aln: c3_types.AlignedSeqsType,
+    aln: c3_types.AlignedSeqsType | AlignmentHandle,
     tree: cogent3.PhyloNode,
     model: Model,
     rand_seed: int | None = None,
     num_threads: int | None = None,
+    fixed_params: cogent3.PhyloNode | None = None,
+    *,
+    cache: ResultCache | None = None,
 ) -> cogent3.PhyloNode:
     """Fit branch lengths to a tree.
 
@@ -272,7 +453,7 @@ def fit_tree(
 
     Parameters
     ----------
-    aln : c3_types.AlignedSeqsType
+    aln : c3_types.AlignedSeqsType | AlignmentHandle
         The sequence alignment.
     tree : cogent3.PhyloNode
         The topology to fit branch lengths to.
@@ -282,7 +463,17 @@ def fit_tree(
         The random seed - 0 or None means no seed, by default None.
     num_threads: int | None, optional
         Number of threads for IQ-TREE 2 to use, by default None (single-threaded).
-        If 0 is specified, IQ-TREE attempts to find the optimal number of threads.
+        If 0 is specified, IQ-TREE attempts to find the optimal number of threads,
+        which is remembered for similar analyses (see configure_thread_cache).
+    fixed_params : cogent3.PhyloNode | None, optional
+        A tree previously fitted with the same model, such as by fit_tree.
+        Its substitution, base frequency and rate heterogeneity parameters
+        are fixed rather than optimised (IQ-TREE cannot take them as
+        starting values). Only supported for non-Lie DNA models. By
+        default None (all parameters are optimised).
+    cache : ResultCache | None, optional
+        A cache to look the result up in and store it in, by default None.
+        Only used when a random seed is given.
 
     Returns
     -------
@@ -297,11 +488,28 @@ def fit_tree(
         num_threads = 1
 
     names = aln.names
-    seqs = [str(seq) for seq in aln.iter_seqs(names)]
     newick = str(tree)
+    model_str = (
+        str(model) if fixed_params is None else _fixed_params_model(model, fixed_params)
+    )
 
-    yaml_result = yaml.safe_load(
-        iq_fit_tree(names, seqs, str(model), newick, rand_seed, num_threads),
+    yaml_result = cached_result(
+        cache,
+        "fit_tree",
+        aln,
+        {"model": model_str, "tree": newick, "rand_seed": rand_seed},
+        lambda: with_auto_threads(
+            aln,
+            model_str,
+            num_threads,
+            lambda threads: iq_fit_tree(
+                *iqtree_seqs(aln),
+                model_str,
+                newick,
+                rand_seed,
+                threads,
+            ),
+        ),
     )
     tree = _process_tree_yaml(yaml_result, names)
 
@@ -312,26 +520,148 @@ def fit_tree(
     return tree
 
 
-def nj_tree(pairwise_distances: c3_types.PairwiseDistanceType) -> cogent3.PhyloNode:
+def _distance_pair(index: int, num_seqs: int, *, condensed: bool) -> tuple[int, int]:
+    # the row and column of an index into a flattened distance matrix
+    if not condensed:
+        return divmod(index, num_seqs)
+
+    row = 0
+    while index >= num_seqs - 1 - row:
+        index -= num_seqs - 1 - row
+        row += 1
+    return row, row + 1 + index
+
+
+def _check_distances(matrix: np.ndarray, names: Sequence[str]) -> None:
+    # neighbour joining needs finite, non-negative distances. Any other
+    # shape of matrix is left to IQ-TREE to report
+    num_seqs = len(names)
+    condensed = matrix.ndim == 1
+    shape = (num_seqs * (num_seqs - 1) // 2,) if condensed else (num_seqs, num_seqs)
+    if matrix.shape != shape:
+        return
+
+    flat = matrix.reshape(-1)
+    for start in range(0, flat.size, _CHECK_BLOCK_SIZE):
+        block = flat[start : start + _CHECK_BLOCK_SIZE]
+        invalid = np.flatnonzero(~(np.isfinite(block) & (block >= 0)))
+        if invalid.size:
+            index = start + int(invalid[0])
+            row, col = _distance_pair(index, num_seqs, condensed=condensed)
+            msg = (
+                f"The distance between {names[row]!r} and {names[col]!r} is "
+                f"{flat[index]}, but distances must be finite and non-negative."
+            )
+            raise ValueError(msg)
+
+
+def nj_tree(
+    pairwise_distances: c3_types.PairwiseDistanceType | np.ndarray | str | os.PathLike,
+    names: Sequence[str] | None = None,
+) -> cogent3.PhyloNode:
     """Construct a neighbour joining tree from a pairwise distance matrix.
 
+    The distances may be a numpy array of float32 or float64, either a
+    square matrix or condensed to its upper triangle (as returned by
+    scipy.spatial.distance.pdist), with the names of the sequences given
+    separately. A path to a .npy file is memory-mapped. Arrays are not
+    converted in Python, but IQ-TREE's neighbour joining needs its own
+    square float64 matrix, which is filled from the array in one pass,
+    so 8 bytes are needed per pair of sequences whatever the array.
+
     Parameters
     ----------
-    pairwise_distances : c3_types.PairwiseDistanceType
+    pairwise_distances : c3_types.PairwiseDistanceType | np.ndarray | str | os.PathLike
         Pairwise distances to construct neighbour joining tree from.
+    names : Sequence[str] | None, optional
+        The names of the sequences, in the order of the rows of the
+        distances, by default None. Required unless the distances are
+        a cogent3 distance matrix.
 
     Returns
     -------
     cogent3.PhyloNode
         The neigbour joining tree.
 
+    Raises
+    ------
+    ValueError
+        If names are not given for an array of distances, or a distance
+        is not finite or is negative.
+
     See Also
     --------
     jc_distances : construction of pairwise JC distance matrix from alignment.
+    nj_tree_from_alignment : construction of a neighbour joining tree directly
+        from an alignment.
 
     """
-    newick_tree = iq_nj_tree(
-        pairwise_distances.keys(),
-        np.array(pairwise_distances).flatten(),
-    )
-    return make_tree(newick_tree)
+    if isinstance(pairwise_distances, str | os.PathLike):
+        pairwise_distances = np.load(pairwise_distances, mmap_mode="r")
+
+    if isinstance(pairwise_distances, np.ndarray):
+        if names is None:
+            msg = "The names of the sequences are required for an array of distances."
+            raise ValueError(msg)
+        matrix = pairwise_distances
+    else:
+        if names is None:
+            names = pairwise_distances.keys()
+        matrix = pairwise_distances.array
+
+    if matrix.dtype not in (np.float32, np.float64):
+        matrix = matrix.astype(np.float64)
+
+    names = list(names)
+    _check_distances(matrix, names)
+    return make_tree(iq_nj_tree(names, matrix))
+
+
+def nj_tree_from_alignment(
+    aln: c3_types.AlignedSeqsType | AlignmentHandle,
+    distance: str = "jc",
+    num_threads: int | None = None,
+) -> cogent3.PhyloNode:
+    """Construct a neighbour joining tree from the pairwise distances of an alignment.
+
+    The distances are computed and the tree is constructed in the IQ-TREE
+    library. For Jukes-Cantor distances the distance matrix is never
+    copied into Python, unlike calling jc_distances then nj_tree.
+
+    Parameters
+    ----------
+    aln : c3_types.AlignedSeqsType | AlignmentHandle
+        The sequence alignment.
+    distance : str, optional
+        The pairwise distance measure, by default "jc". Any model of
+        distances is supported (see distances).
+    num_threads: int | None, optional
+        Number of threads for IQ-TREE 2 to use when computing distances,
+        by default None (all available threads).
+
+    Returns
+    -------
+    cogent3.PhyloNode
+        The neigbour joining tree.
+
+    Raises
+    ------
+    ValueError
+        If the distance measure is not supported, or does not suit the
+        molecular type of the alignment, or a distance is not finite, such
+        as when a pair of sequences is saturated or has no sites to compare.
+
+    See Also
+    --------
+    nj_tree : construction of a neighbour joining tree from a distance matrix.
+
+    """
+    distance = distance.lower()
+    distance_states(aln, distance)
+    if distance != "jc":
+        return nj_tree(distances(aln, distance, num_threads))
+
+    if num_threads is None:
+        num_threads = 0
+
+    return make_tree(iq_jc_nj_tree(*iqtree_seqs(aln), num_threads))
@@ -0,0 +1,262 @@
+"""Supervised worker processes for running IQ-TREE functions."""
+
+import contextlib
+import logging
+import os
+import pathlib
+import resource
+import shutil
+import tempfile
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import CancelledError
+from multiprocessing.context import SpawnContext
+from typing import Any
+
+from piqtree.exceptions import IqTreeTimeoutError, IqTreeWorkerError
+from piqtree.iqtree._cpu_budget import cpu_budget_settings, share_cpu_budget
+from piqtree.iqtree._decorator import logger
+from piqtree.iqtree._scratch import configure_scratch, scratch_settings
+from piqtree.iqtree._thread_cache import configure_thread_cache, thread_cache_path
+
+# how long a worker process is given to exit after its connection closes
+_EXIT_TIMEOUT = 5
+
+# how often a running call checks whether it has been cancelled
+_POLL_INTERVAL = 0.05
+
+
+def _init_worker(
+    scratch_dir: str,
+    *,
+    reuse_scratch: bool,
+    thread_cache: pathlib.Path | None,
+    cpu_budget: tuple[list[int], pathlib.Path | None, bool],
+) -> None:
+    # IQ-TREE calls change the working directory and redirect the standard
+    # streams of the whole process, so each worker is given its own scratch
+    # directory. Temporary files and the scratch directories of calls are
+    # kept in it too, so that the supervisor can remove them even if the
+    # worker is killed.
+    os.chdir(scratch_dir)
+    tempfile.tempdir = scratch_dir
+    configure_scratch(scratch_dir, reuse=reuse_scratch)
+    configure_thread_cache(thread_cache)
+    share_cpu_budget(cpu_budget)
+
+
+def _resident_memory() -> int:
+    # the current resident memory in bytes where /proc is available,
+    # otherwise the peak (which macOS reports in bytes)
+    try:
+        with open("/proc/self/statm") as statm:  # noqa: PTH123
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class _PipeHandler(logging.Handler):
+    """Sends log records to the supervisor, which logs them in turn."""
+
+    def __init__(self, conn: Any) -> None:  # noqa: ANN401
+        super().__init__()
+        self._conn = conn
+
+    def emit(self, record: logging.LogRecord) -> None:
+        state = record.__dict__.copy()
+        state.update(msg=record.getMessage(), args=None, exc_info=None)
+        self._conn.send(("log", state))
+
+
+def _worker_main(
+    conn: Any,  # noqa: ANN401
+    scratch_dir: str,
+    *,
+    reuse_scratch: bool,
+    thread_cache: pathlib.Path | None,
+    cpu_budget: tuple[list[int], pathlib.Path | None, bool],
+) -> None:
+    _init_worker(
+        scratch_dir,
+        reuse_scratch=reuse_scratch,
+        thread_cache=thread_cache,
+        cpu_budget=cpu_budget,
+    )
+    logger.addHandler(_PipeHandler(conn))
+    logger.propagate = False
+
+    while (call := conn.recv()) is not None:
+        func, args, kwargs, log_level = call
+        # log only what the supervisor's logger would
+        logger.setLevel(log_level)
+        try:
+            reply = (True, func(*args, **kwargs))
+        except BaseException as e:  # noqa: BLE001
+            reply = (False, e)
+
+        try:
+            conn.send(("result", *reply, _resident_memory()))
+        except Exception as e:  # noqa: BLE001
+            # the result could not be pickled
+            msg = f"The result of {func.__name__} could not be returned: {e}"
+            conn.send(("result", False, RuntimeError(msg), _resident_memory()))
+
+
+class Worker:
+    """A supervised process running one function call at a time.
+
+    The process is started on the first call. If it dies during a call,
+    for example from a segmentation fault in IQ-TREE, the call raises an
+    IqTreeWorkerError and a new process is started for the next call.
+    Records logged by the "piqtree.iqtree" logger in the process are
+    logged in the supervisor.
+    """
+
+    def __init__(
+        self,
+        context: SpawnContext,
+        max_calls: int | None = None,
+        max_memory: int | None = None,
+    ) -> None:
+        self._context = context
+        self._max_calls = max_calls
+        self._max_memory = max_memory
+        self._process: Any = None
+        self._conn: Any = None
+        self._scratch_dir = ""
+        self._calls = 0
+
+    def _start(self) -> None:
+        self._conn, child_conn = self._context.Pipe()
+        directory, reuse = scratch_settings()
+        self._scratch_dir = tempfile.mkdtemp(prefix="piqtree_worker_", dir=directory)
+        self._process = self._context.Process(
+            target=_worker_main,
+            args=(child_conn, self._scratch_dir),
+            kwargs={
+                "reuse_scratch": reuse,
+                "thread_cache": thread_cache_path(),
+                "cpu_budget": cpu_budget_settings(),
+            },
+            daemon=True,
+        )
+        self._process.start()
+        child_conn.close()
+        self._calls = 0
+
+    def _reap(self) -> int:
+        # wait for a process which has closed its connection to exit,
+        # then remove its scratch directory
+        self._process.join(_EXIT_TIMEOUT)
+        if self._process.exitcode is None:
+            self._process.kill()
+            self._process.join()
+        exitcode = self._process.exitcode
+        self._conn.close()
+        shutil.rmtree(self._scratch_dir, ignore_errors=True)
+        self._process = None
+        self._conn = None
+        return exitcode
+
+    def _wait(
+        self,
+        deadline: float | None,
+        cancelled: threading.Event | None,
+    ) -> bool:
+        # whether the call finished (or the process exited) before
+        # the deadline passed or the call was cancelled
+        while not self._conn.poll(_POLL_INTERVAL):
+            if (cancelled is not None and cancelled.is_set()) or (
+                deadline is not None and time.monotonic() > deadline
+            ):
+                return False
+        return True
+
+    def call(
+        self,
+        func: Callable[..., Any],
+        args: tuple[Any, ...],
+        kwargs: dict[str, Any],
+        timeout: float | None = None,
+        cancelled: threading.Event | None = None,
+    ) -> Any:  # noqa: ANN401
+        """Call a function in the worker process.
+
+        Parameters
+        ----------
+        func : Callable[..., Any]
+            The function, which must be picklable.
+        args : tuple[Any, ...]
+            The positional arguments.
+        kwargs : dict[str, Any]
+            The keyword arguments.
+        timeout : float | None, optional
+            The number of seconds after which the process is killed,
+            by default None (no limit).
+        cancelled : threading.Event | None, optional
+            An event which, once set, kills the process, by default None.
+
+        Returns
+        -------
+        Any
+            The result of the function.
+
+        Raises
+        ------
+        IqTreeWorkerError
+            If the process exited during the call.
+        IqTreeTimeoutError
+            If the call did not finish within the timeout.
+        CancelledError
+            If the call was cancelled.
+
+        """
+        if self._process is None:
+            self._start()
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            self._conn.send((func, args, kwargs, logger.getEffectiveLevel()))
+            while finished := self._wait(deadline, cancelled):
+                kind, *message = self._conn.recv()
+                if kind == "result":
+                    ok, value, memory = message
+                    break
+                # a record logged by the worker process
+                record = logging.makeLogRecord(message[0])
+                logging.getLogger(record.name).handle(record)
+        except (EOFError, OSError):
+            raise IqTreeWorkerError(self._reap()) from None
+
+        if not finished:
+            self._kill()
+            if cancelled is not None and cancelled.is_set():
+                raise CancelledError
+            msg = f"IQ-TREE did not finish within {timeout} seconds."
+            raise IqTreeTimeoutError(msg)
+
+        self._calls += 1
+        if (self._max_calls is not None and self._calls >= self._max_calls) or (
+            self._max_memory is not None and memory > self._max_memory
+        ):
+            # replace the process to release memory leaked by IQ-TREE
+            self.stop()
+
+        if not ok:
+            raise value
+        return value
+
+    def _kill(self) -> None:
+        # IQ-TREE cannot be interrupted, so the process is replaced
+        self._process.kill()
+        self._reap()
+
+    def stop(self) -> None:
+        """Stop the process after its current call."""
+        if self._process is None:
+            return
+
+        with contextlib.suppress(OSError):
+            self._conn.send(None)
+        self._reap()
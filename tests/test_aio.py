@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+import pytest
+from cogent3 import ArrayAlignment, make_tree
+
+import piqtree
+from piqtree import aio
+from piqtree.model import DnaModel, Model
+
+
+@pytest.fixture(scope="module")
+def executor() -> piqtree.Executor:
+    with piqtree.Executor(max_workers=2) as executor:
+        yield executor
+
+
+def test_build_tree_async(
+    executor: piqtree.Executor,
+    four_otu: ArrayAlignment,
+) -> None:
+    model = Model(DnaModel.JC)
+
+    async def build() -> list:
+        return await asyncio.gather(
+            *(
+                aio.build_tree_async(four_otu, model, rand_seed=seed, executor=executor)
+                for seed in (1, 2, 1)
+            ),
+        )
+
+    first, _, third = asyncio.run(build())
+
+    expected = piqtree.build_tree(four_otu, model, rand_seed=1)
+    assert first.params["lnL"] == pytest.approx(expected.params["lnL"])
+    assert third.params["lnL"] == pytest.approx(first.params["lnL"])
+
+
+def test_fit_tree_async(
+    executor: piqtree.Executor,
+    three_otu: ArrayAlignment,
+) -> None:
+    tree = make_tree(tip_names=three_otu.names)
+    got = asyncio.run(
+        aio.fit_tree_async(three_otu, tree, Model(DnaModel.JC), executor=executor),
+    )
+    assert "lnL" in got.params
+
+
+def test_model_finder_async(
+    executor: piqtree.Executor,
+    five_otu: ArrayAlignment,
+) -> None:
+    got = asyncio.run(
+        aio.model_finder_async(
+            five_otu,
+            model_set={"JC", "HKY"},
+            rand_seed=1,
+            executor=executor,
+        ),
+    )
+    assert str(got.best_aic).startswith(("JC", "HKY"))
+
+
+def test_jc_distances_async(four_otu: ArrayAlignment) -> None:
+    # the shared executor
+    got = asyncio.run(aio.jc_distances_async(four_otu))
+
+    expected = piqtree.jc_distances(four_otu)
+    assert got.to_dict() == pytest.approx(expected.to_dict())
+
+
+def test_async_cancel(four_otu: ArrayAlignment) -> None:
+    async def cancel() -> None:
+        with piqtree.Executor(max_workers=1) as executor:
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(
+                    aio._result(executor.submit(time.sleep, 60)),
+                    timeout=1,
+                )
+            # the worker running the cancelled call was replaced
+            await aio.jc_distances_async(four_otu, executor=executor)
+
+    start = time.monotonic()
+    asyncio.run(cancel())
+    assert time.monotonic() - start < 30
@@ -1,3 +1,4 @@
+import numpy as np
 import pytest
 from cogent3 import ArrayAlignment, get_app, make_tree
 
@@ -91,6 +92,27 @@ def test_piqtree_nj(five_otu: ArrayAlignment) -> None:
     assert expected.same_topology(actual)
 
 
+def test_piqtree_aln_nj(five_otu: ArrayAlignment) -> None:
+    expected = make_tree("(((Human, Chimpanzee), Rhesus), Manatee, Dugong);")
+
+    app = get_app("piqtree_aln_nj")
+
+    actual = app(five_otu)
+
+    assert expected.same_topology(actual)
+
+
+def test_piqtree_dists(five_otu: ArrayAlignment) -> None:
+    app = get_app("piqtree_dists", model="tn93")
+
+    dists = app(five_otu)
+
+    np.testing.assert_array_equal(
+        dists.array,
+        piqtree.distances(five_otu, model="tn93").array,
+    )
+
+
 def test_mfinder(five_otu: ArrayAlignment) -> None:
     from piqtree.iqtree import ModelFinderResult
 
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+from cogent3 import ArrayAlignment, make_aligned_seqs
+
+import piqtree
+from piqtree.exceptions import IqTreeError
+from piqtree.iqtree._alignment import iqtree_seqs, num_patterns
+from piqtree.iqtree._jc_distance import iq_jc_distances
+from piqtree.iqtree._thread_cache import thread_profile
+from piqtree.model import DnaModel, Model
+
+
+def _as_strings(aln: ArrayAlignment) -> ArrayAlignment:
+    return make_aligned_seqs(
+        aln.to_dict(),
+        moltype=aln.moltype,
+        array_align=False,
+    )
+
+
+def test_iqtree_seqs_encoded(four_otu: ArrayAlignment) -> None:
+    names, encoded, alphabet = iqtree_seqs(four_otu)
+
+    assert names == list(four_otu.names)
+    assert encoded is four_otu.array_seqs
+    decoded = ["".join(chr(alphabet[i]) for i in row) for row in encoded]
+    assert decoded == [str(seq) for seq in four_otu.iter_seqs(names)]
+
+
+def test_iqtree_seqs_strings(four_otu: ArrayAlignment) -> None:
+    names, seqs = iqtree_seqs(_as_strings(four_otu))
+
+    assert names == list(four_otu.names)
+    assert seqs == [str(seq) for seq in four_otu.iter_seqs(names)]
+
+
+def test_encoded_jc_distances(five_otu: ArrayAlignment) -> None:
+    expected = piqtree.jc_distances(_as_strings(five_otu))
+    got = piqtree.jc_distances(five_otu)
+
+    np.testing.assert_allclose(got.array, expected.array)
+
+
+def test_encoded_build_tree(four_otu: ArrayAlignment) -> None:
+    model = Model(DnaModel.HKY)
+    expected = piqtree.build_tree(_as_strings(four_otu), model, rand_seed=1)
+    got = piqtree.build_tree(four_otu, model, rand_seed=1)
+
+    assert got.params["lnL"] == pytest.approx(expected.params["lnL"])
+    assert got.same_topology(expected)
+
+
+def test_encoded_out_of_alphabet(four_otu: ArrayAlignment) -> None:
+    names, encoded, alphabet = iqtree_seqs(four_otu)
+    encoded = encoded.copy()
+    encoded[0, 0] = len(alphabet)
+
+    with pytest.raises(IqTreeError, match="outside of the alphabet"):
+        iq_jc_distances(names, encoded, alphabet, 1)
+
+
+def test_num_patterns() -> None:
+    aln = make_aligned_seqs(
+        {"a": "AACGA", "b": "AACTA", "c": "AAGGA"},
+        moltype="dna",
+        array_align=True,
+    )
+
+    assert num_patterns(aln) == 3
+    assert num_patterns(_as_strings(aln)) == 3
+    assert num_patterns(piqtree.AlignmentHandle(aln)) == 3
+
+
+def test_num_patterns_handle(monkeypatch: pytest.MonkeyPatch) -> None:
+    aln = make_aligned_seqs(
+        {"a": "AACGA", "b": "AACTA", "c": "AAGGA"},
+        moltype="dna",
+        array_align=True,
+    )
+    expected = thread_profile(aln, "HKY")
+    handle = piqtree.AlignmentHandle(aln)
+    assert handle.num_patterns == 3
+
+    # counted once, then kept on the handle
+    monkeypatch.setattr(np, "unique", None)
+    assert num_patterns(handle) == 3
+    assert thread_profile(handle, "HKY") == expected
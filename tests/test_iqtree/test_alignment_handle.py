@@ -0,0 +1,100 @@
+import pickle
+
+import numpy as np
+import pytest
+from cogent3 import ArrayAlignment, make_aligned_seqs, make_tree
+
+import piqtree
+from piqtree.model import DnaModel, Model
+
+
+@pytest.fixture
+def handle(four_otu: ArrayAlignment) -> piqtree.AlignmentHandle:
+    return piqtree.AlignmentHandle(four_otu)
+
+
+def test_handle_attributes(
+    four_otu: ArrayAlignment,
+    handle: piqtree.AlignmentHandle,
+) -> None:
+    assert handle.names == tuple(four_otu.names)
+    assert handle.num_seqs == four_otu.num_seqs
+    assert handle.seq_len == len(four_otu)
+    assert handle.info.source == four_otu.info.source
+    assert "num_seqs=4" in repr(handle)
+
+
+def test_handle_from_strings(four_otu: ArrayAlignment) -> None:
+    aln = make_aligned_seqs(four_otu.to_dict(), moltype="dna", array_align=False)
+    handle = piqtree.AlignmentHandle(aln)
+
+    assert handle.seq_len == len(four_otu)
+
+
+def test_handle_build_tree(
+    four_otu: ArrayAlignment,
+    handle: piqtree.AlignmentHandle,
+) -> None:
+    model = Model(DnaModel.HKY)
+    expected = piqtree.build_tree(four_otu, model, rand_seed=1)
+
+    for _ in range(2):
+        got = piqtree.build_tree(handle, model, rand_seed=1)
+        assert got.params["lnL"] == pytest.approx(expected.params["lnL"])
+        assert got.same_topology(expected)
+
+
+def test_handle_fit_tree(
+    four_otu: ArrayAlignment,
+    handle: piqtree.AlignmentHandle,
+) -> None:
+    tree = make_tree("(Human,Chimpanzee,(Rhesus,Mouse));")
+    model = Model(DnaModel.JC)
+    expected = piqtree.fit_tree(four_otu, tree, model, rand_seed=1)
+    got = piqtree.fit_tree(handle, tree, model, rand_seed=1)
+
+    assert got.params["lnL"] == pytest.approx(expected.params["lnL"])
+
+
+def test_handle_model_finder(
+    four_otu: ArrayAlignment,
+    handle: piqtree.AlignmentHandle,
+) -> None:
+    expected = piqtree.model_finder(four_otu, model_set={"JC", "HKY"}, rand_seed=1)
+    got = piqtree.model_finder(handle, model_set={"JC", "HKY"}, rand_seed=1)
+
+    assert str(got.best_bic) == str(expected.best_bic)
+    assert got.source == expected.source
+
+
+def test_handle_jc_distances(
+    five_otu: ArrayAlignment,
+) -> None:
+    expected = piqtree.jc_distances(five_otu)
+    got = piqtree.jc_distances(piqtree.AlignmentHandle(five_otu))
+
+    assert got.names == expected.names
+    np.testing.assert_allclose(got.array, expected.array)
+
+
+def test_handle_pickle(handle: piqtree.AlignmentHandle) -> None:
+    got = pickle.loads(pickle.dumps(handle))  # noqa: S301
+
+    assert got.names == handle.names
+    assert got.seq_len == handle.seq_len
+    np.testing.assert_allclose(
+        piqtree.jc_distances(got).array,
+        piqtree.jc_distances(handle).array,
+    )
+
+
+def test_handle_executor(
+    four_otu: ArrayAlignment,
+    handle: piqtree.AlignmentHandle,
+) -> None:
+    model = Model(DnaModel.JC)
+    expected = piqtree.build_tree(four_otu, model, rand_seed=1)
+    with piqtree.Executor(max_workers=1) as executor:
+        got = executor.submit_build_tree(handle, model, rand_seed=1).result()
+
+    assert got.params["lnL"] == pytest.approx(expected.params["lnL"])
@@ -97,3 +97,16 @@ def test_build_tree_bootstrapping(four_otu: ArrayAlignment) -> None:
 
     supported_node = max(tree.children, key=lambda x: len(x.children))
     assert "support" in supported_node.params
+
+
+def test_build_tree_fixed_params(four_otu: ArrayAlignment) -> None:
+    model = Model(DnaModel.GTR, "FO", "G")
+    expected = piqtree.build_tree(four_otu, model, rand_seed=1)
+
+    got = piqtree.build_tree(four_otu, model, rand_seed=1, fixed_params=expected)
+
+    # the parameters are fixed, but the tree search converges separately
+    assert got.same_topology(expected)
+    assert got.params["lnL"] == pytest.approx(expected.params["lnL"], rel=1e-5)
+    assert got.params["RateGamma"] == pytest.approx(expected.params["RateGamma"])
+    assert got.params["mprobs"] == pytest.approx(expected.params["mprobs"])
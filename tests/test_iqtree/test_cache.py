@@ -0,0 +1,189 @@
+import pathlib
+import pickle
+from collections.abc import Callable
+
+import pytest
+from cogent3 import ArrayAlignment, make_aligned_seqs, make_tree
+
+import piqtree
+from piqtree.iqtree import _model_finder, _tree
+from piqtree.iqtree._alignment import alignment_digest
+from piqtree.iqtree._cache import result_key
+from piqtree.model import DnaModel, Model
+
+
+@pytest.fixture
+def cache(tmp_path: pathlib.Path) -> piqtree.ResultCache:
+    return piqtree.ResultCache(tmp_path / "cache")
+
+
+@pytest.fixture
+def count_calls(monkeypatch: pytest.MonkeyPatch) -> dict[str, int]:
+    counts: dict[str, int] = {}
+
+    for module, name in [
+        (_tree, "iq_build_tree"),
+        (_tree, "iq_fit_tree"),
+        (_model_finder, "iq_model_finder"),
+    ]:
+        func = getattr(module, name)
+
+        def counted(
+            *args: object,
+            _func: Callable[..., dict] = func,
+            _name: str = name,
+        ) -> dict:
+            counts[_name] = counts.get(_name, 0) + 1
+            return _func(*args)
+
+        monkeypatch.setattr(module, name, counted)
+    return counts
+
+
+def test_cache_get_put(cache: piqtree.ResultCache) -> None:
+    assert cache.get("key") is None
+    assert "key" not in cache
+
+    result = {"a": 1.5, "b": {"c": None, "d": "text"}, "e": True}
+    cache.put("key", result)
+
+    assert "key" in cache
+    assert len(cache) == 1
+    assert cache.size > 0
+    assert cache.get("key") == result
+
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_cache_eviction(tmp_path: pathlib.Path) -> None:
+    cache = piqtree.ResultCache(tmp_path, max_size=None)
+    cache.put("probe", {"value": "x" * 10})
+    entry_size = cache.size
+    cache.clear()
+
+    cache = piqtree.ResultCache(tmp_path, max_size=3 * entry_size)
+    for key in "abc":
+        cache.put(key, {"value": "x" * 10})
+    assert len(cache) == 3
+
+    # "a" is now the most recently used, so "b" is evicted
+    assert cache.get("a") is not None
+    cache.put("d", {"value": "x" * 10})
+
+    assert "b" not in cache
+    assert all(key in cache for key in "acd")
+    assert cache.size <= cache.max_size
+
+
+def test_cache_persists(tmp_path: pathlib.Path) -> None:
+    piqtree.ResultCache(tmp_path).put("key", {"a": 1})
+
+    assert piqtree.ResultCache(tmp_path).get("key") == {"a": 1}
+    assert pickle.loads(pickle.dumps(piqtree.ResultCache(tmp_path))).get("key") == {  # noqa: S301
+        "a": 1,
+    }
+
+
+def test_cache_invalid_size(tmp_path: pathlib.Path) -> None:
+    with pytest.raises(ValueError, match="max_size must not be negative"):
+        _ = piqtree.ResultCache(tmp_path, max_size=-1)
+
+
+def test_alignment_digest(four_otu: ArrayAlignment) -> None:
+    as_strings = make_aligned_seqs(
+        four_otu.to_dict(),
+        moltype="dna",
+        array_align=False,
+    )
+    digest = alignment_digest(four_otu)
+
+    assert alignment_digest(as_strings) == digest
+    assert alignment_digest(piqtree.AlignmentHandle(four_otu)) == digest
+    assert alignment_digest(four_otu.take_seqs(four_otu.names[:3])) != digest
+
+
+def test_result_key(four_otu: ArrayAlignment) -> None:
+    key = result_key("build_tree", four_otu, {"model": "JC", "rand_seed": 1})
+
+    assert key == result_key("build_tree", four_otu, {"rand_seed": 1, "model": "JC"})
+    assert key != result_key("build_tree", four_otu, {"model": "JC", "rand_seed": 2})
+    assert key != result_key("fit_tree", four_otu, {"model": "JC", "rand_seed": 1})
+
+
+def test_build_tree_cached(
+    four_otu: ArrayAlignment,
+    cache: piqtree.ResultCache,
+    count_calls: dict[str, int],
+) -> None:
+    model = Model(DnaModel.HKY)
+    expected = piqtree.build_tree(four_otu, model, rand_seed=1, cache=cache)
+    got = piqtree.build_tree(
+        piqtree.AlignmentHandle(four_otu),
+        model,
+        rand_seed=1,
+        cache=cache,
+    )
+
+    assert count_calls["iq_build_tree"] == 1
+    assert str(got) == str(expected)
+    assert got.children[0].params == expected.children[0].params
+
+    # the metrics are of the run which computed the tree, marked as cached
+    expected_metrics = expected.params.pop("metrics")
+    got_metrics = got.params.pop("metrics")
+    assert got.params == expected.params
+    assert expected_metrics["cached"] is False
+    assert got_metrics == {**expected_metrics, "cached": True}
+
+
+def test_build_tree_unseeded_not_cached(
+    four_otu: ArrayAlignment,
+    cache: piqtree.ResultCache,
+    count_calls: dict[str, int],
+) -> None:
+    for _ in range(2):
+        _ = piqtree.build_tree(four_otu, Model(DnaModel.JC), cache=cache)
+
+    assert count_calls["iq_build_tree"] == 2
+    assert len(cache) == 0
+
+
+def test_fit_tree_cached(
+    three_otu: ArrayAlignment,
+    cache: piqtree.ResultCache,
+    count_calls: dict[str, int],
+) -> None:
+    tree = make_tree(tip_names=three_otu.names)
+    model = Model(DnaModel.GTR)
+
+    expected = piqtree.fit_tree(three_otu, tree, model, rand_seed=1, cache=cache)
+    got = piqtree.fit_tree(three_otu, tree, model, rand_seed=1, cache=cache)
+    _ = piqtree.fit_tree(three_otu, tree, Model(DnaModel.JC), rand_seed=1, cache=cache)
+
+    assert count_calls["iq_fit_tree"] == 2
+    assert got.params["lnL"] == expected.params["lnL"]
+
+
+def test_model_finder_cached(
+    five_otu: ArrayAlignment,
+    cache: piqtree.ResultCache,
+    count_calls: dict[str, int],
+) -> None:
+    expected = piqtree.model_finder(
+        five_otu,
+        model_set={"HKY", "GTR"},
+        rand_seed=1,
+        cache=cache,
+    )
+    got = piqtree.model_finder(
+        five_otu,
+        model_set=["GTR", "HKY"],
+        rand_seed=1,
+        cache=cache,
+    )
+
+    assert count_calls["iq_model_finder"] == 1
+    assert got.metrics["cached"] is True
+    got.metrics["cached"] = False
+    assert got.to_rich_dict() == expected.to_rich_dict()
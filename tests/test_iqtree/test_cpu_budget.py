@@ -0,0 +1,103 @@
+import fcntl
+import os
+import pathlib
+import threading
+import time
+from collections.abc import Iterator
+
+import pytest
+from cogent3 import ArrayAlignment
+
+import piqtree
+from piqtree.iqtree._cpu_budget import (
+    _available_cpus,
+    cpu_allocation,
+    cpu_budget_settings,
+)
+from piqtree.model import DnaModel, Model
+
+
+@pytest.fixture(autouse=True)
+def no_cpu_budget() -> Iterator[None]:
+    yield
+    piqtree.configure_cpu_budget()
+
+
+def test_no_budget() -> None:
+    with cpu_allocation(8) as num_threads:
+        assert num_threads == 8
+
+
+@pytest.mark.parametrize("requested", [0, 1, 64])
+def test_allocation_limited_to_budget(requested: int) -> None:
+    piqtree.configure_cpu_budget(1)
+
+    with cpu_allocation(requested) as num_threads:
+        assert num_threads == 1
+
+
+def test_allocation_waits_for_cpus() -> None:
+    piqtree.configure_cpu_budget(1)
+    allocated = threading.Event()
+
+    def allocate() -> None:
+        with cpu_allocation(1):
+            allocated.set()
+
+    with cpu_allocation(1):
+        thread = threading.Thread(target=allocate)
+        thread.start()
+        assert not allocated.wait(0.5)
+
+    thread.join(10)
+    assert allocated.is_set()
+
+
+def test_machine_wide_budget(tmp_path: pathlib.Path) -> None:
+    piqtree.configure_cpu_budget(1, lock_dir=tmp_path)
+    cpu = _available_cpus()[0]
+
+    # held by another process sharing the lock directory
+    fd = os.open(tmp_path / f"cpu{cpu}.lock", os.O_RDWR | os.O_CREAT)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    threading.Timer(0.5, os.close, (fd,)).start()
+
+    start = time.monotonic()
+    with cpu_allocation(1):
+        assert time.monotonic() - start >= 0.4
+
+
+def test_pin_threads() -> None:
+    original = os.sched_getaffinity(0)
+    piqtree.configure_cpu_budget(1, pin_threads=True)
+
+    with cpu_allocation(1):
+        assert os.sched_getaffinity(0) == {_available_cpus()[0]}
+    assert os.sched_getaffinity(0) == original
+
+
+def test_build_tree_in_budget(four_otu: ArrayAlignment) -> None:
+    piqtree.configure_cpu_budget(1)
+
+    tree = piqtree.build_tree(four_otu, Model(DnaModel.JC), num_threads=4)
+    assert tree.params["metrics"]["num_threads"] == 1
+
+
+def test_budget_shared_with_workers() -> None:
+    piqtree.configure_cpu_budget(1)
+
+    with piqtree.Executor(max_workers=1) as executor:
+        got = executor.submit(cpu_budget_settings).result()
+
+    assert got == cpu_budget_settings()
+
+
+@pytest.mark.parametrize("num_cpus", [0, -1, len(_available_cpus()) + 1])
+def test_invalid_num_cpus(num_cpus: int) -> None:
+    with pytest.raises(ValueError, match="num_cpus must be between"):
+        piqtree.configure_cpu_budget(num_cpus)
+
+
+def test_missing_lock_dir(tmp_path: pathlib.Path) -> None:
+    with pytest.raises(NotADirectoryError, match="does not exist"):
+        piqtree.configure_cpu_budget(lock_dir=tmp_path / "missing")
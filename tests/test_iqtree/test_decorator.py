@@ -0,0 +1,150 @@
+import logging
+import os
+import pathlib
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from cogent3 import ArrayAlignment
+
+import piqtree
+from piqtree.exceptions import IqTreeError
+from piqtree.iqtree._decorator import iqtree_func
+from piqtree.model import DnaModel, Model
+
+
+def test_iqtree_func_hides_output(capfd: pytest.CaptureFixture[str]) -> None:
+    def noisy() -> int:
+        os.write(sys.stdout.fileno(), b"stdout from IQ-TREE\n")
+        os.write(sys.stderr.fileno(), b"stderr from IQ-TREE\n")
+        return 1
+
+    assert iqtree_func(noisy)() == 1
+    out, err = capfd.readouterr()
+    assert out == err == ""
+
+    assert iqtree_func(noisy, hide_output=False)() == 1
+    out, err = capfd.readouterr()
+    assert out == "stdout from IQ-TREE\n"
+    assert err == "stderr from IQ-TREE\n"
+
+
+def test_iqtree_func_hides_files() -> None:
+    original_dir = pathlib.Path.cwd()
+
+    def write_file() -> pathlib.Path:
+        path = pathlib.Path.cwd() / "iqtree.log"
+        path.write_text("log")
+        return path
+
+    path = iqtree_func(write_file, hide_files=True)()
+    assert path.parent != original_dir
+    assert not path.exists()
+    assert pathlib.Path.cwd() == original_dir
+
+
+def test_iqtree_func_error() -> None:
+    def fails() -> None:
+        msg = "bad input"
+        raise RuntimeError(msg)
+
+    with pytest.raises(IqTreeError, match="bad input"):
+        iqtree_func(fails, hide_files=True)()
+
+
+def test_iqtree_func_concurrent_output(capfd: pytest.CaptureFixture[str]) -> None:
+    barrier = threading.Barrier(4)
+
+    def noisy(_: int) -> None:
+        barrier.wait()
+        os.write(sys.stdout.fileno(), b"stdout from IQ-TREE\n")
+        barrier.wait()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(iqtree_func(noisy), range(4)))
+
+    out, err = capfd.readouterr()
+    assert out == err == ""
+    sys.stdout.write("visible\n")
+    out, _ = capfd.readouterr()
+    assert out == "visible\n"
+
+
+def test_iqtree_func_concurrent_files() -> None:
+    original_dir = pathlib.Path.cwd()
+    lock = threading.Lock()
+    running = []
+
+    def write_file(_: int) -> pathlib.Path:
+        with lock:
+            running.append(1)
+            assert len(running) == 1
+        path = pathlib.Path.cwd() / "iqtree.log"
+        assert not path.exists()
+        path.write_text("log")
+        with lock:
+            running.pop()
+        return path.parent
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        dirs = list(executor.map(iqtree_func(write_file, hide_files=True), range(8)))
+
+    # every call has its own scratch directory
+    assert len(set(dirs)) == 8
+    assert original_dir not in dirs
+    assert pathlib.Path.cwd() == original_dir
+
+
+def test_iqtree_func_follows_log(
+    caplog: pytest.LogCaptureFixture,
+    capfd: pytest.CaptureFixture[str],
+) -> None:
+    def write_log() -> None:
+        with pathlib.Path("iqtree.log").open("w") as log_file:
+            log_file.write("Iteration 10 / LogL: -8292.139 / Time: 0h:1m:5s\n")
+            log_file.flush()
+            os.write(sys.stderr.fileno(), b"stderr from IQ-TREE\n")
+            log_file.write("BEST SCORE FOUND : -8292.100\nTotal tree length")
+
+    with caplog.at_level(logging.INFO, logger="piqtree.iqtree"):
+        iqtree_func(write_log, hide_files=True)()
+
+    records = [r for r in caplog.records if r.name == "piqtree.iqtree"]
+    assert [r.getMessage() for r in records] == [
+        "Iteration 10 / LogL: -8292.139 / Time: 0h:1m:5s",
+        "BEST SCORE FOUND : -8292.100",
+        "Total tree length",
+    ]
+    progress = [(r.iteration, r.log_likelihood, r.elapsed) for r in records]
+    assert progress == [(10, -8292.139, 65), (None, -8292.1, None), (None,) * 3]
+
+    # stderr is left for log handlers
+    out, err = capfd.readouterr()
+    assert out == ""
+    assert err == "stderr from IQ-TREE\n"
+
+
+def test_build_tree_logs_progress(
+    caplog: pytest.LogCaptureFixture,
+    five_otu: ArrayAlignment,
+) -> None:
+    with caplog.at_level(logging.INFO, logger="piqtree.iqtree"):
+        tree = piqtree.build_tree(five_otu, Model(DnaModel.JC), rand_seed=1)
+
+    iterations = [r for r in caplog.records if getattr(r, "iteration", None)]
+    assert iterations
+    assert tree.params["lnL"] == pytest.approx(
+        max(r.log_likelihood for r in iterations),
+        abs=1,
+    )
+
+
+def test_build_tree_no_logging(
+    caplog: pytest.LogCaptureFixture,
+    five_otu: ArrayAlignment,
+) -> None:
+    with caplog.at_level(logging.WARNING, logger="piqtree.iqtree"):
+        piqtree.build_tree(five_otu, Model(DnaModel.JC), rand_seed=1)
+
+    assert not [r for r in caplog.records if r.name == "piqtree.iqtree"]
@@ -1,6 +1,17 @@
-from cogent3 import ArrayAlignment
+import pathlib
 
-from piqtree import jc_distances
+import numpy as np
+import pytest
+from cogent3 import ArrayAlignment, make_aligned_seqs
+
+from piqtree import (
+    AlignmentHandle,
+    distances,
+    iter_distances,
+    jc_distances,
+    write_distances,
+)
+from piqtree.iqtree._jc_distance import _dists_to_distmatrix
 
 
 def test_jc_distance(five_otu: ArrayAlignment) -> None:
@@ -26,3 +37,188 @@ def test_jc_distance(five_otu: ArrayAlignment) -> None:
     assert (
         0 < dists["Manatee", "Dugong"] < dists["Manatee", "Rhesus"]
     )  # dugong closer than rhesus
+
+
+def test_jc_distance_matrix(five_otu: ArrayAlignment) -> None:
+    dists = jc_distances(five_otu)
+
+    assert list(dists.names) == list(five_otu.names)
+    assert dists.array.shape == (5, 5)
+    np.testing.assert_array_equal(dists.array, dists.array.T)
+    np.testing.assert_array_equal(np.diag(dists.array), 0)
+
+
+def test_dists_to_distmatrix() -> None:
+    names = ["a", "b", "c"]
+    distances = np.array([[0.0, 0.1, 0.2], [0.1, 0.0, 0.3], [0.2, 0.3, 0.0]])
+
+    dists = _dists_to_distmatrix(distances, names)
+
+    assert dists["a", "c"] == dists["c", "a"] == 0.2
+    assert dists["b", "c"] == 0.3
+    np.testing.assert_array_equal(dists.array, distances)
+
+
+@pytest.mark.parametrize(
+    ("model", "calc"),
+    [("p", "pdist"), ("jc69", "jc69"), ("tn93", "tn93"), ("logdet", "paralinear")],
+)
+def test_distances_match_cogent3(
+    five_otu: ArrayAlignment,
+    model: str,
+    calc: str,
+) -> None:
+    expected = five_otu.distance_matrix(calc=calc, drop_invalid=False)
+
+    dists = distances(five_otu, model=model, num_threads=2)
+
+    assert list(dists.names) == list(five_otu.names)
+    for a in five_otu.names:
+        for b in five_otu.names:
+            if a != b:
+                assert dists[a, b] == pytest.approx(expected[a, b])
+
+
+def test_distances_k2p() -> None:
+    # 10 sites compared, after deleting the gap and the ambiguity
+    aln = make_aligned_seqs(
+        {"a": "AAAACCCCGGGT-", "b": "GAAATCCCGGCTA", "c": "AAAACCCCGGGTN"},
+        moltype="dna",
+    )
+    transitions, transversions = 2 / 12, 1 / 12
+
+    dists = distances(aln, model="K2P")
+
+    expected = -0.5 * np.log(1 - 2 * transitions - transversions) - 0.25 * np.log(
+        1 - 2 * transversions,
+    )
+    assert dists["a", "b"] == pytest.approx(expected)
+    assert dists["a", "c"] == 0
+
+
+def test_distances_protein() -> None:
+    aln = make_aligned_seqs(
+        {"a": "MKV-LLAGHW", "b": "MKVQLIAG-W", "c": "XRVQLLSGHY"},
+        moltype="protein",
+    )
+
+    p = distances(aln, model="p")
+    poisson = distances(aln, model="poisson")
+
+    assert p["a", "b"] == pytest.approx(1 / 8)
+    assert p["b", "c"] == pytest.approx(4 / 8)
+    np.testing.assert_allclose(poisson.array, -np.log(1 - p.array))
+    np.testing.assert_allclose(
+        distances(aln, model="jc69").array,
+        -19 / 20 * np.log(1 - 20 / 19 * p.array),
+    )
+
+
+def test_distances_inputs(five_otu: ArrayAlignment) -> None:
+    expected = distances(five_otu, model="logdet").array
+
+    seqs = make_aligned_seqs(five_otu.to_dict(), moltype="dna", array_align=False)
+    handle = AlignmentHandle(five_otu)
+
+    np.testing.assert_array_equal(distances(seqs, model="logdet").array, expected)
+    np.testing.assert_array_equal(distances(handle, model="logdet").array, expected)
+
+
+def test_distances_jc(five_otu: ArrayAlignment) -> None:
+    np.testing.assert_array_equal(
+        distances(five_otu).array,
+        jc_distances(five_otu).array,
+    )
+
+
+def test_distances_jc69(five_otu: ArrayAlignment) -> None:
+    p = distances(five_otu, model="p").array
+    jc69 = distances(five_otu, model="jc69").array
+
+    np.testing.assert_allclose(jc69, -0.75 * np.log(1 - 4 / 3 * p))
+    # IQ-TREE's estimate is close to the closed form
+    np.testing.assert_allclose(jc69, jc_distances(five_otu).array, atol=1e-3)
+
+
+def test_distances_saturated() -> None:
+    aln = make_aligned_seqs({"a": "AAAA", "b": "CCCC"}, moltype="dna")
+
+    dists = distances(aln, model="k2p")
+
+    assert np.isnan(dists["a", "b"])
+
+
+def test_distances_unsupported(five_otu: ArrayAlignment) -> None:
+    protein = make_aligned_seqs({"a": "MKV", "b": "MKL"}, moltype="protein")
+
+    with pytest.raises(ValueError, match="Unsupported distance model"):
+        distances(five_otu, model="bogus")
+
+    with pytest.raises(ValueError, match="only defined for protein"):
+        distances(five_otu, model="poisson")
+
+    with pytest.raises(ValueError, match="only defined for nucleotide"):
+        distances(protein, model="tn93")
+
+
+@pytest.mark.parametrize("handle", [False, True])
+def test_iter_distances(five_otu: ArrayAlignment, *, handle: bool) -> None:
+    expected = distances(five_otu, model="tn93").array
+
+    aln = AlignmentHandle(five_otu) if handle else five_otu
+    blocks = list(iter_distances(aln, model="tn93", block_size=2, num_threads=2))
+
+    assert [start for start, _ in blocks] == [0, 2, 4]
+    assert [rows.shape for _, rows in blocks] == [(2, 5), (2, 5), (1, 5)]
+    got = np.concatenate([rows for _, rows in blocks])
+    assert got.dtype == np.float32
+    np.testing.assert_allclose(got, expected, rtol=1e-6)
+
+
+def test_write_distances(tmp_path: pathlib.Path, five_otu: ArrayAlignment) -> None:
+    path = tmp_path / "dists.npy"
+    expected = distances(five_otu, model="logdet").array
+
+    matrix = write_distances(five_otu, path, model="logdet", block_size=3)
+
+    assert isinstance(matrix, np.memmap)
+    assert matrix.dtype == np.float32
+    np.testing.assert_allclose(matrix, expected, rtol=1e-6)
+    np.testing.assert_array_equal(np.load(path), matrix)
+
+
+def test_write_distances_jc69(tmp_path: pathlib.Path) -> None:
+    # gaps and saturated pairs, over blocks which do not divide the rows
+    aln = make_aligned_seqs(
+        {
+            "a": "ACGTAC--GTAC",
+            "b": "ACGTTCAAGTAC",
+            "c": "CATGCATGCATG",
+            "d": "ACG-ACGTGTAA",
+            "e": "TTTTTTTTTTTT",
+            "f": "AAGTACGTGTAC",
+            "g": "ACGTACGTGTAC",
+        },
+        moltype="dna",
+    )
+    expected = distances(aln, model="jc69").array
+    assert np.isnan(expected).any()
+
+    matrix = write_distances(aln, tmp_path / "dists.npy", "jc69", block_size=3)
+    np.testing.assert_allclose(matrix, expected, rtol=1e-6)
+    np.testing.assert_array_equal(matrix, matrix.T)
+
+    blocks = iter_distances(aln, "jc69", block_size=3)
+    got = np.concatenate([rows for _, rows in blocks])
+    np.testing.assert_array_equal(got, matrix)
+
+
+def test_blockwise_distances_unsupported(five_otu: ArrayAlignment) -> None:
+    with pytest.raises(ValueError, match="cannot be computed in blocks"):
+        iter_distances(five_otu, model="jc")
+
+    with pytest.raises(ValueError, match="block_size must be positive"):
+        iter_distances(five_otu, block_size=0)
+
+    with pytest.raises(ValueError, match="only defined for protein"):
+        iter_distances(five_otu, model="poisson")
@@ -0,0 +1,283 @@
+import ctypes
+import logging
+import os
+import pathlib
+import signal
+import time
+from concurrent.futures import CancelledError, wait
+
+import pytest
+from cogent3 import ArrayAlignment, load_aligned_seqs, make_tree
+
+import piqtree
+from piqtree.exceptions import IqTreeError, IqTreeTimeoutError, IqTreeWorkerError
+from piqtree.iqtree import _executor
+from piqtree.iqtree._executor import _JobQueue
+from piqtree.model import DnaModel, Model
+
+
+def test_executor_build_tree(four_otu: ArrayAlignment) -> None:
+    expected = make_tree("(Human,Chimpanzee,(Rhesus,Mouse));")
+
+    with piqtree.Executor(max_workers=2) as executor:
+        futures = [
+            executor.submit_build_tree(four_otu, Model(DnaModel.JC), rand_seed=seed)
+            for seed in range(1, 5)
+        ]
+        trees = [future.result() for future in futures]
+
+    for tree in trees:
+        assert expected.same_topology(tree)
+        assert "lnL" in tree.params
+
+
+def test_executor_fit_tree(three_otu: ArrayAlignment) -> None:
+    tree = make_tree(tip_names=three_otu.names)
+    model = Model(DnaModel.JC)
+
+    expected = piqtree.fit_tree(three_otu, tree, model, rand_seed=1)
+    with piqtree.Executor(max_workers=1) as executor:
+        got = executor.submit_fit_tree(three_otu, tree, model, rand_seed=1).result()
+
+    assert got.params["lnL"] == pytest.approx(expected.params["lnL"])
+
+
+def test_executor_model_finder(five_otu: ArrayAlignment) -> None:
+    expected = piqtree.model_finder(five_otu, rand_seed=1)
+    with piqtree.Executor(max_workers=1) as executor:
+        got = executor.submit_model_finder(five_otu, rand_seed=1).result()
+
+    assert str(got.best_aic) == str(expected.best_aic)
+    assert str(got.best_bic) == str(expected.best_bic)
+
+
+def test_executor_jc_distances(four_otu: ArrayAlignment) -> None:
+    with piqtree.Executor(max_workers=1) as executor:
+        got = executor.submit_jc_distances(four_otu).result()
+
+    expected = piqtree.jc_distances(four_otu)
+    assert got.to_dict() == pytest.approx(expected.to_dict())
+
+
+def test_executor_errors(four_otu: ArrayAlignment) -> None:
+    with piqtree.Executor(max_workers=1) as executor:
+        future = executor.submit_build_tree(
+            four_otu,
+            Model(DnaModel.GTR),
+            bootstrap_replicates=10,
+        )
+        with pytest.raises(IqTreeError):
+            future.result()
+
+
+@pytest.mark.parametrize("threads_per_worker", [0, -1])
+def test_executor_invalid_threads(threads_per_worker: int) -> None:
+    with pytest.raises(ValueError, match="threads_per_worker must be positive"):
+        _ = piqtree.Executor(threads_per_worker=threads_per_worker)
+
+
+@pytest.mark.parametrize(
+    ("crash", "args", "expected"),
+    [
+        (ctypes.string_at, (0,), signal.SIGSEGV),
+        (os.abort, (), signal.SIGABRT),
+    ],
+)
+def test_executor_worker_crash(
+    four_otu: ArrayAlignment,
+    crash: object,
+    args: tuple,
+    expected: signal.Signals,
+) -> None:
+    model = Model(DnaModel.JC)
+
+    with piqtree.Executor(max_workers=1) as executor:
+        crashed = executor.submit(crash, *args)
+        after = executor.submit_build_tree(four_otu, model, rand_seed=1)
+
+        with pytest.raises(IqTreeWorkerError, match=expected.name) as excinfo:
+            crashed.result()
+        assert isinstance(excinfo.value, IqTreeError)
+        assert excinfo.value.signal == expected
+
+        # a new worker process runs the next analysis
+        assert "lnL" in after.result().params
+
+
+@pytest.mark.parametrize(
+    "options",
+    [{"max_calls_per_worker": 2}, {"max_worker_memory": 1}],
+)
+def test_executor_recycle_workers(options: dict) -> None:
+    with piqtree.Executor(max_workers=1, **options) as executor:
+        pids = [executor.submit(os.getpid).result() for _ in range(4)]
+
+    if "max_calls_per_worker" in options:
+        assert pids[0] == pids[1] != pids[2] == pids[3]
+    else:
+        assert len(set(pids)) == 4
+
+
+@pytest.mark.parametrize("max_workers", [0, -1])
+def test_executor_invalid_max_workers(max_workers: int) -> None:
+    with pytest.raises(ValueError, match="max_workers must be positive"):
+        _ = piqtree.Executor(max_workers=max_workers)
+
+
+def test_executor_invalid_max_calls() -> None:
+    with pytest.raises(ValueError, match="max_calls_per_worker must be positive"):
+        _ = piqtree.Executor(max_calls_per_worker=0)
+
+
+def test_executor_shutdown() -> None:
+    executor = piqtree.Executor(max_workers=1)
+    executor.shutdown()
+
+    with pytest.raises(RuntimeError, match="after shutdown"):
+        executor.submit(os.getpid)
+
+
+def test_build_trees(four_otu: ArrayAlignment, five_otu: ArrayAlignment) -> None:
+    alignments = [four_otu, five_otu, four_otu.take_positions(range(100))]
+    model = Model(DnaModel.JC)
+
+    got = dict(piqtree.build_trees(alignments, model, rand_seed=1, num_threads=2))
+
+    assert sorted(got) == [0, 1, 2]
+    for i, aln in enumerate(alignments):
+        expected = piqtree.build_tree(aln, model, rand_seed=1)
+        assert expected.same_topology(got[i])
+        assert got[i].params["lnL"] == pytest.approx(expected.params["lnL"])
+
+
+def test_build_trees_empty(monkeypatch: pytest.MonkeyPatch) -> None:
+    # no worker processes are started
+    monkeypatch.setattr(_executor, "Executor", None)
+    assert list(piqtree.build_trees([], Model(DnaModel.JC))) == []
+    assert list(piqtree.build_trees(iter([]), Model(DnaModel.JC))) == []
+
+
+def test_build_trees_errors(four_otu: ArrayAlignment) -> None:
+    trees = piqtree.build_trees(
+        [four_otu],
+        Model(DnaModel.GTR),
+        bootstrap_replicates=10,
+        num_threads=1,
+    )
+    with pytest.raises(IqTreeError):
+        next(trees)
+
+
+def test_build_trees_return_exceptions(four_otu: ArrayAlignment) -> None:
+    alignments = [four_otu, four_otu.take_seqs(["Human", "Mouse"]), four_otu]
+    trees = piqtree.build_trees(
+        alignments,
+        Model(DnaModel.JC),
+        num_threads=1,
+        return_exceptions=True,
+    )
+    got = dict(trees)
+
+    assert sorted(got) == [0, 1, 2]
+    with pytest.raises(IqTreeError, match="at least 3 sequences"):
+        raise got[1]
+    assert "lnL" in got[0].params
+    assert "lnL" in got[2].params
+
+
+def test_build_trees_close(DATA_DIR: pathlib.Path, four_otu: ArrayAlignment) -> None:
+    aln = load_aligned_seqs(DATA_DIR / "example.fasta", moltype="dna")
+    trees = piqtree.build_trees(
+        [four_otu, aln],
+        Model(DnaModel.GTR),
+        rand_seed=1,
+        num_threads=2,
+    )
+
+    # the large alignment is still running
+    assert next(trees)[0] == 0
+    start = time.monotonic()
+    trees.close()
+    assert time.monotonic() - start < 15
+
+
+@pytest.mark.parametrize("num_threads", [0, -1])
+def test_build_trees_invalid_threads(num_threads: int) -> None:
+    with pytest.raises(ValueError, match="num_threads must be positive"):
+        _ = piqtree.build_trees([], Model(DnaModel.JC), num_threads=num_threads)
+
+
+@pytest.mark.parametrize(
+    ("free_threads", "expected"),
+    [(4, [2, 0, 1, 3]), (1, [0, 1, 3]), (0, [])],
+)
+def test_job_queue(free_threads: int, expected: list[int]) -> None:
+    # job 2 is the most costly but needs 3 threads
+    queue = _JobQueue(threads=[1, 1, 3, 1], costs=[30, 20, 40, 10])
+
+    got = []
+    while (job := queue.pop(free_threads)) is not None:
+        got.append(job)
+
+    assert got == expected
+
+
+def test_executor_timeout(DATA_DIR: pathlib.Path, four_otu: ArrayAlignment) -> None:
+    aln = load_aligned_seqs(DATA_DIR / "example.fasta", moltype="dna")
+    model = Model(DnaModel.GTR)
+
+    with piqtree.Executor(max_workers=1) as executor:
+        start = time.monotonic()
+        future = executor.submit_build_tree(aln, model, rand_seed=1, timeout=5)
+
+        with pytest.raises(IqTreeTimeoutError, match="within 5 seconds"):
+            future.result()
+        assert time.monotonic() - start < 30
+
+        after = executor.submit_build_tree(four_otu, Model(DnaModel.JC), rand_seed=1)
+        assert "lnL" in after.result().params
+
+
+def test_executor_cancel_running() -> None:
+    with piqtree.Executor(max_workers=1) as executor:
+        pid = executor.submit(os.getpid).result()
+        running = executor.submit(time.sleep, 60)
+        pending = executor.submit(time.sleep, 60)
+        time.sleep(1)
+
+        assert pending.cancel()
+        assert pending.cancelled()
+        # a future stays pending while its call runs
+        assert not running.running()
+        assert running.cancel()
+        assert running.cancelled()
+        with pytest.raises(CancelledError):
+            running.result(timeout=10)
+        done, _ = wait([running], timeout=10)
+        assert done == {running}
+
+        # the worker process running the call was replaced
+        assert executor.submit(os.getpid).result(timeout=30) != pid
+
+
+def test_executor_cancel_finished() -> None:
+    with piqtree.Executor(max_workers=1) as executor:
+        future = executor.submit(os.getpid)
+        future.result()
+
+        assert not future.cancel()
+
+
+def test_executor_forwards_logs(
+    caplog: pytest.LogCaptureFixture,
+    five_otu: ArrayAlignment,
+) -> None:
+    with (
+        caplog.at_level(logging.INFO, logger="piqtree.iqtree"),
+        piqtree.Executor(max_workers=1) as executor,
+    ):
+        executor.submit_build_tree(five_otu, Model(DnaModel.JC), rand_seed=1).result()
+
+    records = [r for r in caplog.records if r.name == "piqtree.iqtree"]
+    assert any(r.iteration is not None for r in records)
+    assert records[-1].process != os.getpid()
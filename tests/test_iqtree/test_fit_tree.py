@@ -4,11 +4,13 @@ from cogent3.app.result import model_result
 from cogent3.core.tree import PhyloNode
 
 import piqtree
+from piqtree.iqtree._tree import _fixed_params_model
 from piqtree.model import DnaModel, Model
 
 
-def check_likelihood(got: PhyloNode, expected: model_result) -> None:
-    assert got.params["lnL"] == pytest.approx(expected.lnL)
+def check_likelihood(got: PhyloNode, expected: model_result | float) -> None:
+    expected = getattr(expected, "lnL", expected)
+    assert got.params["lnL"] == pytest.approx(expected)
 
 
 def check_motif_probs(got: PhyloNode, expected: PhyloNode) -> None:
@@ -51,6 +53,22 @@ def check_rate_parameters(got: PhyloNode, expected: PhyloNode) -> None:
     )
 
 
+def check_rate_heterogeneity(got: PhyloNode, expected: PhyloNode) -> None:
+    expected = {k: v for k, v in expected.params.items() if k.startswith("Rate")}
+    got = {k: v for k, v in got.params.items() if k.startswith("Rate")}
+
+    # Check that the rate heterogeneity models are the same
+    assert got.keys() == expected.keys()
+
+    # Check that the parameters are the same, some being comma separated strings
+    for key, pars in expected.items():
+        assert got[key].keys() == pars.keys()
+        for par, value in pars.items():
+            got_values = [float(v) for v in str(got[key][par]).split(",")]
+            expected_values = [float(v) for v in str(value).split(",")]
+            assert got_values == pytest.approx(expected_values)
+
+
 def check_branch_lengths(got: PhyloNode, expected: PhyloNode) -> None:
     got = got.get_distances()
     expected = expected.get_distances()
@@ -95,3 +113,86 @@ def test_fit_tree(three_otu: ArrayAlignment, iq_model: DnaModel, c3_model: str)
     check_motif_probs(got2, expected.tree)
     check_rate_parameters(got2, expected.tree)
     check_branch_lengths(got2, expected.tree)
+
+
+@pytest.mark.parametrize(
+    "model",
+    [
+        Model(DnaModel.JC),
+        Model(DnaModel.HKY, "F", "G", invariant_sites=True),
+        Model(DnaModel.TN, rate_model="R2"),
+        Model(DnaModel.K81, "FO", invariant_sites=True),
+        Model(DnaModel.TPM2u),
+        Model(DnaModel.TVM, "FO"),
+        Model(DnaModel.GTR, "FO", "G6"),
+    ],
+)
+def test_fit_tree_fixed_params(five_otu: ArrayAlignment, model: Model) -> None:
+    tree_topology = make_tree("((Human,Chimpanzee),Rhesus,(Manatee,Dugong));")
+    fitted = piqtree.fit_tree(five_otu, tree_topology, model, rand_seed=1)
+
+    got = piqtree.fit_tree(
+        five_otu,
+        tree_topology,
+        model,
+        rand_seed=1,
+        fixed_params=fitted,
+    )
+    check_likelihood(got, fitted.params["lnL"])
+    check_motif_probs(got, fitted)
+    check_rate_parameters(got, fitted)
+    check_rate_heterogeneity(got, fitted)
+
+
+@pytest.mark.parametrize(
+    ("model", "expected"),
+    [(DnaModel.JC, "JC+F{"), (DnaModel.HKY, "HKY{"), (DnaModel.TVM, "TVM{")],
+)
+def test_fixed_params_model_named(
+    three_otu: ArrayAlignment,
+    model: DnaModel,
+    expected: str,
+) -> None:
+    tree_topology = make_tree(tip_names=three_otu.names)
+    fitted = piqtree.fit_tree(three_otu, tree_topology, Model(model))
+
+    # the named model is kept, with the rate of each of its rate classes
+    got = _fixed_params_model(Model(model), fitted)
+    assert got.startswith(expected)
+
+
+def test_fit_tree_fixed_params_mismatch(three_otu: ArrayAlignment) -> None:
+    tree_topology = make_tree(tip_names=three_otu.names)
+    fitted = piqtree.fit_tree(three_otu, tree_topology, Model(DnaModel.HKY))
+
+    with pytest.raises(ValueError, match="gamma_shape"):
+        _ = piqtree.fit_tree(
+            three_otu,
+            tree_topology,
+            Model(DnaModel.HKY, rate_model="G"),
+            fixed_params=fitted,
+        )
+
+
+def test_fit_tree_fixed_params_model_finder(five_otu: ArrayAlignment) -> None:
+    result = piqtree.model_finder(five_otu, rand_seed=1, model_set={"HKY", "GTR"})
+    fitted = piqtree.fit_tree(five_otu, result.best_bic_tree, result.best_bic)
+
+    got = piqtree.fit_tree(
+        five_otu,
+        result.best_bic_tree,
+        result.best_bic,
+        rand_seed=1,
+        fixed_params=fitted,
+    )
+    check_likelihood(got, fitted.params["lnL"])
+    check_motif_probs(got, fitted)
+
+
+def test_fit_tree_fixed_params_lie(three_otu: ArrayAlignment) -> None:
+    tree_topology = make_tree(tip_names=three_otu.names)
+    model = Model(DnaModel.LIE_3_3b)
+    fitted = piqtree.fit_tree(three_otu, tree_topology, model)
+
+    with pytest.raises(ValueError, match="non-Lie DNA models"):
+        _ = piqtree.fit_tree(three_otu, tree_topology, model, fixed_params=fitted)
@@ -0,0 +1,146 @@
+import math
+from typing import Any
+
+import pytest
+import yaml
+from _piqtree import _load_yaml
+
+
+def assert_same(got: Any, expected: Any) -> None:  # noqa: ANN401
+    # NaN is not equal to itself, and 1 == 1.0 == True, so compare types too
+    assert type(got) is type(expected)
+    if isinstance(expected, dict):
+        assert list(got) == list(expected)
+        for key in expected:
+            assert_same(got[key], expected[key])
+    elif isinstance(expected, list):
+        assert len(got) == len(expected)
+        for got_item, expected_item in zip(got, expected, strict=True):
+            assert_same(got_item, expected_item)
+    elif isinstance(expected, float) and math.isnan(expected):
+        assert math.isnan(got)
+    else:
+        assert got == expected
+
+
+def assert_loads_as_safe_load(text: str) -> None:
+    try:
+        expected = yaml.safe_load(text)
+    except yaml.YAMLError:
+        with pytest.raises(yaml.YAMLError):
+            _load_yaml(text)
+    else:
+        assert_same(_load_yaml(text), expected)
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "",
+        "~",
+        "null",
+        "Null",
+        "NULL",
+        "nULL",
+        "yes",
+        "No",
+        "YES",
+        "on",
+        "Off",
+        "true",
+        "False",
+        "y",
+        "n",
+        "0",
+        "-0",
+        "+12",
+        "007",
+        "017",
+        "0o17",
+        "0x1F",
+        "0b101",
+        "1_000",
+        "1e5",
+        "1.0e+5",
+        "1.0e5",
+        "1.5E-3",
+        "-.5",
+        ".5",
+        "1.",
+        "3.815110072",
+        "2.43436209e-06",
+        "-6519.33018689",
+        ".inf",
+        "-.Inf",
+        "+.INF",
+        ".nan",
+        ".NaN",
+        "1:20",
+        "-1:20:30",
+        "1:20.5",
+        "190:20:30",
+        "2001-12-14",
+        "2001-12-14t21:59:43.10-05:00",
+        "2001-12-14 21:59:43.10 -5",
+        "2002-12-14",
+        "2.3.6.lib",
+        "1, 3.815110072, 1, 1",
+        "0.36, 0.18",
+        "-6519.33 (0:0.0058,1:0.0026,(2:0.023,3:0.306):0.0138);",
+        "(0:0.0068,1:0.0026,(2:0.023,3:0.306):0.0138);",
+        "GTR+F+G4",
+        # resolved to tags safe_load cannot construct
+        "=",
+        "<<",
+        "a b",
+        "a#b",
+    ],
+)
+def test_load_yaml_scalar(value: str) -> None:
+    assert_loads_as_safe_load(f"key: {value}\n")
+
+
+@pytest.mark.parametrize("key", ["0", "12", "007", "yes", "1.5", "~", "1:20"])
+def test_load_yaml_key(key: str) -> None:
+    assert_loads_as_safe_load(f"{key}: value\n")
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "\n\n",
+        "a: 1\nb: 2\n",
+        "a: 1\r\nb: 2\r\n",
+        "a: 1\n\nb: 2",
+        "a:\nb: 2\n",
+        "a:\n",
+        "a:\n  b:\n  c: 1\n",
+        "a:\n  b:\n    c:\nd: 1\n",
+        "a:\n  b: 1\n  c:\n    d: 2\ne: 3\n",
+        "  a: 1\n  b: 2\n",
+        "a: 1  \n",
+        "a: {}\nb: []\n",
+        "a:\n  {}\n",
+        "a: 1 # a comment\n",
+        "# a comment\na: 1\n",
+        "a: 1\n# a comment\nb: 2\n",
+        "---\na: 1\n...\n",
+        "a:\n- 1\n- 2\n",
+        "a:\n  - 1\n  - b: 2\n",
+        "- 1\n- 2\n",
+        "a: 'quoted: value'\n",
+        'a: "double # quoted"\n',
+        "a: [1, 2]\n",
+        "a: &anchor 1\nb: *anchor\n",
+        "a: !!str 1\n",
+        "? a\n: 1\n",
+        "a: |\n  text\n",
+        "a: b: c\n",
+        "a: 1\na: 2\n",
+        "a:\n\tb: 1\n",
+        "a:\n    b: 1\n  c: 2\n",
+    ],
+)
+def test_load_yaml_document(text: str) -> None:
+    assert_loads_as_safe_load(text)
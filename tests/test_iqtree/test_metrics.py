@@ -0,0 +1,83 @@
+import pytest
+from cogent3 import ArrayAlignment, make_tree
+
+import piqtree
+from piqtree.iqtree import ModelFinderResult
+from piqtree.iqtree._metrics import call_metrics, phase_times
+from piqtree.model import DnaModel, Model
+
+LOG = """\
+Kernel:  AVX+FMA - 2 threads (8 CPU cores detected)
+Parameters optimization took 10 rounds (0.016 sec)
+Computing ML distances took 0.000454 sec (of wall-clock time) 0.000424 sec (of CPU time)
+Computing RapidNJ tree took 0.000113 sec (of wall-clock time) 0.000102 sec (of CPU time)
+Parameters optimization took 1 rounds (0.004 sec)
+CPU time used for tree search: 0.176 sec (0h:0m:0s)
+Wall-clock time used for tree search: 0.194 sec (0h:0m:0s)
+"""
+
+
+def test_phase_times() -> None:
+    got = phase_times(LOG)
+
+    assert got == {
+        "parameter_optimisation": {"wall_time": pytest.approx(0.02)},
+        "ml_distances": {"wall_time": 0.000454, "cpu_time": 0.000424},
+        "nj_tree": {"wall_time": 0.000113, "cpu_time": 0.000102},
+        "tree_search": {"wall_time": 0.194, "cpu_time": 0.176},
+    }
+
+
+def test_call_metrics() -> None:
+    got = call_metrics(LOG, 1.5, 2.5)
+
+    assert got["wall_time"] == 1.5
+    assert got["cpu_time"] == 2.5
+    assert got["peak_memory"] > 0
+    assert got["kernel"] == "AVX+FMA"
+    assert got["num_threads"] == 2
+    assert got["phases"] == phase_times(LOG)
+    assert got["cached"] is False
+
+
+def test_call_metrics_auto_threads() -> None:
+    log = LOG.replace("2 threads", "auto-detect threads")
+    assert call_metrics(log, 1.5, 2.5)["num_threads"] is None
+
+    log += "BEST NUMBER OF THREADS: 3\n"
+    got = call_metrics(log, 1.5, 2.5)
+    assert got["kernel"] == "AVX+FMA"
+    assert got["num_threads"] == 3
+
+
+def test_call_metrics_no_log() -> None:
+    got = call_metrics(None, 1.5, 2.5)
+
+    assert got["kernel"] is None
+    assert got["num_threads"] is None
+    assert got["phases"] == {}
+
+
+def test_build_tree_metrics(four_otu: ArrayAlignment) -> None:
+    tree = piqtree.build_tree(four_otu, Model(DnaModel.HKY), rand_seed=1)
+
+    metrics = tree.params["metrics"]
+    assert metrics["wall_time"] > 0
+    assert metrics["num_threads"] == 1
+    assert metrics["kernel"]
+    assert {"parameter_optimisation", "tree_search"} <= metrics["phases"].keys()
+
+
+def test_fit_tree_metrics(three_otu: ArrayAlignment) -> None:
+    tree = make_tree(tip_names=three_otu.names)
+    tree = piqtree.fit_tree(three_otu, tree, Model(DnaModel.JC), rand_seed=1)
+
+    assert "parameter_optimisation" in tree.params["metrics"]["phases"]
+
+
+def test_model_finder_metrics(five_otu: ArrayAlignment) -> None:
+    result = piqtree.model_finder(five_otu, model_set={"HKY", "GTR"}, rand_seed=1)
+
+    assert "model_finder" in result.metrics["phases"]
+    got = ModelFinderResult.from_rich_dict(result.to_rich_dict())
+    assert got.metrics == result.metrics
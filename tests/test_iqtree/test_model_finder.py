@@ -1,7 +1,7 @@
 import multiprocessing
 
 import pytest
-from cogent3 import ArrayAlignment
+from cogent3 import ArrayAlignment, make_tree
 
 from piqtree.iqtree import ModelFinderResult, ModelResultValue, model_finder
 
@@ -47,6 +47,37 @@ def test_model_finder_result(model: str) -> None:
     assert result.model_stats[model].tree_length == 0.678
 
 
+def test_model_finder_result_trees() -> None:
+    raw_data = {
+        "GTR+F": "123.45 10 0.678",
+        "best_model_AIC": "GTR+F",
+        "best_model_AICc": "GTR+F",
+        "best_model_BIC": "GTR+F",
+        "best_tree_AIC": "((a,b),(c,d));",
+    }
+
+    result = ModelFinderResult("test", raw_data)
+    assert result.best_aic_tree.same_topology(make_tree("((a,b),(c,d));"))
+    assert result.best_bic_tree is None
+    assert result.initial_tree is None
+
+    got = ModelFinderResult.from_rich_dict(result.to_rich_dict())
+    assert got.best_aic_tree.same_topology(result.best_aic_tree)
+    assert got.best_bic_tree is None
+
+
+def test_model_finder_trees(five_otu: ArrayAlignment) -> None:
+    result = model_finder(five_otu, rand_seed=1, model_set={"HKY", "GTR"})
+
+    for tree in (
+        result.initial_tree,
+        result.best_aic_tree,
+        result.best_aicc_tree,
+        result.best_bic_tree,
+    ):
+        assert set(tree.get_tip_names()) == set(five_otu.names)
+
+
 def test_model_finder(five_otu: ArrayAlignment) -> None:
     result1 = model_finder(five_otu, rand_seed=1)
     result2 = model_finder(
@@ -1,6 +1,19 @@
-from cogent3 import ArrayAlignment, make_tree
+import pathlib
+import re
+from concurrent.futures import ThreadPoolExecutor
 
-from piqtree import jc_distances, nj_tree
+import numpy as np
+import pytest
+from cogent3 import ArrayAlignment, make_aligned_seqs, make_tree
+
+from piqtree import (
+    AlignmentHandle,
+    distances,
+    jc_distances,
+    nj_tree,
+    nj_tree_from_alignment,
+)
+from piqtree.exceptions import IqTreeError
 
 
 def test_nj_tree(five_otu: ArrayAlignment) -> None:
@@ -10,3 +23,127 @@ def test_nj_tree(five_otu: ArrayAlignment) -> None:
     actual = nj_tree(dists)
 
     assert expected.same_topology(actual)
+
+
+def test_nj_tree_threaded(five_otu: ArrayAlignment) -> None:
+    expected = make_tree("(((Human, Chimpanzee), Rhesus), Manatee, Dugong);")
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        dists = list(executor.map(jc_distances, [five_otu] * 8))
+        trees = list(executor.map(nj_tree, dists))
+
+    for tree in trees:
+        assert expected.same_topology(tree)
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32, np.int64])
+@pytest.mark.parametrize("condensed", [False, True])
+def test_nj_tree_array(
+    five_otu: ArrayAlignment,
+    dtype: type,
+    *,
+    condensed: bool,
+) -> None:
+    expected = make_tree("(((Human, Chimpanzee), Rhesus), Manatee, Dugong);")
+
+    dists = jc_distances(five_otu)
+    # scaled so that integer distances keep the topology
+    matrix = (dists.array * 1000).astype(dtype)
+    if condensed:
+        matrix = matrix[np.triu_indices(len(dists.names), k=1)]
+
+    actual = nj_tree(matrix, dists.names)
+
+    assert expected.same_topology(actual)
+
+
+def test_nj_tree_memmap(tmp_path: pathlib.Path, five_otu: ArrayAlignment) -> None:
+    dists = jc_distances(five_otu)
+    path = tmp_path / "dists.npy"
+    np.save(path, dists.array)
+
+    expected = nj_tree(dists).get_newick(with_distances=True)
+    assert nj_tree(path, dists.names).get_newick(with_distances=True) == expected
+    mapped = np.load(path, mmap_mode="r")
+    assert nj_tree(mapped, dists.names).get_newick(with_distances=True) == expected
+
+
+def test_nj_tree_array_errors(five_otu: ArrayAlignment) -> None:
+    matrix = jc_distances(five_otu).array
+
+    with pytest.raises(ValueError, match="names of the sequences are required"):
+        nj_tree(matrix)
+
+    with pytest.raises(IqTreeError, match="does not match the number of sequences"):
+        nj_tree(matrix, five_otu.names[:4])
+
+    with pytest.raises(IqTreeError, match="square or condensed"):
+        nj_tree(matrix[None], five_otu.names)
+
+
+@pytest.mark.parametrize("value", [np.nan, np.inf, -0.1])
+@pytest.mark.parametrize("condensed", [False, True])
+def test_nj_tree_invalid_distances(
+    tmp_path: pathlib.Path,
+    five_otu: ArrayAlignment,
+    value: float,
+    *,
+    condensed: bool,
+) -> None:
+    dists = jc_distances(five_otu)
+    names = list(dists.names)
+    matrix = dists.array.copy()
+    matrix[1, 3] = matrix[3, 1] = value
+    if condensed:
+        matrix = matrix[np.triu_indices(len(names), k=1)]
+    path = tmp_path / "dists.npy"
+    np.save(path, matrix)
+
+    msg = f"distance between {names[1]!r} and {names[3]!r} is {value}"
+    with pytest.raises(ValueError, match=re.escape(msg)):
+        nj_tree(matrix, names)
+    with pytest.raises(ValueError, match=re.escape(msg)):
+        nj_tree(path, names)
+
+
+@pytest.mark.parametrize("handle", [False, True])
+def test_nj_tree_from_alignment(five_otu: ArrayAlignment, *, handle: bool) -> None:
+    expected = nj_tree(jc_distances(five_otu))
+
+    aln = AlignmentHandle(five_otu) if handle else five_otu
+    actual = nj_tree_from_alignment(aln, num_threads=1)
+
+    assert actual.get_newick(with_distances=True) == expected.get_newick(
+        with_distances=True,
+    )
+
+
+def test_nj_tree_from_alignment_models(five_otu: ArrayAlignment) -> None:
+    expected = nj_tree(distances(five_otu, model="tn93"))
+
+    actual = nj_tree_from_alignment(five_otu, distance="TN93")
+
+    assert actual.get_newick(with_distances=True) == expected.get_newick(
+        with_distances=True,
+    )
+
+
+def test_nj_tree_from_alignment_undefined() -> None:
+    # the first two sequences have no sites to compare
+    aln = make_aligned_seqs(
+        {
+            "a": "ACGTAC------",
+            "b": "------ACGTAC",
+            "c": "ACGTACACGTAC",
+            "d": "ACGAACACGTTC",
+        },
+        moltype="dna",
+    )
+
+    with pytest.raises(ValueError, match="distance between 'a' and 'b' is nan"):
+        nj_tree_from_alignment(aln, distance="p")
+
+
+def test_nj_tree_from_alignment_unsupported(five_otu: ArrayAlignment) -> None:
+    with pytest.raises(ValueError, match="Unsupported distance"):
+        nj_tree_from_alignment(five_otu, distance="paralinear")
@@ -1,7 +1,13 @@
+import math
+import pathlib
+from concurrent.futures import ThreadPoolExecutor
+
+import cogent3
 import pytest
 
 import piqtree
 import piqtree.exceptions
+from piqtree.iqtree import _random_tree
 
 
 @pytest.mark.parametrize("num_trees", [1, 10, 20])
@@ -56,3 +62,128 @@ def test_invalid_taxa(
             tree_mode,
             rand_seed=1,
         )
+
+
+def test_random_trees_threaded() -> None:
+    def make_trees(rand_seed: int) -> list[str]:
+        trees = piqtree.random_trees(5, 20, piqtree.TreeGenMode.UNIFORM, rand_seed)
+        return [str(tree) for tree in trees]
+
+    seeds = [1, 2, 3, 4] * 4
+    expected = [make_trees(seed) for seed in seeds]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        got = list(executor.map(make_trees, seeds))
+
+    assert got == expected
+
+
+@pytest.mark.parametrize("tree_mode", list(piqtree.TreeGenMode))
+def test_iter_random_trees(tree_mode: piqtree.TreeGenMode) -> None:
+    trees = list(piqtree.iter_random_trees(25, 10, tree_mode, 1, batch_size=10))
+
+    assert len(trees) == 25
+    for tree in trees:
+        assert isinstance(tree, cogent3.PhyloNode)
+        assert len(tree.tips()) == 10
+
+
+def test_iter_random_trees_reproducible() -> None:
+    def make_newicks(rand_seed: int | None, batch_size: int) -> list[str]:
+        return list(
+            piqtree.iter_random_trees(
+                7,
+                20,
+                piqtree.TreeGenMode.UNIFORM,
+                rand_seed,
+                batch_size=batch_size,
+                as_newick=True,
+            ),
+        )
+
+    newicks = make_newicks(1, 3)
+    assert len(newicks) == 7
+    assert all(newick.endswith(";") for newick in newicks)
+    assert make_newicks(1, 3) == newicks
+    assert make_newicks(2, 3) != newicks
+    # each batch has its own seed, so trees do not repeat between batches
+    assert len(set(newicks)) == 7
+    assert len(set(make_newicks(None, 1))) == 7
+
+
+def test_write_random_trees(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "trees.nwk"
+    expected = list(
+        piqtree.iter_random_trees(
+            12,
+            8,
+            piqtree.TreeGenMode.BIRTH_DEATH,
+            3,
+            batch_size=5,
+            as_newick=True,
+        ),
+    )
+
+    piqtree.write_random_trees(
+        path,
+        12,
+        8,
+        piqtree.TreeGenMode.BIRTH_DEATH,
+        3,
+        batch_size=5,
+    )
+
+    assert path.read_text().splitlines() == expected
+
+
+def test_iter_random_trees_invalid() -> None:
+    with pytest.raises(ValueError, match="batch_size must be positive"):
+        piqtree.iter_random_trees(5, 10, piqtree.TreeGenMode.UNIFORM, batch_size=0)
+
+    with pytest.raises(ValueError, match="num_trees must not be negative"):
+        piqtree.iter_random_trees(-1, 10, piqtree.TreeGenMode.UNIFORM)
+
+    with pytest.raises(piqtree.exceptions.IqTreeError):
+        list(piqtree.iter_random_trees(5, 1, piqtree.TreeGenMode.UNIFORM))
+
+
+@pytest.mark.parametrize("worker_start_time", [0.0, math.inf])
+def test_random_trees_num_threads(
+    monkeypatch: pytest.MonkeyPatch,
+    worker_start_time: float,
+) -> None:
+    # workers are only started when they would finish sooner, with the same
+    # trees either way
+    monkeypatch.setattr(_random_tree, "_WORKER_START_TIME", worker_start_time)
+    if worker_start_time == math.inf:
+        monkeypatch.setattr(_random_tree, "Executor", None)
+
+    expected = list(
+        piqtree.iter_random_trees(
+            250,
+            12,
+            piqtree.TreeGenMode.YULE_HARDING,
+            5,
+            batch_size=100,
+            as_newick=True,
+        ),
+    )
+
+    for num_threads in [None, 1, 3]:
+        trees = piqtree.random_trees(
+            250,
+            12,
+            piqtree.TreeGenMode.YULE_HARDING,
+            5,
+            num_threads=num_threads,
+        )
+        assert [str(tree) for tree in trees] == [
+            str(cogent3.make_tree(newick)) for newick in expected
+        ]
+
+
+def test_random_trees_num_threads_invalid() -> None:
+    with pytest.raises(ValueError, match="num_threads must not be negative"):
+        piqtree.random_trees(5, 10, piqtree.TreeGenMode.UNIFORM, num_threads=-1)
+
+    with pytest.raises(piqtree.exceptions.IqTreeError):
+        piqtree.random_trees(200, 1, piqtree.TreeGenMode.UNIFORM, num_threads=2)
@@ -1,7 +1,14 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
+import pytest
+from _piqtree import iq_robinson_fould
+from cogent3 import make_tree
 from numpy.testing import assert_array_equal
+from scipy.spatial.distance import squareform
 
 import piqtree
+from piqtree.exceptions import IqTreeError
 
 
 def test_robinson_foulds() -> None:
@@ -9,3 +16,84 @@ def test_robinson_foulds() -> None:
     tree2 = "(A,C,(B,D));"
     pairwise_distances = piqtree.robinson_foulds([tree1, tree2])
     assert_array_equal(pairwise_distances, np.array([[0, 2], [2, 0]]))
+
+
+def test_robinson_foulds_threaded() -> None:
+    trees = piqtree.random_trees(10, 20, piqtree.TreeGenMode.YULE_HARDING, 1)
+    expected = piqtree.robinson_foulds(trees)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(piqtree.robinson_foulds, [trees] * 8))
+
+    for got in results:
+        assert_array_equal(got, expected)
+
+
+@pytest.mark.parametrize(
+    "mode",
+    [piqtree.TreeGenMode.YULE_HARDING, piqtree.TreeGenMode.UNIFORM],
+)
+def test_robinson_foulds_matches_iqtree(mode: piqtree.TreeGenMode) -> None:
+    trees = piqtree.random_trees(12, 70, mode, 1)
+    newicks = [str(tree) for tree in trees]
+    expected = np.array(
+        [[iq_robinson_fould(tree1, tree2) for tree2 in newicks] for tree1 in newicks],
+    )
+
+    assert_array_equal(piqtree.robinson_foulds(trees, num_threads=1), expected)
+
+
+@pytest.mark.parametrize(
+    ("tree1", "tree2", "expected"),
+    [
+        ("(A,B,(C,D,E));", "(A,B,(C,(D,E)));", 1),  # multifurcation
+        ("('A':1,B:2,[comment](C:0.1,D)x:3);", "(A,C,(B,D));", 2),
+        ("((A,B),(C,D));", "(A,(B,(C,D)));", 2),  # rooted
+        ("((A,B),(C,D));", "((C,D),(B,A));", 0),
+    ],
+)
+def test_robinson_foulds_newick(tree1: str, tree2: str, expected: int) -> None:
+    assert piqtree.robinson_foulds([tree1, tree2])[0, 1] == expected
+
+
+def test_robinson_foulds_condensed() -> None:
+    trees = piqtree.random_trees(9, 15, piqtree.TreeGenMode.BALANCED, 2)
+    square = piqtree.robinson_foulds(trees)
+    condensed = piqtree.robinson_foulds(trees, condensed=True)
+
+    assert condensed.shape == (9 * 8 // 2,)
+    assert_array_equal(condensed, squareform(square, checks=False))
+
+
+def test_robinson_foulds_reference() -> None:
+    trees = piqtree.random_trees(9, 15, piqtree.TreeGenMode.UNIFORM, 3)
+    square = piqtree.robinson_foulds(trees)
+
+    for i, tree in enumerate(trees):
+        assert_array_equal(piqtree.robinson_foulds(trees, tree), square[i])
+
+
+def test_robinson_foulds_empty() -> None:
+    assert piqtree.robinson_foulds([]).shape == (0, 0)
+    assert piqtree.robinson_foulds([], condensed=True).shape == (0,)
+
+
+def test_robinson_foulds_reference_condensed() -> None:
+    tree = make_tree("(A,B,(C,D));")
+    with pytest.raises(ValueError, match="Condensed output"):
+        _ = piqtree.robinson_foulds([tree], tree, condensed=True)
+
+
+@pytest.mark.parametrize(
+    "trees",
+    [
+        ["(A,B,(C,D));", "(A,B,(C,E));"],
+        ["(A,B,(C,D));", "(A,B,C);"],
+        ["(A,B,(C,D));", "(A,B,(C,D,D));"],
+        ["(A,B,(C,D));", "((A,B),(C,D));"],
+        ["(A,B,(C,D));", "(A,B,(C,D);"],
+    ],
+)
+def test_robinson_foulds_invalid(trees: list[str]) -> None:
+    with pytest.raises(IqTreeError):
+        _ = piqtree.robinson_foulds(trees)
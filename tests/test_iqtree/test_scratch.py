@@ -0,0 +1,102 @@
+import os
+import pathlib
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from cogent3 import ArrayAlignment
+
+import piqtree
+from piqtree.iqtree._decorator import iqtree_func
+from piqtree.iqtree._scratch import _scratch, scratch_dir
+from piqtree.model import DnaModel, Model
+
+
+@pytest.fixture(autouse=True)
+def default_scratch() -> Iterator[None]:
+    yield
+    piqtree.configure_scratch()
+
+
+def write_file(name: str) -> pathlib.Path:
+    path = pathlib.Path(name)
+    path.write_text("log")
+    return path.absolute().parent
+
+
+def test_scratch_directory(tmp_path: pathlib.Path) -> None:
+    piqtree.configure_scratch(tmp_path)
+
+    scratch = iqtree_func(write_file, hide_files=True)("a.log")
+
+    assert scratch.parent == tmp_path
+    assert not scratch.exists()
+
+
+def test_scratch_reuse(tmp_path: pathlib.Path) -> None:
+    piqtree.configure_scratch(tmp_path, reuse=True)
+    func = iqtree_func(write_file, hide_files=True)
+
+    first = func("a.log")
+    # emptied after each call
+    assert first.is_dir()
+    assert not any(first.iterdir())
+
+    second = func("b.log")
+    assert second == first
+    assert not any(second.iterdir())
+
+    # removed when reconfigured
+    piqtree.configure_scratch()
+    assert not first.exists()
+
+
+def test_scratch_reuse_threads(tmp_path: pathlib.Path) -> None:
+    piqtree.configure_scratch(tmp_path, reuse=True)
+    func = iqtree_func(write_file, hide_files=True)
+
+    # each thread reuses its own directory
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        other = pool.submit(func, "a.log").result()
+    assert func("a.log") != other
+    assert set(tmp_path.iterdir()) == {other, func("b.log")}
+
+
+def test_scratch_dir_unlocked(tmp_path: pathlib.Path) -> None:
+    piqtree.configure_scratch(tmp_path)
+
+    # only changing into a directory waits for a call running in another
+    with _scratch.cwd_lock, scratch_dir("piqtree_test_") as directory:
+        assert directory.parent == tmp_path
+
+
+def test_scratch_reuse_build_tree(
+    tmp_path: pathlib.Path,
+    four_otu: ArrayAlignment,
+) -> None:
+    model = Model(DnaModel.JC)
+    expected = [piqtree.build_tree(four_otu, model, rand_seed=seed) for seed in (1, 2)]
+
+    piqtree.configure_scratch(tmp_path, reuse=True)
+    # a call must not resume from the checkpoint of the one before
+    got = [piqtree.build_tree(four_otu, model, rand_seed=seed) for seed in (1, 2)]
+
+    for tree, other in zip(got, expected, strict=True):
+        assert tree.params["lnL"] == pytest.approx(other.params["lnL"])
+    (scratch,) = tmp_path.iterdir()
+    assert not any(scratch.iterdir())
+
+
+def test_scratch_executor(tmp_path: pathlib.Path) -> None:
+    piqtree.configure_scratch(tmp_path)
+
+    with piqtree.Executor(max_workers=1) as executor:
+        cwd = pathlib.Path(executor.submit(os.getcwd).result())
+
+    assert cwd.parent == tmp_path
+    assert not cwd.exists()
+
+
+def test_scratch_missing_directory(tmp_path: pathlib.Path) -> None:
+    with pytest.raises(NotADirectoryError, match="does not exist"):
+        piqtree.configure_scratch(tmp_path / "missing")
@@ -0,0 +1,109 @@
+import json
+import logging
+import os
+import pathlib
+from collections.abc import Iterator
+
+import pytest
+from cogent3 import ArrayAlignment, make_tree
+
+import piqtree
+from piqtree.iqtree._alignment import num_patterns
+from piqtree.iqtree._thread_cache import thread_profile
+from piqtree.model import DnaModel, Model
+
+
+@pytest.fixture(autouse=True)
+def memory_thread_cache() -> Iterator[None]:
+    piqtree.configure_thread_cache()
+    yield
+    piqtree.configure_thread_cache()
+
+
+def measured_threads(caplog: pytest.LogCaptureFixture) -> bool:
+    # whether IQ-TREE measured the best number of threads
+    measured = any("BEST NUMBER OF THREADS" in r.message for r in caplog.records)
+    caplog.clear()
+    return measured
+
+
+def test_thread_profile(four_otu: ArrayAlignment) -> None:
+    got = thread_profile(four_otu, "HKY")
+
+    cpus, seqs, patterns, moltype, model = got.split(",")
+    assert cpus == str(os.cpu_count())
+    assert seqs == "4"
+    assert int(patterns) >= num_patterns(four_otu)
+    assert moltype == "dna"
+    assert model == "HKY"
+
+    assert thread_profile(four_otu, "GTR") != got
+
+
+def test_build_tree_auto_threads(
+    caplog: pytest.LogCaptureFixture,
+    tmp_path: pathlib.Path,
+    four_otu: ArrayAlignment,
+) -> None:
+    path = tmp_path / "threads.json"
+    piqtree.configure_thread_cache(path)
+    model = Model(DnaModel.HKY)
+
+    with caplog.at_level(logging.INFO, logger="piqtree.iqtree"):
+        first = piqtree.build_tree(four_otu, model, rand_seed=1, num_threads=0)
+        assert measured_threads(caplog)
+
+        second = piqtree.build_tree(four_otu, model, rand_seed=2, num_threads=0)
+        assert not measured_threads(caplog)
+
+    detected = first.params["metrics"]["num_threads"]
+    assert second.params["metrics"]["num_threads"] == detected
+    assert json.loads(path.read_text()) == {thread_profile(four_otu, "HKY"): detected}
+
+    # kept between sessions
+    piqtree.configure_thread_cache()
+    piqtree.configure_thread_cache(path)
+    tree = make_tree(tip_names=four_otu.names)
+    with caplog.at_level(logging.INFO, logger="piqtree.iqtree"):
+        piqtree.fit_tree(four_otu, tree, model, num_threads=0)
+        assert not measured_threads(caplog)
+
+
+def test_auto_threads_from_file(
+    caplog: pytest.LogCaptureFixture,
+    tmp_path: pathlib.Path,
+    three_otu: ArrayAlignment,
+) -> None:
+    path = tmp_path / "threads.json"
+    piqtree.configure_thread_cache(path)
+    # stored by another process
+    path.write_text(json.dumps({thread_profile(three_otu, "JC"): 1}))
+
+    tree = make_tree(tip_names=three_otu.names)
+    with caplog.at_level(logging.INFO, logger="piqtree.iqtree"):
+        got = piqtree.fit_tree(three_otu, tree, Model(DnaModel.JC), num_threads=0)
+        assert not measured_threads(caplog)
+    assert got.params["metrics"]["num_threads"] == 1
+
+
+def test_model_finder_auto_threads(
+    tmp_path: pathlib.Path,
+    four_otu: ArrayAlignment,
+) -> None:
+    path = tmp_path / "threads.json"
+    piqtree.configure_thread_cache(path)
+
+    result = piqtree.model_finder(
+        four_otu,
+        model_set={"HKY", "GTR"},
+        rand_seed=1,
+        num_threads=0,
+    )
+    detected = result.metrics["num_threads"]
+    profile = thread_profile(four_otu, "MF -mset GTR,HKY")
+    assert json.loads(path.read_text()) == {profile: detected}
+
+
+def test_thread_cache_missing_directory(tmp_path: pathlib.Path) -> None:
+    with pytest.raises(NotADirectoryError, match="does not exist"):
+        piqtree.configure_thread_cache(tmp_path / "missing" / "threads.json")
@@ -2,10 +2,10 @@ import re
 from typing import Any
 
 import pytest
-from cogent3 import make_tree
+from cogent3 import ArrayAlignment
 
 from piqtree.exceptions import ParseIqTreeError
-from piqtree.iqtree._tree import _process_tree_yaml, _tree_equal
+from piqtree.iqtree._tree import _newick_signature, _process_tree_yaml, iq_build_tree
 
 
 @pytest.fixture
@@ -231,11 +231,39 @@ def test_lie_dna_model_motif_absent(
     ("candidate", "expected"),
     [
         ("((a:1.0,b:0.9),c:0.8);", True),
+        ("((a:1.00,b:9e-1)x:0,c:0.8);", False),
+        ("((a:1.00,b:9e-1)x,c:8.0e-1);", True),
         ("((a:0.9,b:0.9),c:0.8);", False),
         ("((a:1.0,c:0.8),b:0.9);", False),
+        ("(a:1.0,b:0.9,c:0.8);", False),
     ],
 )
-def test_tree_equal(candidate: str, expected: bool) -> None:
-    tree = make_tree("((a:1.0,b:0.9),c:0.8);")
-    candidate = make_tree(candidate)
-    assert _tree_equal(tree, candidate) == expected
+def test_newick_signature(candidate: str, expected: bool) -> None:
+    newick = "((a:1.0,b:0.9),c:0.8);"
+    assert (_newick_signature(newick) == _newick_signature(candidate)) == expected
+
+
+def test_newick_signature_deep_tree() -> None:
+    # a caterpillar tree deep enough to exceed the recursion limit
+    num_tips = 5000
+    newick = "(" * (num_tips - 1) + "t0:1.0"
+    newick += "".join(f",t{i}:1.0):0.5" for i in range(1, num_tips)) + ";"
+    candidate = newick.replace(":0.5", ":5e-1")
+
+    assert _newick_signature(newick) == _newick_signature(candidate)
+
+
+def test_native_result(four_otu: ArrayAlignment) -> None:
+    # results are converted to Python objects by the native layer
+    names = four_otu.names
+    seqs = [str(seq) for seq in four_otu.iter_seqs(names)]
+    result = iq_build_tree(names, seqs, "HKY+G", 1, 0, 1)
+
+    assert result["finished"] is True
+    assert result["iqtree"]["seed"] == 1
+    assert isinstance(result["RateGamma"]["gamma_shape"], float)
+    assert all(isinstance(key, int) for key in result["CandidateSet"])
+    assert isinstance(result["PhyloTree"]["newick"], str)
+
+    tree = _process_tree_yaml(result, names)
+    assert set(tree.get_tip_names()) == set(names)